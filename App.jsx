@@ -1,9 +1,9 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { AuthProvider, useAuth } from './hooks/useAuth.jsx'
 import LoginForm from './components/LoginForm'
 import Sidebar from './components/Sidebar'
 import ChatInterface from './components/ChatInterface'
-import apiService from './services/api'
+import apiService, { ChatSocket } from './services/api'
 import { Toaster } from '@/components/ui/sonner'
 import { toast } from 'sonner'
 import './App.css'
@@ -17,11 +17,35 @@ function AppContent() {
   const [messages, setMessages] = useState([])
   const [isLoadingMessages, setIsLoadingMessages] = useState(false)
   const [activeTool, setActiveTool] = useState('chat')
+  const socketRef = useRef(null)
 
-  // Load chat sessions when authenticated
+  // Open the chat socket when authenticated; it delivers the session list
+  // on connect and pushes updates afterwards. Falls back to HTTP if the
+  // socket cannot be opened.
   useEffect(() => {
-    if (isAuthenticated) {
-      loadChatSessions()
+    if (!isAuthenticated) return
+
+    const socket = new ChatSocket()
+    let ready = false
+    const unsubscribe = socket.subscribe((event) => {
+      if (event.type === 'ready' || event.type === 'sessions') {
+        ready = true
+        setSessions(event.sessions)
+        setCurrentSession(current => current || event.sessions[0] || null)
+      } else if (event.type === 'session_updated') {
+        setSessions(prev => [event.session, ...prev.filter(s => s.id !== event.session.id)])
+      } else if (event.type === 'disconnected' && !ready) {
+        socket.close()
+        loadChatSessions()
+      }
+    })
+    socket.connect()
+    socketRef.current = socket
+
+    return () => {
+      unsubscribe()
+      socket.close()
+      socketRef.current = null
     }
   }, [isAuthenticated])
 
@@ -88,34 +112,54 @@ function AppContent() {
       return
     }
 
+    const userMessageId = Date.now()
+    const assistantMessageId = userMessageId + 1
+    const replaceMessage = (id, message) => {
+      setMessages(prev => prev.map(m => (m.id === id ? message : m)))
+    }
+
     try {
       setIsLoadingMessages(true)
       
       // Add user message to UI immediately
       const userMessage = {
-        id: Date.now(),
+        id: userMessageId,
         message_type: 'user',
         content: messageText,
         timestamp: new Date().toISOString()
       }
       setMessages(prev => [...prev, userMessage])
 
-      // Send message to backend
-      const response = await apiService.sendMessage(currentSession.id, messageText, contextType)
-      
-      // Add assistant response
-      const assistantMessage = {
-        id: Date.now() + 1,
-        message_type: 'assistant',
-        content: response.response || response.message?.content || 'No response received',
-        timestamp: new Date().toISOString()
+      const socket = socketRef.current
+      if (socket?.isOpen) {
+        // Stream the reply into a placeholder; the session list update is pushed
+        setMessages(prev => [...prev, {
+          id: assistantMessageId,
+          message_type: 'assistant',
+          content: '',
+          timestamp: new Date().toISOString(),
+          streaming: true
+        }])
+        const assistantMessage = await socket.sendMessage(currentSession.id, messageText, contextType, {
+          onSaved: (saved) => replaceMessage(userMessageId, saved),
+          onToken: (token) => setMessages(prev => prev.map(m => (
+            m.id === assistantMessageId ? { ...m, content: m.content + token } : m
+          )))
+        })
+        replaceMessage(assistantMessageId, assistantMessage)
+      } else {
+        // Send message to backend
+        const response = await apiService.sendMessage(currentSession.id, messageText, contextType)
+        
+        replaceMessage(userMessageId, response.user_message)
+        setMessages(prev => [...prev, response.ai_response])
+
+        // Refresh sessions to update last activity
+        loadChatSessions()
       }
-      setMessages(prev => [...prev, assistantMessage])
-
-      // Refresh sessions to update last activity
-      loadChatSessions()
       
     } catch (error) {
+      setMessages(prev => prev.filter(m => !(m.id === assistantMessageId && m.streaming)))
       console.error('Failed to send message:', error)
       toast.error("Failed to send message. Please try again.")
     } finally {
@@ -106,7 +106,7 @@ const ChatInterface = ({ currentSession, onSendMessage, messages, isLoading }) =
       <ScrollArea className="flex-1 p-4">
         <div className="space-y-4">
           <AnimatePresence>
-            {messages.map((message, index) => {
+            {messages.filter(m => !(m.streaming && !m.content)).map((message, index) => {
               const IconComponent = getMessageIcon(message.message_type)
               const isUser = message.message_type === 'user'
               
@@ -152,7 +152,7 @@ const ChatInterface = ({ currentSession, onSendMessage, messages, isLoading }) =
             })}
           </AnimatePresence>
           
-          {isLoading && (
+          {isLoading && !messages.some(m => m.streaming && m.content) && (
             <motion.div
               initial={{ opacity: 0, y: 20 }}
               animate={{ opacity: 1, y: 0 }}
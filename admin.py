@@ -1,13 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 from src.models.employee import db, Employee, ChatSession, ChatMessage, SystemSettings
 from src.routes.auth import require_admin
+from src.services.backup_service import BackupError, get_backup_service
+from src.services.data_cleanup import DataCleanupService
+from src.services.system_stats import SystemStatsService
+from src.utils.identity_cache import identity_cache
+from src.utils.service_config import service_config
 import logging
 
 logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__)
 
+stats_service = SystemStatsService(max_age_seconds=service_config.stats_snapshot_max_age)
+
 @admin_bp.route('/employees', methods=['GET'])
 @require_admin
 def get_employees():
@@ -103,6 +110,8 @@ def update_employee(employee_id):
             employee.set_password(data['password'])
         
         db.session.commit()
+        # Deactivation and privilege changes take effect on the employee's next request
+        identity_cache.invalidate(employee_id)
         
         logger.info(f"Employee updated: {employee.username}")
         
@@ -132,6 +141,7 @@ def delete_employee(employee_id):
         username = employee.username
         db.session.delete(employee)
         db.session.commit()
+        identity_cache.invalidate(employee_id)
         
         logger.info(f"Employee deleted: {username}")
         
@@ -145,41 +155,17 @@ def delete_employee(employee_id):
 @admin_bp.route('/stats', methods=['GET'])
 @require_admin
 def get_system_stats():
-    """Get system statistics (admin only)"""
+    """Get system statistics (admin only)
+
+    Served from a snapshot refreshed at most every STATS_SNAPSHOT_MAX_AGE
+    seconds; pass ?refresh=true to recompute immediately.
+    """
     try:
-        # Employee statistics
-        total_employees = Employee.query.count()
-        active_employees = Employee.query.filter_by(is_active=True).count()
-        admin_count = Employee.query.filter_by(is_admin=True, is_active=True).count()
-        
-        # Chat statistics
-        total_sessions = ChatSession.query.count()
-        total_messages = ChatMessage.query.count()
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_sessions = ChatSession.query.filter(ChatSession.created_at >= week_ago).count()
-        recent_messages = ChatMessage.query.filter(ChatMessage.timestamp >= week_ago).count()
-        recent_logins = Employee.query.filter(Employee.last_login >= week_ago).count()
-        
-        # Role distribution
-        roles = db.session.query(Employee.role, db.func.count(Employee.id)).group_by(Employee.role).all()
-        role_distribution = {role: count for role, count in roles}
+        force_refresh = request.args.get('refresh', 'false').lower() == 'true'
+        stats = stats_service.get(force_refresh=force_refresh)
         
         return jsonify({
-            'employees': {
-                'total': total_employees,
-                'active': active_employees,
-                'admins': admin_count,
-                'role_distribution': role_distribution
-            },
-            'chat_activity': {
-                'total_sessions': total_sessions,
-                'total_messages': total_messages,
-                'recent_sessions': recent_sessions,
-                'recent_messages': recent_messages,
-                'recent_logins': recent_logins
-            },
+            **stats,
             'system': {
                 'uptime': 'Available via health endpoint',
                 'version': '1.0.0'
@@ -200,16 +186,10 @@ def cleanup_old_data():
         
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Delete old chat sessions and their messages
-        old_sessions = ChatSession.query.filter(ChatSession.last_activity < cutoff_date).all()
-        deleted_sessions = len(old_sessions)
-        deleted_messages = 0
-        
-        for session in old_sessions:
-            deleted_messages += len(session.messages)
-            db.session.delete(session)
-        
-        db.session.commit()
+        # Delete old chat sessions and their messages in bounded batches
+        deleted = DataCleanupService().purge_chat_sessions(cutoff_date)
+        deleted_sessions = deleted['sessions']
+        deleted_messages = deleted['messages']
         
         logger.info(f"Cleanup completed: {deleted_sessions} sessions, {deleted_messages} messages")
         
@@ -272,37 +252,50 @@ def update_settings():
 @admin_bp.route('/backup', methods=['POST'])
 @require_admin
 def create_backup():
-    """Create database backup (admin only)"""
+    """Start an online database backup in the background (admin only)"""
     try:
-        import shutil
-        import os
-        from datetime import datetime
-        
-        # Get database path
-        db_path = os.path.join(os.path.dirname(__file__), '..', 'database', 'app.db')
-        backup_dir = os.path.join(os.path.dirname(__file__), '..', 'backups')
-        
-        # Create backup directory if it doesn't exist
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Create backup filename with timestamp
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f"wiko_assistant_backup_{timestamp}.db"
-        backup_path = os.path.join(backup_dir, backup_filename)
-        
-        # Copy database file
-        shutil.copy2(db_path, backup_path)
+        data = request.get_json(silent=True) or {}
+        backup_type = data.get('type', 'full')
         
-        logger.info(f"Database backup created: {backup_filename}")
+        job = get_backup_service(current_app._get_current_object()).start(backup_type)
         
         return jsonify({
             'success': True,
-            'backup_file': backup_filename,
-            'backup_path': backup_path,
-            'timestamp': timestamp
-        })
+            'job': job.to_dict(),
+            'status_url': f"/api/admin/backup/jobs/{job.id}"
+        }), 202
         
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Backup error: {str(e)}")
         return jsonify({'error': 'Backup failed'}), 500
 
+@admin_bp.route('/backup/jobs/<job_id>', methods=['GET'])
+@require_admin
+def get_backup_job(job_id):
+    """Progress of a backup job (admin only)"""
+    try:
+        job = get_backup_service(current_app._get_current_object()).get_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Backup job not found'}), 404
+        
+        return jsonify({'job': job.to_dict()})
+        
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 400
+
+@admin_bp.route('/backups', methods=['GET'])
+@require_admin
+def list_backups():
+    """List completed backups from the manifest (admin only)"""
+    try:
+        backups = get_backup_service(current_app._get_current_object()).list_backups()
+        return jsonify({'backups': backups})
+        
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"List backups error: {str(e)}")
+        return jsonify({'error': 'Failed to list backups'}), 500
+
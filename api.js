@@ -121,6 +121,58 @@ class ApiService {
     })
   }
 
+  async generateEmailBatch(items, onResult, concurrency) {
+    return this.streamNDJSON('/email/generate/batch', {
+      method: 'POST',
+      body: JSON.stringify({ items, concurrency }),
+    }, onResult)
+  }
+
+  // Reads a newline-delimited JSON response, calling onEvent for each line
+  async streamNDJSON(endpoint, options, onEvent) {
+    const response = await fetch(`${this.baseURL}${endpoint}`, {
+      headers: {
+        'Content-Type': 'application/json',
+        ...options.headers,
+      },
+      credentials: 'include',
+      ...options,
+    })
+
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}))
+      throw new Error(data.error || `HTTP error! status: ${response.status}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    let lastEvent = null
+
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let newline
+      while ((newline = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, newline).trim()
+        buffer = buffer.slice(newline + 1)
+        if (line) {
+          lastEvent = JSON.parse(line)
+          onEvent?.(lastEvent)
+        }
+      }
+    }
+
+    if (buffer.trim()) {
+      lastEvent = JSON.parse(buffer)
+      onEvent?.(lastEvent)
+    }
+
+    return lastEvent
+  }
+
   // Complaint Analysis
   async analyzeComplaint(complaintText) {
     return this.request('/complaint/analyze', {
@@ -135,6 +187,102 @@ class ApiService {
   }
 }
 
+// Persistent WebSocket channel for chat: sends messages, receives streamed
+// tokens and pushed session updates. Authenticated once by the session cookie.
+export class ChatSocket {
+  constructor(baseURL = API_BASE_URL) {
+    this.url = `${baseURL.replace(/^http/, 'ws')}/chat/ws`
+    this.socket = null
+    this.listeners = new Set()
+    this.pending = new Map()
+    this.reconnectDelay = 1000
+    this.closedByUser = false
+    this.nextRequestId = 1
+  }
+
+  get isOpen() {
+    return this.socket?.readyState === WebSocket.OPEN
+  }
+
+  connect() {
+    this.closedByUser = false
+    this.socket = new WebSocket(this.url)
+
+    this.socket.onopen = () => {
+      this.reconnectDelay = 1000
+    }
+
+    this.socket.onmessage = (message) => {
+      const event = JSON.parse(message.data)
+      const request = event.request_id && this.pending.get(event.request_id)
+
+      if (request) {
+        if (event.type === 'token') {
+          request.onToken?.(event.content)
+        } else if (event.type === 'message_saved') {
+          request.onSaved?.(event.message)
+        } else if (event.type === 'message_complete') {
+          this.pending.delete(event.request_id)
+          request.resolve(event.message)
+        } else if (event.type === 'error') {
+          this.pending.delete(event.request_id)
+          request.reject(new Error(event.error))
+        }
+      }
+
+      this.listeners.forEach(listener => listener(event))
+    }
+
+    this.socket.onclose = () => {
+      this.pending.forEach(request => request.reject(new Error('Connection lost')))
+      this.pending.clear()
+      this.listeners.forEach(listener => listener({ type: 'disconnected' }))
+
+      if (!this.closedByUser) {
+        setTimeout(() => this.connect(), this.reconnectDelay)
+        this.reconnectDelay = Math.min(this.reconnectDelay * 2, 30000)
+      }
+    }
+  }
+
+  close() {
+    this.closedByUser = true
+    this.socket?.close()
+  }
+
+  // Returns a function that removes the listener
+  subscribe(listener) {
+    this.listeners.add(listener)
+    return () => this.listeners.delete(listener)
+  }
+
+  send(type, payload = {}) {
+    this.socket.send(JSON.stringify({ type, ...payload }))
+  }
+
+  listSessions() {
+    this.send('list_sessions')
+  }
+
+  createSession(sessionName) {
+    this.send('create_session', { session_name: sessionName })
+  }
+
+  // Resolves with the saved assistant message; onToken receives each streamed piece
+  sendMessage(sessionId, message, contextType = 'general', { onToken, onSaved } = {}) {
+    const requestId = `req-${this.nextRequestId++}`
+    return new Promise((resolve, reject) => {
+      this.pending.set(requestId, { resolve, reject, onToken, onSaved })
+      this.send('send_message', {
+        request_id: requestId,
+        session_id: sessionId,
+        message,
+        context_type: contextType,
+      })
+    })
+  }
+}
+
 // Create and export a singleton instance
 const apiService = new ApiService()
 export default apiService
@@ -152,6 +300,7 @@ export const {
   getDocuments,
   translateText,
   generateEmail,
+  generateEmailBatch,
   analyzeComplaint,
   getHealth,
 } = apiService
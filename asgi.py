@@ -0,0 +1,249 @@
+"""
+ASGI entry point for Wiko Cutlery Chatbot
+The LLM-bound routes (chat messages, translation, email drafts) are served
+natively on the event loop, so hundreds of chats can wait for the model
+without a thread each. Every other request runs the Flask app on a worker
+thread, with streamed responses passed through chunk by chunk.
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+
+The chat WebSocket (/api/chat/ws) needs flask-sock under a WSGI server; the
+frontend falls back to plain HTTP when it is unavailable.
+"""
+
+import asyncio
+import io
+import logging
+import re
+import sys
+import time
+from typing import Dict, Optional
+
+from src.main import app as flask_app, CORS_ORIGINS
+from src.routes.chatbot import chatbot_service
+from src.routes.chatbot_async import AsyncRequest, send_message, translate_text, generate_email
+from src.utils.metrics import current_endpoint, request_duration
+
+logger = logging.getLogger(__name__)
+
+# (method, path pattern, endpoint label, handler)
+NATIVE_ROUTES = [
+    ('POST', re.compile(r'^/api/chat/sessions/(\d+)/messages$'), 'chatbot.send_message', send_message),
+    ('POST', re.compile(r'^/api/translate$'), 'chatbot.translate_text', translate_text),
+    ('POST', re.compile(r'^/api/email/generate$'), 'chatbot.generate_email', generate_email),
+]
+
+
+async def read_body(receive, limit: Optional[int]) -> Optional[bytes]:
+    """Read the whole request body; None if the client disconnected or it exceeds limit"""
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        chunks.append(chunk)
+        size += len(chunk)
+        more_body = message.get('more_body', False)
+        if limit and size > limit:
+            return None
+    return b''.join(chunks)
+
+
+class ASGIInputStream(io.RawIOBase):
+    """wsgi.input that pulls the request body from ASGI receive as the app reads it.
+
+    Read on the worker thread, so the streaming upload routes validate and
+    store the body while it arrives, and Flask enforces its own (possibly
+    per-request) content length limit. A client disconnect reads as end of
+    input.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = bytearray()
+        self._more_body = True
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self):
+        message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+        if message['type'] == 'http.disconnect':
+            self._more_body = False
+            return
+        self._buffer += message.get('body', b'')
+        self._more_body = message.get('more_body', False)
+
+    def readinto(self, target) -> int:
+        while not self._buffer and self._more_body:
+            self._fill()
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        del self._buffer[:size]
+        return size
+
+
+class WSGIBridge:
+    """Runs a WSGI app on the default thread pool.
+
+    asgiref's WsgiToAsgi runs every request on one shared thread; this keeps
+    the Flask routes as concurrent as under a threaded WSGI server.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        body = io.BufferedReader(ASGIInputStream(receive, loop), buffer_size=64 * 1024)
+        await asyncio.to_thread(self._run, scope, body, send_from_thread)
+
+    def _environ(self, scope, body) -> Dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for key, value in scope['headers']:
+            name = key.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[name] = value
+            else:
+                name = f'HTTP_{name}'
+                environ[name] = f"{environ[name]},{value}" if name in environ else value
+        if 'CONTENT_LENGTH' not in environ:
+            # Chunked request body: read it until the end of input
+            environ['wsgi.input_terminated'] = True
+        return environ
+
+    def _run(self, scope, body, send):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+
+        def start():
+            if not response.get('started'):
+                response['started'] = True
+                send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+
+        result = self.wsgi_app(self._environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            start()
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Stops streamed responses (e.g. NDJSON batches) if the client went away
+            if hasattr(result, 'close'):
+                result.close()
+
+
+class ChatbotASGI:
+    """Routes hot paths to async handlers and everything else to Flask"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.fallback = WSGIBridge(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'websocket':
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+
+        for method, pattern, endpoint, handler in NATIVE_ROUTES:
+            match = pattern.match(scope['path'])
+            if match and scope['method'] == method:
+                await self._handle(scope, receive, send, endpoint, handler, match.groups())
+                return
+
+        await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Only a service that was built has a client to close
+                async_ollama = getattr(chatbot_service, 'async_ollama', None) if chatbot_service.initialized else None
+                if async_ollama is not None:
+                    await async_ollama.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _handle(self, scope, receive, send, endpoint, handler, args):
+        started = time.perf_counter()
+        current_endpoint.set(endpoint)
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+
+        body = await read_body(receive, self.wsgi_app.config.get('MAX_CONTENT_LENGTH'))
+        if body is None:
+            await self._respond(send, headers, 413, {'error': 'Request body too large'})
+            return
+
+        request = AsyncRequest(scope['method'], scope['path'], headers, body)
+        try:
+            status, payload = await handler(self.wsgi_app, request, *(int(arg) for arg in args))
+        except Exception as e:
+            logger.error(f"Unhandled error in {endpoint}: {e}")
+            status, payload = 500, {'error': 'Internal server error'}
+
+        await self._respond(send, headers, status, payload)
+        request_duration.observe(
+            time.perf_counter() - started,
+            endpoint=endpoint,
+            method=scope['method'],
+            status=str(status)
+        )
+
+    async def _respond(self, send, request_headers: Dict[str, str], status: int, payload: Dict):
+        data = self.wsgi_app.json.dumps(payload).encode('utf-8')
+        response_headers = [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(data)).encode('ascii')),
+        ]
+        # Same CORS policy as Flask-CORS applies to the WSGI routes
+        origin = request_headers.get('origin')
+        if origin in CORS_ORIGINS:
+            response_headers += [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': data})
+
+
+app = ChatbotASGI(flask_app)
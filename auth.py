@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
 from src.models.employee import db, Employee
+from src.utils.identity_cache import current_identity, identity_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,11 +47,12 @@ def login():
         # Update last login
         employee.last_login = datetime.utcnow()
         db.session.commit()
+        identity_cache.invalidate(employee.id)
         
-        # Create session
+        # Create session; privileges are re-checked from the employee record on each request
         session['employee_id'] = employee.id
         session['username'] = employee.username
-        session['is_admin'] = employee.is_admin
+        session['is_admin'] = getattr(employee, 'is_admin', False)
         
         logger.info(f"Employee {username} logged in successfully")
         
@@ -98,9 +100,9 @@ def get_current_user():
                 'error': 'Not authenticated'
             }), 401
         
-        employee = Employee.query.get(employee_id)
+        employee = current_identity()
         
-        if not employee or not employee.is_active:
+        if not employee:
             session.clear()
             return jsonify({
                 'error': 'User not found or deactivated'
@@ -125,9 +127,9 @@ def check_session():
                 'authenticated': False
             })
         
-        employee = Employee.query.get(employee_id)
+        employee = current_identity()
         
-        if not employee or not employee.is_active:
+        if not employee:
             session.clear()
             return jsonify({
                 'authenticated': False
@@ -158,9 +160,9 @@ def require_auth(f):
                 'error': 'Authentication required'
             }), 401
         
-        employee = Employee.query.get(employee_id)
+        employee = current_identity()
         
-        if not employee or not employee.is_active:
+        if not employee:
             session.clear()
             return jsonify({
                 'error': 'User not found or deactivated'
@@ -186,9 +188,9 @@ def require_admin(f):
                 'error': 'Authentication required'
             }), 401
         
-        employee = Employee.query.get(employee_id)
+        employee = current_identity()
         
-        if not employee or not employee.is_active:
+        if not employee:
             session.clear()
             return jsonify({
                 'error': 'User not found or deactivated'
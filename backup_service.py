@@ -0,0 +1,396 @@
+"""
+Online database backups for Wiko Cutlery Chatbot
+Backups use SQLite's online backup API on a background thread, copying a
+batch of pages at a time and sleeping between batches so chat traffic keeps
+its write lock. Output is gzip-compressed and checksummed, and every backup
+is recorded in a manifest next to the files.
+
+Incremental backups copy the committed frames appended to the write-ahead
+log since the previous backup. They form a chain on top of the last full
+backup for as long as the WAL is not reset by a checkpoint; once it is, the
+next backup automatically becomes a full one.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    """Raised when a backup cannot be started or restored"""
+
+
+class _TooManyRestarts(Exception):
+    """The source kept changing under a stepped backup"""
+
+
+class BackupJob:
+    """State and progress of one backup run"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = 'queued'
+        self.pages_total = 0
+        self.pages_remaining = 0
+        self.file = None
+        self.size = 0
+        self.sha256 = None
+        self.note = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == 'completed':
+            return 100.0
+        if not self.pages_total:
+            return 0.0
+        return round(100.0 * (self.pages_total - self.pages_remaining) / self.pages_total, 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'pages_total': self.pages_total,
+            'pages_remaining': self.pages_remaining,
+            'backup_file': self.file,
+            'size': self.size,
+            'sha256': self.sha256,
+            'note': self.note,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def _gzip_file(source_path: str, target_path: str) -> Dict:
+    """Compress source_path into target_path, returning size and sha256 of the output"""
+    with open(source_path, 'rb') as source, gzip.open(target_path, 'wb') as target:
+        while True:
+            chunk = source.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            target.write(chunk)
+    return _file_digest(target_path)
+
+
+def _file_digest(path: str) -> Dict:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return {'size': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+
+class BackupService:
+    """Runs one backup at a time on a background thread"""
+
+    MANIFEST_NAME = 'backup_manifest.json'
+
+    def __init__(self, db_path: str, backup_dir: str, pages_per_step: int = 1024,
+                 step_sleep_ms: float = 50, max_restarts: int = 3, max_jobs: int = 50):
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.pages_per_step = pages_per_step
+        self.step_sleep_seconds = step_sleep_ms / 1000.0
+        # SQLite restarts a stepped backup whenever another connection writes to the source
+        self.max_restarts = max_restarts
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, BackupJob] = {}
+        self._lock = threading.Lock()
+        self._running: Optional[BackupJob] = None
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.backup_dir, self.MANIFEST_NAME)
+
+    def _load_manifest(self) -> Dict:
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        return {'backups': [], 'wal_chain': None}
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def list_backups(self) -> List[Dict]:
+        return self._load_manifest()['backups']
+
+    def get_job(self, job_id: str) -> Optional[BackupJob]:
+        return self.jobs.get(job_id)
+
+    def start(self, kind: str = 'full') -> BackupJob:
+        """Queue a backup on a background thread; returns the running job if one is in progress"""
+        if kind not in ('full', 'incremental'):
+            raise BackupError(f"Unknown backup type: {kind}")
+        if not os.path.exists(self.db_path):
+            raise BackupError(f"Database file not found: {self.db_path}")
+
+        with self._lock:
+            if self._running is not None:
+                return self._running
+            job = BackupJob(kind)
+            self._running = job
+            self.jobs[job.id] = job
+            # Keep the most recent jobs only
+            for old_id in list(self.jobs)[:-self.max_jobs]:
+                del self.jobs[old_id]
+
+        threading.Thread(target=self._run, args=(job,), name=f'backup-{job.id}', daemon=True).start()
+        return job
+
+    def _run(self, job: BackupJob):
+        job.status = 'running'
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            manifest = self._load_manifest()
+            if job.kind == 'incremental':
+                reason = self._chain_broken(manifest)
+                if reason:
+                    job.kind = 'full'
+                    job.note = f"Full backup taken instead: {reason}"
+
+            if job.kind == 'full':
+                entry = self._full_backup(job, manifest)
+            else:
+                entry = self._incremental_backup(job, manifest)
+
+            if entry is not None:
+                manifest['backups'].append(entry)
+                self._write_manifest(manifest)
+                job.file = entry['file']
+                job.size = entry['size']
+                job.sha256 = entry['sha256']
+            job.status = 'completed'
+            logger.info(f"Database backup {job.id} completed: {job.file or job.note}")
+
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Backup {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            with self._lock:
+                self._running = None
+
+    def _read_wal_header(self) -> Optional[Dict]:
+        wal_path = f"{self.db_path}-wal"
+        try:
+            with open(wal_path, 'rb') as f:
+                header = f.read(WAL_HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        if len(header) < WAL_HEADER_SIZE:
+            return None
+        return {
+            'page_size': struct.unpack('>I', header[8:12])[0],
+            'salt': header[16:24].hex()
+        }
+
+    def _chain_broken(self, manifest: Dict) -> Optional[str]:
+        chain = manifest.get('wal_chain')
+        if not chain:
+            return 'no full backup to build on'
+        wal = self._read_wal_header()
+        if wal is None or chain.get('salt') is None:
+            return 'the database is not using a write-ahead log'
+        if wal['salt'] != chain['salt']:
+            return 'the write-ahead log was checkpointed since the last backup'
+        return None
+
+    def _full_backup(self, job: BackupJob, manifest: Dict) -> Dict:
+        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        name = f"wiko_assistant_backup_{timestamp}_{job.id}.db"
+        tmp_path = os.path.join(self.backup_dir, f"{name}.partial")
+
+        # Frames already in the WAL are included in the copy; the chain restarts from the
+        # start of this WAL generation so its checksums can be replayed on restore.
+        wal = self._read_wal_header()
+
+        restarts = 0
+
+        def progress(status, remaining, total):
+            nonlocal restarts
+            if remaining > job.pages_remaining and job.pages_remaining:
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _TooManyRestarts()
+            job.pages_total = total
+            job.pages_remaining = remaining
+            if remaining and self.step_sleep_seconds:
+                # The source is only locked while a step copies pages
+                time.sleep(self.step_sleep_seconds)
+
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress)
+            except _TooManyRestarts:
+                if wal is None:
+                    raise BackupError('The database was modified too often to complete a stepped backup')
+                # Under WAL a single-step copy only holds a read snapshot, so writers are not blocked
+                job.note = 'Copied in one step after repeated restarts from concurrent writes'
+                source.backup(target, pages=-1)
+                job.pages_remaining = 0
+        finally:
+            target.close()
+            source.close()
+
+        try:
+            job.status = 'compressing'
+            digest = _gzip_file(tmp_path, os.path.join(self.backup_dir, f"{name}.gz"))
+        finally:
+            os.remove(tmp_path)
+
+        manifest['wal_chain'] = {
+            'base': f"{name}.gz",
+            'salt': wal['salt'] if wal else None,
+            'offset': 0
+        }
+        return {
+            'file': f"{name}.gz",
+            'kind': 'full',
+            'created_at': datetime.utcnow().isoformat(),
+            **digest
+        }
+
+    def _incremental_backup(self, job: BackupJob, manifest: Dict) -> Optional[Dict]:
+        chain = manifest['wal_chain']
+        wal = self._read_wal_header()
+        frame_size = WAL_FRAME_HEADER_SIZE + wal['page_size']
+        salt = bytes.fromhex(chain['salt'])
+        start = chain['offset']
+
+        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        name = f"wiko_assistant_wal_{timestamp}_{job.id}.wal.gz"
+        target_path = os.path.join(self.backup_dir, name)
+
+        end = start
+        pending = []
+        with open(f"{self.db_path}-wal", 'rb') as wal_file, gzip.open(target_path, 'wb') as target:
+            if start == 0:
+                target.write(wal_file.read(WAL_HEADER_SIZE))
+                end = WAL_HEADER_SIZE
+            wal_file.seek(end)
+            wal_file_size = os.fstat(wal_file.fileno()).st_size
+            job.pages_total = max(0, (wal_file_size - end) // frame_size)
+            job.pages_remaining = job.pages_total
+
+            frames = 0
+            while True:
+                frame = wal_file.read(frame_size)
+                if len(frame) < frame_size or frame[8:16] != salt:
+                    # End of the log, or stale frames left over from before the last reset
+                    break
+                pending.append(frame)
+                if struct.unpack('>I', frame[4:8])[0]:
+                    # Commit frame: everything up to here is a complete transaction
+                    target.write(b''.join(pending))
+                    end += frame_size * len(pending)
+                    pending = []
+                frames += 1
+                job.pages_remaining = max(0, job.pages_total - frames)
+                if frames % self.pages_per_step == 0 and self.step_sleep_seconds:
+                    time.sleep(self.step_sleep_seconds)
+
+        if end <= max(start, WAL_HEADER_SIZE):
+            os.remove(target_path)
+            job.note = 'No changes since the last backup'
+            return None
+
+        chain['offset'] = end
+        return {
+            'file': name,
+            'kind': 'incremental',
+            'base': chain['base'],
+            'wal_offset_start': start,
+            'wal_offset_end': end,
+            'created_at': datetime.utcnow().isoformat(),
+            **_file_digest(target_path)
+        }
+
+    def _verify(self, entry: Dict) -> str:
+        path = os.path.join(self.backup_dir, entry['file'])
+        if _file_digest(path)['sha256'] != entry['sha256']:
+            raise BackupError(f"Checksum mismatch for {entry['file']}")
+        return path
+
+    def restore(self, backup_file: str, target_path: str):
+        """Rebuild a database from a full backup, plus its WAL segments up to backup_file"""
+        backups = self.list_backups()
+        entry = next((item for item in backups if item['file'] == backup_file), None)
+        if entry is None:
+            raise BackupError(f"Unknown backup: {backup_file}")
+
+        base_name = entry.get('base', entry['file'])
+        base = next(item for item in backups if item['file'] == base_name)
+        segments = []
+        if entry['kind'] == 'incremental':
+            for item in backups:
+                if item.get('base') == base_name:
+                    segments.append(item)
+                if item is entry:
+                    break
+
+        with gzip.open(self._verify(base), 'rb') as source, open(target_path, 'wb') as target:
+            for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+                target.write(chunk)
+        if segments:
+            with open(f"{target_path}-wal", 'wb') as target:
+                for segment in segments:
+                    with gzip.open(self._verify(segment), 'rb') as source:
+                        for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+                            target.write(chunk)
+            connection = sqlite3.connect(target_path)
+            try:
+                connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            finally:
+                connection.close()
+
+
+_backup_service = None
+_backup_service_lock = threading.Lock()
+
+
+def get_backup_service(app) -> BackupService:
+    """Process-wide backup service for the app's SQLite database"""
+    global _backup_service
+    from src.models.employee import db
+    from src.utils.service_config import service_config
+
+    with _backup_service_lock:
+        if _backup_service is None:
+            with app.app_context():
+                url = db.engine.url
+            if url.get_backend_name() != 'sqlite' or not url.database:
+                raise BackupError('Online backups are only supported for SQLite databases')
+            _backup_service = BackupService(
+                os.path.abspath(url.database),
+                service_config.backup_dir,
+                pages_per_step=service_config.backup_pages_per_step,
+                step_sleep_ms=service_config.backup_step_sleep_ms
+            )
+    return _backup_service
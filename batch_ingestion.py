@@ -0,0 +1,351 @@
+"""
+Batch ingestion of uploaded PDFs
+A batch is a set of PDFs, given as separate files or as members of a ZIP
+archive. Each one is streamed through a PDFUploadSink on its own, so a ZIP
+is never unpacked as a whole. The stages then overlap across files:
+- PDF extraction runs in a pool of worker processes, so it scales with CPU
+  cores. A file of a multipart upload is extracted as soon as its part is
+  complete, while later parts are still being received.
+- The LLM analysis of each extracted file waits for a batch-priority slot
+  in the LLM scheduler.
+- Storing and indexing run in the calling thread as analyses finish.
+The result is a manifest with the status and stage timings of every file.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from werkzeug.utils import secure_filename
+
+from src.services.page_text_store import PageTextWriter
+from src.services.pdf_processor import PDFProcessor, PDFUploadError
+
+logger = logging.getLogger(__name__)
+
+ZIP_READ_SIZE = 64 * 1024
+
+
+def extract_upload(file_path: str, page_text_dir: Optional[str], spill_threshold: int) -> Dict:
+    """Summarize one PDF in a worker process, writing its page text to page_text_dir if given.
+
+    The returned summary has everything but the text itself; the page text
+    file is read back for indexing.
+    """
+    started = time.monotonic()
+    processor = PDFProcessor(text_spill_threshold=spill_threshold)
+    page_writer = PageTextWriter(page_text_dir) if page_text_dir else None
+    try:
+        with processor.mapped(file_path) as pdf_buffer:
+            summary = processor.summarize_document(file_path, stream=pdf_buffer, page_writer=page_writer)
+    except Exception as e:
+        summary = {"valid": False, "error": f"Invalid PDF file: {str(e)}"}
+
+    if not summary["valid"]:
+        if page_writer is not None:
+            page_writer.abort()
+        return summary
+    if page_writer is not None:
+        page_writer.commit()
+    summary.pop("text").close()
+    summary["extract_ms"] = round((time.monotonic() - started) * 1000)
+    return summary
+
+
+class BatchUploadPart:
+    """A PDF part of a multipart batch upload.
+
+    Records a PDFUploadError instead of raising it, so one bad file does not
+    stop the rest of the request body from being read. on_complete, if given,
+    is called with the manifest entry once the part is complete.
+    """
+
+    def __init__(self, sink, name: str, on_complete: Optional[Callable[[Dict], None]] = None):
+        self.sink = sink
+        self.name = name
+        self.error = None
+        self.on_complete = on_complete
+        self._entry = None
+        self._started = time.monotonic()
+        self._finished = self._started
+
+    def write(self, data: bytes) -> int:
+        if self.error is None:
+            try:
+                self.sink.write(data)
+            except PDFUploadError as e:
+                self.error = str(e)
+        self._finished = time.monotonic()
+        return len(data)
+
+    def seek(self, *args):
+        # The multipart parser rewinds the container once the part is complete
+        if self._entry is None and self.on_complete is not None:
+            self.on_complete(self.entry())
+        return 0
+
+    def abort(self):
+        if self._entry is None:
+            self.sink.abort()
+            return
+        extraction = self._entry.pop("_extraction", None)
+        if extraction is not None:
+            extraction[1].cancel()
+        if self._entry.get("file_path") and os.path.exists(self._entry["file_path"]):
+            os.remove(self._entry["file_path"])
+
+    def entry(self) -> Dict:
+        """Manifest entry for the received file"""
+        if self._entry is None:
+            receive_ms = round((self._finished - self._started) * 1000)
+            if self.error is not None:
+                self._entry = {"name": self.name, "status": "error", "error": self.error, "receive_ms": receive_ms}
+            else:
+                self._entry = received_entry(self.sink, self.name, receive_ms)
+        return self._entry
+
+
+def received_entry(sink, name: str, receive_ms: int) -> Dict:
+    """Manifest entry for a file written through a PDFUploadSink"""
+    upload = sink.finish()
+    entry = {"name": name, "receive_ms": receive_ms}
+    if not upload["valid"]:
+        entry.update({"status": "error", "error": upload["error"]})
+        return entry
+    entry.update({
+        "status": "received",
+        "file_path": upload["file_path"],
+        "file_size": upload["file_size"],
+        "sha256": upload["sha256"]
+    })
+    return entry
+
+
+class BatchIngestionService:
+    """Pipelines extraction, analysis and storage over the files of a batch"""
+
+    def __init__(self, pdf_processor: PDFProcessor, document_artifacts, workers: Optional[int] = None,
+                 analysis_concurrency: int = 2, max_files: int = 100):
+        self.pdf_processor = pdf_processor
+        self.document_artifacts = document_artifacts
+        self.workers = workers or os.cpu_count() or 1
+        self.analysis_concurrency = max(1, analysis_concurrency)
+        self.max_files = max_files
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _extraction_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned rather than forked: the app process runs scheduler and sweeper threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _upload_path(self, upload_dir: str, filename: str) -> str:
+        return os.path.join(upload_dir, f"{uuid.uuid4()}_{secure_filename(filename)}")
+
+    def upload_part(self, upload_dir: str, filename: str, spill_threshold: Optional[int] = None) -> BatchUploadPart:
+        """Streaming target for one PDF of a multipart batch upload.
+
+        With spill_threshold, the file goes to the extraction pool as soon as
+        its part is complete.
+        """
+        name = secure_filename(filename)
+        on_complete = None
+        if spill_threshold is not None:
+            on_complete = lambda entry: self.start_extraction(entry, spill_threshold)
+        return BatchUploadPart(self.pdf_processor.upload_sink(self._upload_path(upload_dir, name)), name, on_complete)
+
+    def start_extraction(self, entry: Dict, spill_threshold: int):
+        """Hand a received file to the extraction pool; ingest() collects the result"""
+        if entry["status"] != "received" or "_extraction" in entry:
+            return
+        entry["_queued_at"] = time.monotonic()
+        key = entry["sha256"]
+        page_text_dir = None if self.document_artifacts.has_page_text(key) else \
+            self.document_artifacts.directory_for(key)
+        pool = self._extraction_pool()
+        try:
+            future = pool.submit(extract_upload, entry["file_path"], page_text_dir, spill_threshold)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._reset_pool(pool)
+            future = Future()
+            future.set_exception(BrokenProcessPool(str(e)))
+        entry["_extraction"] = (pool, future)
+
+    def stage_zip(self, archive, archive_name: str, upload_dir: str, limit: int) -> Iterator[Dict]:
+        """Stream the PDF members of a ZIP archive into upload_dir one at a time.
+
+        Other members are reported as skipped. At most limit PDFs are taken;
+        the declared and the actual size of each member are both checked
+        against the upload size limit.
+        """
+        try:
+            zip_file = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            yield {"name": archive_name, "status": "error", "error": "Invalid ZIP file"}
+            return
+
+        with zip_file:
+            taken = 0
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                name = secure_filename(os.path.basename(info.filename))
+                if not name.lower().endswith('.pdf'):
+                    yield {"name": info.filename, "status": "skipped", "error": "Not a PDF file"}
+                    continue
+                if taken >= limit:
+                    yield {"name": info.filename, "status": "skipped",
+                           "error": f"Too many files. Maximum batch size: {self.max_files}"}
+                    continue
+                taken += 1
+                if info.file_size > self.pdf_processor.max_file_size:
+                    yield {"name": name, "status": "error",
+                           "error": f"File too large. Maximum size: {self.pdf_processor.max_file_size / (1024*1024):.1f}MB"}
+                    continue
+
+                started = time.monotonic()
+                sink = self.pdf_processor.upload_sink(self._upload_path(upload_dir, name))
+                try:
+                    with zip_file.open(info) as member:
+                        while True:
+                            data = member.read(ZIP_READ_SIZE)
+                            if not data:
+                                break
+                            sink.write(data)
+                except (PDFUploadError, zipfile.BadZipFile, RuntimeError, EOFError) as e:
+                    # RuntimeError: encrypted member
+                    sink.abort()
+                    yield {"name": name, "status": "error", "error": str(e)}
+                    continue
+                yield received_entry(sink, name, round((time.monotonic() - started) * 1000))
+
+    def ingest(self, entries: Iterable[Dict], analyze: Callable[[Dict], str],
+               store: Callable[[Dict, Dict, str], Dict], spill_threshold: int) -> Dict:
+        """Run received files through extraction, analysis and storage.
+
+        entries are manifest entries from BatchUploadPart/stage_zip; they may
+        be produced lazily, and each received file is handed to the
+        extraction pool as soon as it arrives, unless start_extraction()
+        already did. analyze(summary) runs on an
+        analysis thread and returns the analysis text; store(entry, summary,
+        analysis) runs in the calling thread and returns fields to add to
+        the entry, such as the document id. Files that fail are removed.
+        """
+        started = time.monotonic()
+        manifest: List[Dict] = []
+        done = queue.Queue()
+        analysis_pool = ThreadPoolExecutor(max_workers=self.analysis_concurrency, thread_name_prefix="batch-analysis")
+        pending = 0
+
+        def analyze_entry(entry: Dict, summary: Dict) -> str:
+            analysis_started = time.monotonic()
+            try:
+                return analyze(summary)
+            finally:
+                entry["analysis_ms"] = round((time.monotonic() - analysis_started) * 1000)
+
+        def on_analyzed(entry: Dict, summary: Dict, future: Future):
+            try:
+                done.put((entry, summary, future.result(), None))
+            except Exception as e:
+                logger.error(f"Batch analysis failed for {entry['name']}: {e}")
+                done.put((entry, summary, None, None))
+
+        def on_extracted(entry: Dict, pool: ProcessPoolExecutor, future: Future):
+            try:
+                summary = future.result()
+            except BrokenProcessPool as e:
+                self._reset_pool(pool)
+                done.put((entry, None, None, f"Extraction worker failed: {e}"))
+                return
+            except Exception as e:
+                done.put((entry, None, None, f"Failed to extract text: {e}"))
+                return
+            if not summary["valid"]:
+                done.put((entry, None, None, summary["error"]))
+                return
+            entry["extract_ms"] = summary.pop("extract_ms")
+            try:
+                analysis = analysis_pool.submit(analyze_entry, entry, summary)
+            except RuntimeError as e:
+                done.put((entry, None, None, str(e)))
+                return
+            analysis.add_done_callback(lambda f: on_analyzed(entry, summary, f))
+
+        def finish(entry: Dict, summary: Optional[Dict], analysis: Optional[str], error: Optional[str]):
+            if error is None:
+                store_started = time.monotonic()
+                try:
+                    entry.update(store(entry, summary, analysis))
+                    entry["status"] = "ok"
+                except Exception as e:
+                    logger.error(f"Failed to store batch file {entry['name']}: {e}")
+                    error = "Failed to store document"
+                entry["store_ms"] = round((time.monotonic() - store_started) * 1000)
+            if error is not None:
+                entry.update({"status": "error", "error": error})
+                if os.path.exists(entry["file_path"]):
+                    os.remove(entry["file_path"])
+            entry["total_ms"] = round((time.monotonic() - entry.pop("_queued_at")) * 1000) + entry["receive_ms"]
+            del entry["file_path"]
+
+        def drain(block: bool):
+            nonlocal pending
+            while pending:
+                try:
+                    item = done.get(block=block)
+                except queue.Empty:
+                    return
+                pending -= 1
+                finish(*item)
+
+        try:
+            for entry in entries:
+                entry["index"] = len(manifest)
+                manifest.append(entry)
+                if entry["status"] != "received":
+                    continue
+
+                self.start_extraction(entry, spill_threshold)
+                pool, future = entry.pop("_extraction")
+                future.add_done_callback(lambda f, entry=entry, pool=pool: on_extracted(entry, pool, f))
+                pending += 1
+                # Store whatever has finished while later files are still arriving
+                drain(block=False)
+            drain(block=True)
+        finally:
+            analysis_pool.shutdown(wait=False, cancel_futures=True)
+
+        statuses = [entry["status"] for entry in manifest]
+        return {
+            "total": len(manifest),
+            "succeeded": statuses.count("ok"),
+            "failed": statuses.count("error"),
+            "skipped": statuses.count("skipped"),
+            "duration_ms": round((time.monotonic() - started) * 1000),
+            "files": manifest
+        }
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Load test and benchmark suite for Wiko Cutlery Chatbot
+Runs the Flask app in-process on the mock backend, whose latency, token rate
+and failure behaviour are configurable, drives a mix of chat, translation,
+email and PDF upload traffic at fixed concurrency levels and reports
+throughput and p50/p95/p99 latency per endpoint. Results can be stored as a
+baseline so later runs show regressions as numbers.
+
+Examples:
+    python benchmark.py --concurrency 1,4,16 --requests 200
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --compare benchmarks/baseline.json
+    python benchmark.py --backend mock-http --tokens-per-second 40 --disconnect-rate 0.02
+    python benchmark.py --server asgi --concurrency 64,256 --mix chat=100
+    python benchmark.py --url http://localhost:5000 --username alice --password secret
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+DEFAULT_MIX = "chat=60,translate=15,email=15,upload=10"
+
+CHAT_MESSAGES = [
+    "How should customers care for a carbon steel chef knife?",
+    "What is the difference between forged and stamped blades?",
+    "Summarise the return policy for damaged cutlery sets.",
+    "A customer asks whether our knives are dishwasher safe. What should I say?",
+    "Which knife set would you recommend for a restaurant kitchen?",
+    "How do I handle a customer whose order arrived two weeks late?",
+]
+
+TRANSLATION_TEXTS = [
+    "Thank you for your purchase. Your order will be shipped within 2 business days.",
+    "We are sorry to hear that your knife arrived damaged.",
+    "Please find attached the invoice for your recent order.",
+]
+
+CUSTOMER_MESSAGES = [
+    "The handle of my santoku knife came loose after a month.",
+    "My order has not arrived yet and the tracking number does not work.",
+    "The blade of my paring knife shows rust spots after washing.",
+]
+
+DOCUMENT_TEXT = (
+    "Supplier agreement between Wiko Cutlery and Nordic Steel GmbH. "
+    "Delivery terms are 14 days from order confirmation. "
+    "Total contract value EUR 12,000 payable by 2025-03-31."
+)
+
+
+def parse_mix(spec):
+    """Parse 'chat=60,translate=15' into (operations, weights)"""
+    operations, weights = [], []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Choose from: {', '.join(OPERATIONS)}")
+        operations.append(name)
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+def make_pdf():
+    """Build a one-page PDF in memory for upload requests"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 520, 770), DOCUMENT_TEXT)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class Client:
+    """One simulated employee with its own HTTP session and chat session"""
+
+    def __init__(self, base_url, username, password, rng, pdf_bytes):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.rng = rng
+        self.pdf_bytes = pdf_bytes
+
+        response = self.http.post(f"{base_url}/api/auth/login", json={
+            'username': username,
+            'password': password
+        })
+        response.raise_for_status()
+        response = self.http.post(f"{base_url}/api/chat/sessions", json={'session_name': 'Benchmark'})
+        response.raise_for_status()
+        self.session_id = response.json()['id']
+
+    def chat(self):
+        return self.http.post(
+            f"{self.base_url}/api/chat/sessions/{self.session_id}/messages",
+            json={'message': self.rng.choice(CHAT_MESSAGES)}
+        )
+
+    def translate(self):
+        return self.http.post(f"{self.base_url}/api/translate", json={
+            'text': self.rng.choice(TRANSLATION_TEXTS),
+            'target_lang': self.rng.choice(['de', 'fr'])
+        })
+
+    def email(self):
+        return self.http.post(f"{self.base_url}/api/email/generate", json={
+            'email_type': 'complaint_response',
+            'customer_message': self.rng.choice(CUSTOMER_MESSAGES),
+            'order_number': f"WK-{self.rng.randint(10000, 99999)}"
+        })
+
+    def upload(self):
+        return self.http.post(
+            f"{self.base_url}/api/upload/pdf",
+            files={'file': ('supplier_agreement.pdf', self.pdf_bytes, 'application/pdf')}
+        )
+
+
+OPERATIONS = {
+    'chat': Client.chat,
+    'translate': Client.translate,
+    'email': Client.email,
+    'upload': Client.upload,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, duration):
+    """Aggregate (operation, latency_ms, ok) samples into per-endpoint statistics"""
+    endpoints = {}
+    for operation in sorted({sample[0] for sample in samples}):
+        latencies = sorted(latency for name, latency, _ in samples if name == operation)
+        errors = sum(1 for name, _, ok in samples if name == operation and not ok)
+        endpoints[operation] = {
+            'count': len(latencies),
+            'errors': errors,
+            'error_rate': round(errors / len(latencies), 4),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+        }
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(samples) / duration, 3) if duration else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def run_level(base_url, args, concurrency, operations, weights, pdf_bytes):
+    """Run one concurrency level and return its summary"""
+    plan_rng = random.Random(f"{args.seed}:{concurrency}")
+    plan = plan_rng.choices(operations, weights=weights, k=args.requests)
+
+    # Log in every client before the clock starts
+    clients = [
+        Client(base_url, args.username, args.password, random.Random(f"{args.seed}:{concurrency}:{i}"), pdf_bytes)
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        for _ in range(args.warmup):
+            OPERATIONS['chat'](client)
+
+    work = queue.Queue()
+    for operation in plan:
+        work.put(operation)
+
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker(client):
+        while True:
+            try:
+                operation = work.get_nowait()
+            except queue.Empty:
+                return
+            started = time.perf_counter()
+            try:
+                response = OPERATIONS[operation](client)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            latency_ms = (time.perf_counter() - started) * 1000
+            with samples_lock:
+                samples.append((operation, latency_ms, ok))
+
+    threads = [threading.Thread(target=worker, args=(client,), daemon=True) for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    for client in clients:
+        client.http.close()
+    return summarize(samples, duration)
+
+
+def start_local_server(args):
+    """Start the app on an ephemeral port with a mock backend.
+
+    Returns (base_url, stop). With --backend mock-http the app talks to a
+    MockOllamaServer through the real OllamaClient; otherwise the mock
+    service object is used in-process. --server asgi serves src.asgi with
+    uvicorn instead of the threaded werkzeug server.
+    """
+    workdir = tempfile.mkdtemp(prefix='wiko-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DOCUMENT_INDEX_DIR'] = os.path.join(workdir, 'vector_index')
+    os.environ['OLLAMA_MAX_CONCURRENCY'] = str(args.llm_concurrency)
+
+    mock_server = None
+    if args.backend == 'mock-http':
+        from src.services.mock_ollama import MockLatencyProfile
+        from src.services.mock_ollama_server import MockOllamaServer
+
+        mock_server = MockOllamaServer(
+            port=0,
+            latency_profile=MockLatencyProfile(
+                latency_ms=args.latency_ms,
+                tokens_per_second=args.tokens_per_second,
+                jitter=args.jitter,
+                failure_rate=args.failure_rate,
+                seed=args.seed
+            ),
+            disconnect_rate=args.disconnect_rate,
+            seed=args.seed
+        ).start()
+        os.environ['USE_MOCK_SERVICES'] = 'false'
+        os.environ['LLM_BACKEND'] = 'ollama'
+        os.environ['OLLAMA_URL'] = mock_server.url
+    else:
+        os.environ['USE_MOCK_SERVICES'] = 'true'
+        os.environ['MOCK_OLLAMA_LATENCY_MS'] = str(args.latency_ms)
+        os.environ['MOCK_OLLAMA_TOKENS_PER_SECOND'] = str(args.tokens_per_second)
+        os.environ['MOCK_OLLAMA_LATENCY_JITTER'] = str(args.jitter)
+        os.environ['MOCK_OLLAMA_FAILURE_RATE'] = str(args.failure_rate)
+        os.environ['MOCK_OLLAMA_SEED'] = str(args.seed)
+    if args.no_cache:
+        os.environ['SEMANTIC_CACHE_ENABLED'] = 'false'
+
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.employee import Employee, db
+
+    with app.app_context():
+        if not Employee.query.filter_by(username=args.username).first():
+            employee = Employee(username=args.username, email=f"{args.username}@benchmark.local",
+                                department='Benchmark')
+            employee.set_password(args.password)
+            db.session.add(employee)
+            db.session.commit()
+
+    # Uploads are written below the app root, keep them in the scratch directory
+    app.root_path = workdir
+
+    if args.server == 'asgi':
+        import socket
+        import uvicorn
+        from src.asgi import app as asgi_app
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(
+            asgi_app,
+            log_level='info' if args.verbose else 'warning',
+            access_log=args.verbose,
+            backlog=4096
+        ))
+        thread = threading.Thread(target=server.run, kwargs={'sockets': [listener]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def shutdown():
+            server.should_exit = True
+            thread.join()
+    else:
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        port = server.server_port
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        shutdown = server.shutdown
+
+    def stop():
+        shutdown()
+        if mock_server is not None:
+            mock_server.stop()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of results against a baseline"""
+    regressions = []
+    for level, current in results['levels'].items():
+        previous = baseline.get('levels', {}).get(level)
+        if previous is None:
+            continue
+        if previous['throughput_rps'] and \
+                current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(
+                f"c={level} throughput {previous['throughput_rps']:.2f} -> {current['throughput_rps']:.2f} req/s"
+            )
+        for endpoint, stats in current['endpoints'].items():
+            before = previous['endpoints'].get(endpoint)
+            if before is None:
+                continue
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                if stats[key] > before[key] * (1 + tolerance):
+                    regressions.append(
+                        f"c={level} {endpoint} {key} {before[key]:.1f} -> {stats[key]:.1f} ms"
+                    )
+            if stats['error_rate'] > before['error_rate'] + tolerance / 10:
+                regressions.append(
+                    f"c={level} {endpoint} error rate {before['error_rate']:.2%} -> {stats['error_rate']:.2%}"
+                )
+    return regressions
+
+
+def print_level(concurrency, summary):
+    print(f"\nConcurrency {concurrency}: {summary['requests']} requests in {summary['duration_s']:.2f}s "
+          f"({summary['throughput_rps']:.2f} req/s, {summary['errors']} errors)")
+    print(f"  {'endpoint':<10} {'count':>6} {'errors':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for endpoint, stats in summary['endpoints'].items():
+        print(f"  {endpoint:<10} {stats['count']:>6} {stats['errors']:>6} "
+              f"{stats['mean_ms']:>7.1f}ms {stats['p50_ms']:>7.1f}ms "
+              f"{stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Wiko Cutlery Chatbot API")
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per concurrency level')
+    parser.add_argument('--warmup', type=int, default=1, help='Untimed chat requests per client before each level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Traffic mix (default: {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the traffic plan and mock latencies')
+    parser.add_argument('--url', help='Benchmark a running server instead of starting one')
+    parser.add_argument('--username', default='benchmark')
+    parser.add_argument('--password', default='benchmark')
+
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                        help='Local server: threaded werkzeug (wsgi) or uvicorn with src.asgi (asgi)')
+
+    mock = parser.add_argument_group('mock backend (local server only)')
+    mock.add_argument('--backend', choices=['mock', 'mock-http'], default='mock',
+                      help='In-process mock service, or the real Ollama client against a mock HTTP server')
+    mock.add_argument('--latency-ms', type=float, default=200.0, help='Base latency per LLM call')
+    mock.add_argument('--tokens-per-second', type=float, default=0.0, help='Simulated generation speed (0 = off)')
+    mock.add_argument('--jitter', type=float, default=0.25, help='Log-normal sigma applied to every delay')
+    mock.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of LLM calls that fail')
+    mock.add_argument('--disconnect-rate', type=float, default=0.0,
+                      help='Fraction of streamed responses dropped midway (mock-http only)')
+    mock.add_argument('--llm-concurrency', type=int, default=2, help='Concurrent LLM slots (OLLAMA_MAX_CONCURRENCY)')
+    mock.add_argument('--no-cache', action='store_true', help='Disable the semantic response cache')
+
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Store results as the new baseline')
+    parser.add_argument('--compare', metavar='PATH', help='Compare results against a stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='Allowed relative slowdown before a result counts as a regression')
+    parser.add_argument('--verbose', action='store_true', help='Show application logs')
+    args = parser.parse_args()
+
+    operations, weights = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    if not args.verbose:
+        # Injected failures are logged as errors by the app; they are counted below instead
+        logging.disable(logging.ERROR)
+
+    stop = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        base_url, stop = start_local_server(args)
+
+    pdf_bytes = make_pdf() if 'upload' in operations else b''
+
+    results = {
+        'created_at': datetime.utcnow().isoformat(),
+        'config': {
+            'mix': args.mix,
+            'requests': args.requests,
+            'seed': args.seed,
+            'target': args.url or 'local',
+            'server': None if args.url else args.server,
+            'mock_backend': None if args.url else {
+                'backend': args.backend,
+                'latency_ms': args.latency_ms,
+                'tokens_per_second': args.tokens_per_second,
+                'jitter': args.jitter,
+                'failure_rate': args.failure_rate,
+                'disconnect_rate': args.disconnect_rate,
+                'llm_concurrency': args.llm_concurrency,
+                'semantic_cache': not args.no_cache,
+            },
+        },
+        'levels': {},
+    }
+
+    print(f"Benchmarking {base_url} with mix {args.mix}")
+    try:
+        for concurrency in levels:
+            summary = run_level(base_url, args, concurrency, operations, weights, pdf_bytes)
+            results['levels'][str(concurrency)] = summary
+            print_level(concurrency, summary)
+    finally:
+        if stop is not None:
+            stop()
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("\nWarning: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\n✅ No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
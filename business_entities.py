@@ -0,0 +1,235 @@
+"""
+Normalized business entities of uploaded documents
+The dates, amounts, emails, phone numbers, companies and key terms found by
+PDFProcessor.analyze_business_content are normalized (ISO dates, numeric
+amounts with an ISO currency code, lowercase identifiers) and stored as
+DocumentEntity rows at upload. Questions like "documents mentioning amounts
+over €10k with a date in Q4" then become indexed range queries instead of
+re-extracting PDFs.
+"""
+
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.models.employee import DocumentEntity, UploadedDocument, db
+
+# analyze_business_content key -> DocumentEntity.kind
+ENTITY_KINDS = {
+    'dates': 'date',
+    'amounts': 'amount',
+    'emails': 'email',
+    'phone_numbers': 'phone',
+    'companies': 'company',
+    'key_terms': 'key_term'
+}
+
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1
+)}
+
+CURRENCY_MARKERS = (
+    ('$', 'USD'), ('€', 'EUR'), ('£', 'GBP'),
+    ('usd', 'USD'), ('dollar', 'USD'), ('eur', 'EUR'), ('gbp', 'GBP')
+)
+
+AMOUNT_NUMBER = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?')
+QUARTER_PATTERN = re.compile(r'^(\d{4})-?Q([1-4])$', re.IGNORECASE)
+
+MAX_VALUE_LENGTH = 255
+
+
+class EntityQueryError(ValueError):
+    """Raised for malformed search criteria"""
+
+
+def normalize_date(raw: str, day_first: bool = False) -> Optional[date]:
+    """Parse a date as matched by analyze_business_content, or None if it is not a valid date.
+
+    Numeric dates with the year last are read as month/day unless day_first is
+    set; a part greater than 12 settles the order either way.
+    """
+    raw = raw.strip()
+    try:
+        match = re.match(r'^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$', raw)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        match = re.match(r'^(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})$', raw)
+        if match:
+            first, second, year = (int(part) for part in match.groups())
+            if len(match.group(3)) == 2:
+                year += 2000 if year < 70 else 1900
+            elif len(match.group(3)) == 3:
+                return None
+            if first > 12 or (day_first and second <= 12):
+                first, second = second, first
+            return date(year, first, second)
+
+        match = re.match(r'^([A-Za-z]+) (\d{1,2}),? (\d{4})$', raw)
+        if match:
+            month = MONTHS.get(match.group(1)[:3].lower())
+            if month:
+                return date(int(match.group(3)), month, int(match.group(2)))
+    except ValueError:
+        pass
+    return None
+
+
+def normalize_amount(raw: str) -> Optional[Tuple[float, Optional[str]]]:
+    """(amount, ISO currency code or None) of a monetary amount"""
+    number = AMOUNT_NUMBER.search(raw)
+    if not number:
+        return None
+
+    lowered = raw.lower()
+    currency = next((code for marker, code in CURRENCY_MARKERS if marker in lowered), None)
+    return float(number.group(0).replace(',', '')), currency
+
+
+def normalize_entity(kind: str, raw: str, day_first: bool = False) -> Optional[Dict]:
+    """Column values for one entity, or None if it cannot be normalized"""
+    raw = raw.strip()[:MAX_VALUE_LENGTH]
+    if not raw:
+        return None
+    entity = {'kind': kind, 'value': raw}
+
+    if kind == 'date':
+        parsed = normalize_date(raw, day_first)
+        if parsed is None:
+            return None
+        entity['date_value'] = parsed
+        entity['normalized_value'] = parsed.isoformat()
+    elif kind == 'amount':
+        parsed = normalize_amount(raw)
+        if parsed is None:
+            return None
+        entity['amount'], entity['currency'] = parsed
+        entity['normalized_value'] = f"{entity['amount']:.2f} {entity['currency'] or ''}".strip()
+    elif kind == 'phone':
+        digits = re.sub(r'\D', '', raw)
+        if not digits:
+            return None
+        entity['normalized_value'] = digits
+    else:
+        entity['normalized_value'] = ' '.join(raw.lower().split())
+    return entity
+
+
+def entities_from_analysis(analysis: Dict[str, Iterable[str]], day_first: bool = False) -> List[Dict]:
+    """Normalized, de-duplicated entities of an analyze_business_content result"""
+    entities = {}
+    for key, kind in ENTITY_KINDS.items():
+        for raw in analysis.get(key, []):
+            entity = normalize_entity(kind, raw, day_first)
+            if entity is not None:
+                entities.setdefault((kind, entity['normalized_value']), entity)
+    return list(entities.values())
+
+
+def add_document_entities(document: UploadedDocument, analysis: Dict[str, Iterable[str]],
+                          day_first: bool = False) -> int:
+    """Add the document's entities to the session; the caller commits"""
+    entities = entities_from_analysis(analysis, day_first)
+    for entity in entities:
+        db.session.add(DocumentEntity(document=document, employee_id=document.employee_id, **entity))
+    return len(entities)
+
+
+def parse_date(value: str, name: str) -> date:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise EntityQueryError(f"{name} must be a date in YYYY-MM-DD format")
+
+
+def quarter_range(quarter: str) -> Tuple[date, date]:
+    """First and last day of a quarter given as "2024-Q4" """
+    match = QUARTER_PATTERN.match(quarter.strip())
+    if not match:
+        raise EntityQueryError("quarter must look like 2024-Q4")
+    year, number = int(match.group(1)), int(match.group(2))
+    start = date(year, 3 * number - 2, 1)
+    end = date(year + 1, 1, 1) if number == 4 else date(year, 3 * number + 1, 1)
+    return start, date.fromordinal(end.toordinal() - 1)
+
+
+def parse_amount(value: str, name: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        raise EntityQueryError(f"{name} must be a number")
+
+
+def build_criteria(args) -> Dict[str, List]:
+    """Entity conditions per criterion from request arguments.
+
+    Supported: min_amount, max_amount, currency; date_from, date_to, quarter;
+    company, email, phone, key_term. A document must match every criterion
+    given, each one through a single entity.
+    """
+    criteria = {}
+
+    amount = [DocumentEntity.kind == 'amount']
+    if args.get('min_amount'):
+        amount.append(DocumentEntity.amount >= parse_amount(args['min_amount'], 'min_amount'))
+    if args.get('max_amount'):
+        amount.append(DocumentEntity.amount <= parse_amount(args['max_amount'], 'max_amount'))
+    if args.get('currency'):
+        amount.append(DocumentEntity.currency == args['currency'].upper())
+    if len(amount) > 1:
+        criteria['amount'] = amount
+
+    dates = [DocumentEntity.kind == 'date']
+    if args.get('quarter'):
+        start, end = quarter_range(args['quarter'])
+        dates.extend([DocumentEntity.date_value >= start, DocumentEntity.date_value <= end])
+    if args.get('date_from'):
+        dates.append(DocumentEntity.date_value >= parse_date(args['date_from'], 'date_from'))
+    if args.get('date_to'):
+        dates.append(DocumentEntity.date_value <= parse_date(args['date_to'], 'date_to'))
+    if len(dates) > 1:
+        criteria['date'] = dates
+
+    for kind in ('company', 'email', 'phone', 'key_term'):
+        if args.get(kind):
+            normalized = normalize_entity(kind, args[kind])
+            if normalized is None:
+                raise EntityQueryError(f"Invalid {kind}")
+            criteria[kind] = [
+                DocumentEntity.kind == kind,
+                DocumentEntity.normalized_value == normalized['normalized_value']
+            ]
+
+    if not criteria:
+        raise EntityQueryError(
+            "Give at least one of min_amount, max_amount, currency, date_from, date_to, "
+            "quarter, company, email, phone, key_term"
+        )
+    return criteria
+
+
+def search_documents(employee_id: int, criteria: Dict[str, List], limit: int = 50) -> List[Dict]:
+    """The employee's active documents matching all criteria, newest first, with the matching entities"""
+    matches: Dict[int, Dict[str, List[Dict]]] = {}
+    document_ids = None
+    for name, conditions in criteria.items():
+        # Each criterion is one range or equality scan on a (employee_id, kind, ...) index
+        entities = db.session.execute(
+            select(DocumentEntity).where(DocumentEntity.employee_id == employee_id, *conditions)
+        ).scalars().all()
+        matched_ids = {entity.document_id for entity in entities}
+        document_ids = matched_ids if document_ids is None else document_ids & matched_ids
+        for entity in entities:
+            matches.setdefault(entity.document_id, {}).setdefault(name, []).append(entity.to_dict())
+        if not document_ids:
+            return []
+
+    documents = UploadedDocument.query.filter(
+        UploadedDocument.id.in_(document_ids),
+        UploadedDocument.expires_at > datetime.utcnow()
+    ).order_by(UploadedDocument.uploaded_at.desc()).limit(limit).all()
+
+    return [{'document': document.to_dict(), 'matches': matches[document.id]} for document in documents]
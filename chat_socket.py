@@ -0,0 +1,282 @@
+"""
+WebSocket chat channel for Wiko Cutlery Chatbot
+One connection per browser tab carries sent messages, streamed reply tokens
+and pushed session-list updates. The employee is authenticated once from the
+Flask session cookie when the socket connects, instead of on every message.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Set
+
+from src.models.employee import ChatSession, ChatMessage, db
+from src.routes.chatbot import chatbot_bp, chatbot_service, prepare_chat_turn, finish_chat_turn
+from src.utils.identity_cache import EmployeeSnapshot, current_identity
+from src.utils.metrics import metrics, time_stage
+
+try:
+    from flask_sock import Sock
+except ImportError:  # pragma: no cover - WebSocket chat is optional
+    Sock = None
+
+logger = logging.getLogger(__name__)
+
+sock = Sock() if Sock is not None else None
+
+open_connections = metrics.gauge('wiko_websocket_connections', 'Open chat WebSocket connections')
+
+
+class ChatConnection:
+    """A WebSocket plus the employee it was authenticated as"""
+
+    def __init__(self, ws, employee: EmployeeSnapshot):
+        self.ws = ws
+        self.employee_id = employee.id
+        self.employee = employee.to_dict()
+        # Sessions this employee may post to, so messages skip the ownership query
+        self.session_ids: Set[int] = set()
+        self._send_lock = threading.Lock()
+
+    def send(self, event: Dict):
+        # Pushes from other connections can race with this connection's own token stream
+        with self._send_lock:
+            self.ws.send(json.dumps(event))
+
+
+class ConnectionRegistry:
+    """Open connections per employee, used to push session updates to every tab"""
+
+    def __init__(self):
+        self._connections: Dict[int, Set[ChatConnection]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, connection: ChatConnection):
+        with self._lock:
+            self._connections.setdefault(connection.employee_id, set()).add(connection)
+            open_connections.set(sum(len(group) for group in self._connections.values()))
+
+    def remove(self, connection: ChatConnection):
+        with self._lock:
+            group = self._connections.get(connection.employee_id, set())
+            group.discard(connection)
+            if not group:
+                self._connections.pop(connection.employee_id, None)
+            open_connections.set(sum(len(group) for group in self._connections.values()))
+
+    def broadcast(self, employee_id: int, event: Dict):
+        with self._lock:
+            targets = list(self._connections.get(employee_id, ()))
+        for connection in targets:
+            try:
+                if event.get('type') == 'session_updated':
+                    connection.session_ids.add(event['session']['id'])
+                connection.send(event)
+            except Exception as e:
+                logger.warning(f"Failed to push update to WebSocket: {e}")
+
+
+connections = ConnectionRegistry()
+
+
+def _list_sessions(connection: ChatConnection):
+    sessions = ChatSession.query.filter_by(
+        employee_id=connection.employee_id,
+        is_active=True
+    ).order_by(ChatSession.updated_at.desc()).all()
+    connection.session_ids = {chat_session.id for chat_session in sessions}
+    return [chat_session.to_dict() for chat_session in sessions]
+
+
+def _get_session(connection: ChatConnection, session_id):
+    if not isinstance(session_id, int) or isinstance(session_id, bool):
+        return None
+    if session_id in connection.session_ids:
+        return db.session.get(ChatSession, session_id)
+    # Sessions created over plain HTTP since the socket connected
+    with time_stage('db_query'):
+        chat_session = ChatSession.query.filter_by(
+            id=session_id,
+            employee_id=connection.employee_id
+        ).first()
+    if chat_session is not None:
+        connection.session_ids.add(chat_session.id)
+    return chat_session
+
+
+def handle_list_sessions(connection: ChatConnection, data: Dict):
+    connection.send({'type': 'sessions', 'sessions': _list_sessions(connection)})
+
+
+def handle_create_session(connection: ChatConnection, data: Dict):
+    chat_session = ChatSession(
+        employee_id=connection.employee_id,
+        session_name=data.get('session_name') or f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    )
+    db.session.add(chat_session)
+    db.session.commit()
+    connection.session_ids.add(chat_session.id)
+    connections.broadcast(connection.employee_id, {
+        'type': 'session_updated',
+        'session': chat_session.to_dict()
+    })
+
+
+def handle_get_messages(connection: ChatConnection, data: Dict):
+    chat_session = _get_session(connection, data.get('session_id'))
+    if chat_session is None:
+        connection.send({'type': 'error', 'request_id': data.get('request_id'), 'error': 'Session not found'})
+        return
+    messages = ChatMessage.query.filter_by(
+        session_id=chat_session.id
+    ).order_by(ChatMessage.timestamp.asc()).all()
+    connection.send({
+        'type': 'messages',
+        'session_id': chat_session.id,
+        'messages': [message.to_dict() for message in messages]
+    })
+
+
+def handle_send_message(connection: ChatConnection, data: Dict):
+    request_id = data.get('request_id')
+    user_message = (data.get('message') or '').strip()
+    context_type = data.get('context_type', 'general')
+
+    chat_session = _get_session(connection, data.get('session_id'))
+    if chat_session is None:
+        connection.send({'type': 'error', 'request_id': request_id, 'error': 'Session not found'})
+        return
+    if not user_message:
+        connection.send({'type': 'error', 'request_id': request_id, 'error': 'Message cannot be empty'})
+        return
+
+    try:
+        user_msg, conversation_history, prompt, relevant_chunks = prepare_chat_turn(
+            chat_session, connection.employee_id, user_message, context_type
+        )
+        # Commit now so the user message gets its id and timestamp before tokens arrive
+        db.session.commit()
+        connection.send({
+            'type': 'message_saved',
+            'request_id': request_id,
+            'session_id': chat_session.id,
+            'message': user_msg.to_dict()
+        })
+
+        final = {}
+        for event in chatbot_service.stream_response(
+            message=prompt,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            cache_text=user_message,
+            # Answers grounded in the employee's own documents are not shared
+            use_cache=not relevant_chunks
+        ):
+            if event.get('done'):
+                final = event
+                continue
+            connection.send({
+                'type': 'token',
+                'request_id': request_id,
+                'session_id': chat_session.id,
+                'content': event['content']
+            })
+
+        if final.get('error'):
+            logger.error(f"Error streaming AI response: {final['error']}")
+        response_content = final.get('content') or 'Sorry, I encountered an error.'
+        ai_msg = finish_chat_turn(chat_session, response_content, relevant_chunks)
+
+        connection.send({
+            'type': 'message_complete',
+            'request_id': request_id,
+            'session_id': chat_session.id,
+            'message': ai_msg.to_dict()
+        })
+        connections.broadcast(connection.employee_id, {
+            'type': 'session_updated',
+            'session': chat_session.to_dict()
+        })
+
+    except Exception as e:
+        logger.error(f"Error generating AI response: {e}")
+        db.session.rollback()
+        connection.send({'type': 'error', 'request_id': request_id, 'error': 'Failed to generate response'})
+
+
+HANDLERS = {
+    'list_sessions': handle_list_sessions,
+    'create_session': handle_create_session,
+    'get_messages': handle_get_messages,
+    'send_message': handle_send_message,
+}
+
+
+def chat_socket(ws):
+    """Chat WebSocket endpoint"""
+    employee = current_identity()
+    if employee is None:
+        ws.send(json.dumps({'type': 'error', 'error': 'Not authenticated'}))
+        ws.close(reason=1008, message='Not authenticated')
+        return
+
+    connection = ChatConnection(ws, employee)
+    connections.add(connection)
+    try:
+        connection.send({
+            'type': 'ready',
+            'employee': connection.employee,
+            'sessions': _list_sessions(connection)
+        })
+        # Release the connection-scoped DB session between messages
+        db.session.remove()
+
+        while True:
+            raw = ws.receive()
+            if raw is None:
+                break
+            try:
+                data = json.loads(raw)
+            except (TypeError, ValueError):
+                connection.send({'type': 'error', 'error': 'Invalid JSON'})
+                continue
+            if not isinstance(data, dict):
+                connection.send({'type': 'error', 'error': 'Message must be a JSON object'})
+                continue
+
+            if data.get('type') == 'ping':
+                connection.send({'type': 'pong'})
+                continue
+
+            handler = HANDLERS.get(data.get('type'))
+            if handler is None:
+                connection.send({
+                    'type': 'error',
+                    'request_id': data.get('request_id'),
+                    'error': f"Unknown message type: {data.get('type')}"
+                })
+                continue
+
+            try:
+                handler(connection, data)
+            except Exception as e:
+                # One failed request must not close the socket. If the socket itself failed,
+                # sending the error frame raises again and ends the loop.
+                logger.error(f"Error handling WebSocket {data.get('type')} message: {e}")
+                db.session.rollback()
+                connection.send({
+                    'type': 'error',
+                    'request_id': data.get('request_id'),
+                    'error': 'Request failed'
+                })
+            finally:
+                db.session.remove()
+    finally:
+        connections.remove(connection)
+
+
+if sock is not None:
+    sock.route('/chat/ws', bp=chatbot_bp)(chat_socket)
+else:
+    logger.info("flask-sock not installed, WebSocket chat disabled")
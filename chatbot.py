@@ -1,37 +1,109 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
 from werkzeug.utils import secure_filename
 import os
+import json
+import tempfile
 import uuid
 from datetime import datetime, timedelta
 import logging
+import time
 
-from src.models.employee import Employee, ChatSession, ChatMessage, UploadedDocument, db
+from src.models.employee import Employee, ChatSession, ChatMessage, UploadedDocument, DocumentEntity, db
 from src.services.ollama_client import ChatbotService
-from src.services.pdf_processor import PDFProcessor
+from src.services.business_entities import EntityQueryError, add_document_entities, build_criteria, search_documents
+from src.services.batch_ingestion import BatchIngestionService
+from src.services.document_artifacts import DocumentArtifacts, PageRangeError, parse_page_range
+from src.services.llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from src.services.pdf_processor import PDFProcessor, PDFUploadError
+from src.services.prompt_templates import prompt_registry
+from src.services.structured_output import SCHEMAS, structured_parser, render_sections
+from src.utils.identity_cache import current_identity, identity_cache
+from src.utils.metrics import metrics, request_duration, time_stage
 
 logger = logging.getLogger(__name__)
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
-# Initialize services using service configuration
-from src.utils.service_config import service_config
-chatbot_service = service_config.get_chatbot_service()
-pdf_processor = PDFProcessor()
-translation_service = service_config.get_translation_service(chatbot_service)
-email_service = service_config.get_email_service(chatbot_service)
+# Initialize services using service configuration. The LLM-backed services
+# probe the backend when they are built, so they are built on first use (or by
+# the warm-up thread started in main.py) rather than while workers import this module.
+from src.utils.service_config import LazyService, service_config
+chatbot_service = LazyService('chatbot service', service_config.get_chatbot_service)
+pdf_processor = PDFProcessor(text_spill_threshold=service_config.pdf_text_spill_chars)
+document_artifacts = DocumentArtifacts(service_config.document_artifacts_dir)
+translation_service = LazyService(
+    'translation service', lambda: service_config.get_translation_service(chatbot_service.get())
+)
+email_service = LazyService('email service', lambda: service_config.get_email_service(chatbot_service.get()))
+retrieval_service = LazyService(
+    'retrieval service', lambda: service_config.get_retrieval_service(chatbot_service.get())
+)
+lazy_services = (chatbot_service, retrieval_service, translation_service, email_service)
+batch_ingestion = BatchIngestionService(
+    pdf_processor,
+    document_artifacts,
+    workers=service_config.batch_ingest_workers or None,
+    analysis_concurrency=service_config.max_llm_concurrency,
+    max_files=service_config.batch_max_files
+)
 
 UPLOAD_FOLDER = 'uploads'
+# Allowance for multipart boundaries and small form fields around the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# Document text included in a re-analysis prompt
+REANALYSIS_MAX_CHARS = 12000
 ALLOWED_EXTENSIONS = {'pdf'}
 
+llm_queue_depth = metrics.gauge('wiko_llm_queue_depth', 'Requests waiting for an LLM slot', ['priority'])
+llm_in_flight = metrics.gauge('wiko_llm_in_flight', 'LLM calls currently running')
+
+@chatbot_bp.before_request
+def start_request_timer():
+    request.environ['wiko.request_started'] = time.perf_counter()
+
+@chatbot_bp.after_request
+def record_request_duration(response):
+    started = request.environ.get('wiko.request_started')
+    # WebSocket connections are long-lived, their messages are timed per stage instead
+    if started is not None and request.endpoint not in ('chatbot.get_metrics', 'chatbot.chat_socket'):
+        # Streaming responses are timed until the headers are ready
+        request_duration.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            method=request.method,
+            status=str(response.status_code)
+        )
+    return response
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def retrieve_document_context(employee_id, user_message, context_type):
+    """Find relevant chunks from the employee's active documents"""
+    if retrieval_service.get() is None or context_type == 'translation':
+        return []
+    
+    document_ids = [
+        row.id for row in db.session.query(UploadedDocument.id).filter(
+            UploadedDocument.employee_id == employee_id,
+            UploadedDocument.expires_at > datetime.utcnow()
+        )
+    ]
+    if not document_ids:
+        return []
+    
+    try:
+        with time_stage('document_retrieval'):
+            return retrieval_service.retrieve(employee_id, user_message, document_ids=document_ids)
+    except Exception as e:
+        logger.error(f"Document retrieval failed: {e}")
+        return []
+
 def get_current_employee():
-    """Get current logged-in employee"""
-    employee_id = session.get('employee_id')
-    if employee_id:
-        return Employee.query.get(employee_id)
-    return None
+    """Get current logged-in employee (a cached, read-only snapshot)"""
+    return current_identity()
 
 @chatbot_bp.route('/auth/login', methods=['POST'])
 def login():
@@ -49,6 +121,7 @@ def login():
         session['employee_id'] = employee.id
         employee.last_login = datetime.utcnow()
         db.session.commit()
+        identity_cache.invalidate(employee.id)
         
         return jsonify({
             'success': True,
@@ -130,41 +203,32 @@ def get_chat_messages(session_id):
     
     return jsonify([message.to_dict() for message in messages])
 
-@chatbot_bp.route('/chat/sessions/<int:session_id>/messages', methods=['POST'])
-def send_message(session_id):
-    """Send message to chatbot"""
-    employee = get_current_employee()
-    if not employee:
-        return jsonify({'error': 'Not authenticated'}), 401
-    
-    chat_session = ChatSession.query.filter_by(
-        id=session_id,
-        employee_id=employee.id
-    ).first()
+def prepare_chat_turn(chat_session, employee_id, user_message, context_type):
+    """Load history, stage the user message and build the prompt for one chat turn.
     
-    if not chat_session:
-        return jsonify({'error': 'Session not found'}), 404
-    
-    data = request.get_json()
-    user_message = data.get('message', '').strip()
-    context_type = data.get('context_type', 'general')
+    Returns (user_msg, conversation_history, prompt, relevant_chunks). The
+    user message is added to the DB session but not committed; callers commit
+    it before calling the model, so no write lock is held while it generates.
+    """
+    # Get conversation history for context (before adding the new message,
+    # which is sent separately)
+    with time_stage('history_load'):
+        recent_messages = ChatMessage.query.filter_by(
+            session_id=chat_session.id
+        ).order_by(ChatMessage.timestamp.desc()).limit(10).all()
     
-    if not user_message:
-        return jsonify({'error': 'Message cannot be empty'}), 400
+    # Pull in relevant excerpts from uploaded documents. Its queries run before
+    # the user message is staged, so they do not flush an INSERT.
+    relevant_chunks = retrieve_document_context(employee_id, user_message, context_type)
     
     # Save user message
     user_msg = ChatMessage(
-        session_id=session_id,
+        session_id=chat_session.id,
         message_type='user',
         content=user_message
     )
     db.session.add(user_msg)
     
-    # Get conversation history for context
-    recent_messages = ChatMessage.query.filter_by(
-        session_id=session_id
-    ).order_by(ChatMessage.timestamp.desc()).limit(10).all()
-    
     conversation_history = []
     for msg in reversed(recent_messages):
         role = "user" if msg.message_type == "user" else "assistant"
@@ -173,12 +237,84 @@ def send_message(session_id):
             "content": msg.content
         })
     
-    # Get AI response
+    prompt = user_message
+    if relevant_chunks:
+        prompt = prompt_registry.render(
+            "document_context",
+            excerpts="\n\n".join(
+                f"[Document {chunk['document_id']}, part {chunk['chunk_index'] + 1}]\n{chunk['text']}"
+                for chunk in relevant_chunks
+            ),
+            question=user_message
+        )
+    
+    return user_msg, conversation_history, prompt, relevant_chunks
+
+def finish_chat_turn(chat_session, response_content, relevant_chunks):
+    """Save the assistant reply, bump the session timestamp and commit"""
+    ai_msg = ChatMessage(
+        session_id=chat_session.id,
+        message_type='assistant',
+        content=response_content,
+        message_metadata={
+            'sources': [
+                {
+                    'document_id': chunk['document_id'],
+                    'chunk_index': chunk['chunk_index'],
+                    'score': round(chunk['score'], 3)
+                }
+                for chunk in relevant_chunks
+            ]
+        } if relevant_chunks else None
+    )
+    db.session.add(ai_msg)
+    
+    # Update session timestamp
+    chat_session.updated_at = datetime.utcnow()
+    
+    with time_stage('db_commit'):
+        db.session.commit()
+    return ai_msg
+
+@chatbot_bp.route('/chat/sessions/<int:session_id>/messages', methods=['POST'])
+def send_message(session_id):
+    """Send message to chatbot"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    with time_stage('db_query'):
+        chat_session = ChatSession.query.filter_by(
+            id=session_id,
+            employee_id=employee.id
+        ).first()
+    
+    if not chat_session:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    data = request.get_json()
+    user_message = data.get('message', '').strip()
+    context_type = data.get('context_type', 'general')
+    
+    if not user_message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
     try:
+        user_msg, conversation_history, prompt, relevant_chunks = prepare_chat_turn(
+            chat_session, employee.id, user_message, context_type
+        )
+        # Commit before the model call, so the write lock is not held while it generates
+        with time_stage('db_commit'):
+            db.session.commit()
+        
+        # Get AI response
         ai_response = chatbot_service.get_response(
-            message=user_message,
+            message=prompt,
             context_type=context_type,
-            conversation_history=conversation_history
+            conversation_history=conversation_history,
+            cache_text=user_message,
+            # Answers grounded in the employee's own documents are not shared
+            use_cache=not relevant_chunks
         )
         
         if 'error' in ai_response:
@@ -190,18 +326,7 @@ def send_message(session_id):
             else:
                 response_content = ai_response.get('response', 'No response generated.')
         
-        # Save AI response
-        ai_msg = ChatMessage(
-            session_id=session_id,
-            message_type='assistant',
-            content=response_content
-        )
-        db.session.add(ai_msg)
-        
-        # Update session timestamp
-        chat_session.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        ai_msg = finish_chat_turn(chat_session, response_content, relevant_chunks)
         
         return jsonify({
             'user_message': user_msg.to_dict(),
@@ -213,6 +338,170 @@ def send_message(session_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to generate response'}), 500
 
+def receive_pdf_upload(upload_dir):
+    """Parse the multipart body, streaming the 'file' part through a PDFUploadSink.
+    
+    Unlike request.files, which spools the whole body before the route runs,
+    this stops reading as soon as the upload is known to be invalid. Returns
+    (upload, None) or (None, error message).
+    """
+    sinks = []
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if sinks:
+            raise PDFUploadError('Only one file can be uploaded at a time')
+        if not filename:
+            raise PDFUploadError('No file selected')
+        if not allowed_file(filename):
+            raise PDFUploadError('Only PDF files are allowed')
+        sink = pdf_processor.upload_sink(
+            os.path.join(upload_dir, f"{uuid.uuid4()}_{secure_filename(filename)}")
+        )
+        sinks.append(sink)
+        return sink
+    
+    parser = FormDataParser(stream_factory=stream_factory, max_form_memory_size=request.max_form_memory_size)
+    try:
+        _, _, files = parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+    except (PDFUploadError, RequestEntityTooLarge) as e:
+        for sink in sinks:
+            sink.abort()
+        if isinstance(e, RequestEntityTooLarge):
+            return None, f"File too large. Maximum size: {pdf_processor.max_file_size / (1024*1024):.1f}MB"
+        return None, str(e)
+    
+    file = files.get('file')
+    if file is None or file.stream not in sinks:
+        for sink in sinks:
+            sink.abort()
+        return None, 'No file provided'
+    
+    upload = file.stream.finish()
+    if not upload['valid']:
+        return None, upload['error']
+    upload['original_filename'] = secure_filename(file.filename)
+    return upload, None
+
+def pdf_analysis_prompt(pdf_summary):
+    """Analysis prompt for a summarized PDF"""
+    business_analysis = pdf_summary['business_analysis']
+    return prompt_registry.render(
+        "pdf_analysis",
+        page_count=pdf_summary['file_info']['page_count'],
+        word_count=pdf_summary['file_info']['word_count'],
+        dates=', '.join(business_analysis['dates'][:5]),
+        amounts=', '.join(business_analysis['amounts'][:5]),
+        companies=', '.join(business_analysis['companies'][:5]),
+        key_terms=', '.join(business_analysis['key_terms'][:10]),
+        text_preview=pdf_summary['text_preview']
+    )
+
+def run_pdf_analysis(pdf_summary, priority=PRIORITY_INTERACTIVE):
+    """LLM analysis of a summarized PDF"""
+    ai_analysis = chatbot_service.get_response(
+        message=pdf_analysis_prompt(pdf_summary),
+        context_type="pdf_analysis",
+        priority=priority
+    )
+    
+    analysis_summary = ai_analysis.get('response', 'Analysis completed')
+    if 'message' in ai_analysis:
+        analysis_summary = ai_analysis['message']['content']
+    return analysis_summary
+
+def save_uploaded_document(employee_id, file_path, original_filename, content_hash, pdf_summary, analysis_summary):
+    """Store the document record and its business entities"""
+    document = UploadedDocument(
+        employee_id=employee_id,
+        filename=os.path.basename(file_path),
+        original_filename=original_filename,
+        file_path=file_path,
+        file_size=pdf_summary['file_info']['file_size'],
+        mime_type='application/pdf',
+        expires_at=datetime.utcnow() + timedelta(days=30),
+        analysis_summary=analysis_summary,
+        content_hash=content_hash
+    )
+    
+    db.session.add(document)
+    add_document_entities(document, pdf_summary['business_analysis'], service_config.entity_dates_day_first)
+    with time_stage('db_commit'):
+        db.session.commit()
+    return document
+
+def save_analysis_summary(document_id, analysis_summary):
+    """Store an analysis generated after the document was saved.
+    
+    Takes the id, since a streamed response outlives the session the
+    document was loaded in.
+    """
+    try:
+        UploadedDocument.query.filter_by(id=document_id).update({'analysis_summary': analysis_summary})
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Failed to save analysis of document {document_id}: {e}")
+        db.session.rollback()
+
+def index_uploaded_document(employee_id, document_id, pages):
+    """Add a document's page texts to the retrieval index; failures are only logged"""
+    if retrieval_service.get() is None:
+        return
+    try:
+        with time_stage('document_indexing'):
+            retrieval_service.index_document(employee_id, document_id, pages)
+    except Exception as e:
+        logger.error(f"Failed to index document {document_id}: {e}")
+
+def receive_and_extract_pdf():
+    """Receive the uploaded PDF and extract it in one pass.
+    
+    Returns (upload, pdf_summary, None), or (None, None, error response) if
+    the upload is rejected. The caller closes pdf_summary['text'] and
+    removes upload['file_path'] if it fails later on.
+    """
+    if request.mimetype != 'multipart/form-data':
+        return None, None, (jsonify({'error': 'No file provided'}), 400)
+    if request.content_length and request.content_length > pdf_processor.max_file_size + UPLOAD_FORM_OVERHEAD:
+        return None, None, (jsonify({'error': f"File too large. Maximum size: {pdf_processor.max_file_size / (1024*1024):.1f}MB"}), 413)
+    
+    # Create upload directory
+    upload_dir = os.path.join(current_app.root_path, UPLOAD_FOLDER)
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    # Stream the file part straight into a validating sink
+    with time_stage('file_save'):
+        upload, error = receive_pdf_upload(upload_dir)
+    if error:
+        return None, None, (jsonify({'error': error}), 400)
+    
+    file_path = upload['file_path']
+    
+    # Process PDF from a memory-mapped view of the file just written, storing
+    # per-page text and layout in the same pass unless this file is already known
+    page_writer = None
+    if not document_artifacts.has_page_text(upload['sha256']):
+        page_writer = document_artifacts.page_text_writer(upload['sha256'])
+    try:
+        with time_stage('pdf_extraction'):
+            with pdf_processor.mapped(file_path) as pdf_buffer:
+                pdf_summary = pdf_processor.summarize_document(
+                    file_path, stream=pdf_buffer, page_writer=page_writer
+                )
+    except Exception:
+        if page_writer is not None:
+            page_writer.abort()
+        os.remove(file_path)
+        raise
+    
+    if not pdf_summary['valid']:
+        if page_writer is not None:
+            page_writer.abort()
+        os.remove(file_path)  # Clean up invalid file
+        return None, None, (jsonify({'error': pdf_summary['error']}), 400)
+    if page_writer is not None:
+        page_writer.commit()
+    return upload, pdf_summary, None
+
 @chatbot_bp.route('/upload/pdf', methods=['POST'])
 def upload_pdf():
     """Upload and analyze PDF document"""
@@ -220,86 +509,26 @@ def upload_pdf():
     if not employee:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'Only PDF files are allowed'}), 400
-    
     try:
-        # Create upload directory
-        upload_dir = os.path.join(current_app.root_path, UPLOAD_FOLDER)
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        # Save file
-        file.save(file_path)
-        
-        # Process PDF
-        pdf_summary = pdf_processor.get_document_summary(file_path)
-        
-        if not pdf_summary['valid']:
-            os.remove(file_path)  # Clean up invalid file
-            return jsonify({'error': pdf_summary['error']}), 400
+        upload, pdf_summary, error_response = receive_and_extract_pdf()
+        if error_response:
+            return error_response
         
-        # Analyze business content
-        business_analysis = pdf_processor.analyze_business_content(pdf_summary['full_text'])
+        file_path = upload['file_path']
+        # Page texts, kept in memory only up to the spill threshold
+        extracted = pdf_summary['text']
+        business_analysis = pdf_summary['business_analysis']
         
         # Generate AI analysis
-        analysis_prompt = f"""
-        Please analyze this PDF document and provide business insights:
-        
-        Document Info:
-        - Pages: {pdf_summary['file_info']['page_count']}
-        - Words: {pdf_summary['file_info']['word_count']}
-        
-        Content Preview:
-        {pdf_summary['text_preview']}
-        
-        Extracted Business Data:
-        - Dates found: {', '.join(business_analysis['dates'][:5])}
-        - Amounts found: {', '.join(business_analysis['amounts'][:5])}
-        - Companies mentioned: {', '.join(business_analysis['companies'][:5])}
-        - Key terms: {', '.join(business_analysis['key_terms'][:10])}
-        
-        Please provide:
-        1. Document summary
-        2. Key business insights
-        3. Important data points
-        4. Recommended actions or follow-ups
-        """
-        
-        ai_analysis = chatbot_service.get_response(
-            message=analysis_prompt,
-            context_type="pdf_analysis"
-        )
-        
-        analysis_summary = ai_analysis.get('response', 'Analysis completed')
-        if 'message' in ai_analysis:
-            analysis_summary = ai_analysis['message']['content']
+        analysis_summary = run_pdf_analysis(pdf_summary)
         
         # Save document record
-        document = UploadedDocument(
-            employee_id=employee.id,
-            filename=unique_filename,
-            original_filename=filename,
-            file_path=file_path,
-            file_size=pdf_summary['file_info']['file_size'],
-            mime_type='application/pdf',
-            expires_at=datetime.utcnow() + timedelta(days=30),
-            analysis_summary=analysis_summary
+        document = save_uploaded_document(
+            employee.id, file_path, upload['original_filename'], upload['sha256'], pdf_summary, analysis_summary
         )
         
-        db.session.add(document)
-        db.session.commit()
+        # Index the text so later questions can retrieve it without re-uploading
+        index_uploaded_document(employee.id, document.id, extracted.iter_pages())
         
         return jsonify({
             'success': True,
@@ -314,6 +543,206 @@ def upload_pdf():
         if 'file_path' in locals() and os.path.exists(file_path):
             os.remove(file_path)
         return jsonify({'error': 'Failed to process PDF'}), 500
+    finally:
+        if 'extracted' in locals():
+            extracted.close()
+
+@chatbot_bp.route('/upload/pdf/stream', methods=['POST'])
+def upload_pdf_stream():
+    """Upload a PDF and stream its analysis as NDJSON.
+    
+    The first event carries the stored document and the extraction results,
+    followed by {"type": "token"} events as the analysis is generated and a
+    final {"type": "complete"} event. The analysis text is saved to the
+    document once the stream completes, or as far as it got if the client
+    disconnects.
+    """
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        upload, pdf_summary, error_response = receive_and_extract_pdf()
+        if error_response:
+            return error_response
+        
+        extracted = pdf_summary['text']
+        try:
+            document = save_uploaded_document(
+                employee.id, upload['file_path'], upload['original_filename'], upload['sha256'], pdf_summary, None
+            )
+            index_uploaded_document(employee.id, document.id, extracted.iter_pages())
+            document_info = document.to_dict()
+        finally:
+            extracted.close()
+    except Exception as e:
+        logger.error(f"Error processing PDF upload: {e}")
+        db.session.rollback()
+        if 'upload' in locals() and upload and os.path.exists(upload['file_path']):
+            os.remove(upload['file_path'])
+        return jsonify({'error': 'Failed to process PDF'}), 500
+    
+    def generate():
+        parts = []
+        analysis_summary = None
+        try:
+            yield json.dumps({
+                'type': 'extracted',
+                'document': document_info,
+                'pdf_info': pdf_summary['file_info'],
+                'business_analysis': pdf_summary['business_analysis']
+            }) + '\n'
+            
+            final = {}
+            for event in chatbot_service.stream_response(
+                message=pdf_analysis_prompt(pdf_summary),
+                context_type="pdf_analysis"
+            ):
+                if event.get('done'):
+                    final = event
+                    continue
+                parts.append(event['content'])
+                yield json.dumps({'type': 'token', 'content': event['content']}) + '\n'
+            
+            if final.get('error'):
+                logger.error(f"Error streaming PDF analysis: {final['error']}")
+            analysis_summary = final.get('content') or ''.join(parts) or 'Analysis completed'
+            save_analysis_summary(document_info['id'], analysis_summary)
+            yield json.dumps({
+                'type': 'complete',
+                'success': True,
+                'document': {**document_info, 'analysis_summary': analysis_summary},
+                'ai_analysis': analysis_summary
+            }) + '\n'
+        except Exception as e:
+            logger.error(f"Error streaming PDF analysis: {e}")
+            db.session.rollback()
+            yield json.dumps({'type': 'error', 'error': 'PDF analysis failed'}) + '\n'
+        finally:
+            # Client went away or the backend failed: keep what was generated
+            if analysis_summary is None:
+                save_analysis_summary(document_info['id'], ''.join(parts) or 'Analysis completed')
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def receive_batch_upload(upload_dir):
+    """Parse a multipart body of PDF and ZIP parts.
+    
+    PDF parts are streamed straight into the upload directory and handed to
+    the extraction pool as each one completes; a bad PDF is recorded in its
+    part without stopping the rest. ZIP parts are spooled to
+    a temporary file, since their members can only be read once the central
+    directory at the end has arrived. Returns (parts, None) or (None, error
+    message).
+    """
+    parts = []
+    
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if not filename:
+            raise PDFUploadError('No file selected')
+        if len(parts) >= batch_ingestion.max_files:
+            raise PDFUploadError(f'Too many files. Maximum batch size: {batch_ingestion.max_files}')
+        if filename.lower().endswith('.zip'):
+            part = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, dir=upload_dir)
+            parts.append(('zip', secure_filename(filename), part))
+        elif allowed_file(filename):
+            part = batch_ingestion.upload_part(upload_dir, filename, service_config.pdf_text_spill_chars)
+            parts.append(('pdf', part.name, part))
+        else:
+            raise PDFUploadError(f'Only PDF and ZIP files are allowed: {filename}')
+        return part
+    
+    parser = FormDataParser(stream_factory=stream_factory, max_form_memory_size=request.max_form_memory_size)
+    try:
+        parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+    except (PDFUploadError, RequestEntityTooLarge) as e:
+        for kind, _, part in parts:
+            if kind == 'zip':
+                part.close()
+            else:
+                part.abort()
+        if isinstance(e, RequestEntityTooLarge):
+            return None, f"Batch too large. Maximum size: {service_config.batch_max_bytes / (1024*1024):.1f}MB"
+        return None, str(e)
+    
+    if not parts:
+        return None, 'No files provided'
+    return parts, None
+
+@chatbot_bp.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Upload several PDFs, as separate files or inside ZIP archives, and ingest them as one batch"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    if request.mimetype != 'multipart/form-data':
+        return jsonify({'error': 'No files provided'}), 400
+    # The app-wide request limit is sized for a single PDF
+    request.max_content_length = service_config.batch_max_bytes
+    if request.content_length and request.content_length > service_config.batch_max_bytes:
+        return jsonify({'error': f"Batch too large. Maximum size: {service_config.batch_max_bytes / (1024*1024):.1f}MB"}), 413
+    
+    upload_dir = os.path.join(current_app.root_path, UPLOAD_FOLDER)
+    os.makedirs(upload_dir, exist_ok=True)
+    
+    with time_stage('file_save'):
+        parts, error = receive_batch_upload(upload_dir)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    employee_id = employee.id
+    
+    def entries():
+        remaining = batch_ingestion.max_files - sum(1 for kind, _, _ in parts if kind == 'pdf')
+        for kind, name, part in parts:
+            if kind == 'zip':
+                for entry in batch_ingestion.stage_zip(part, name, upload_dir, remaining):
+                    if entry['status'] != 'skipped':
+                        remaining -= 1
+                    yield entry
+            else:
+                yield part.entry()
+    
+    def analyze(pdf_summary):
+        return run_pdf_analysis(pdf_summary, priority=PRIORITY_BATCH)
+    
+    def store(entry, pdf_summary, analysis_summary):
+        try:
+            document = save_uploaded_document(
+                employee_id, entry['file_path'], entry['name'], entry['sha256'],
+                pdf_summary, analysis_summary or 'Analysis completed'
+            )
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        # Index from the page text file the extraction worker wrote
+        try:
+            with document_artifacts.open_page_text(document, pdf_processor.write_page_text) as reader:
+                pages = (reader.text(page_num) for page_num in range(1, reader.page_count + 1))
+                index_uploaded_document(employee_id, document.id, (text for text in pages if text))
+        except Exception as e:
+            logger.error(f"Failed to index document {document.id}: {e}")
+        
+        return {
+            'document_id': document.id,
+            'page_count': pdf_summary['file_info']['page_count'],
+            'word_count': pdf_summary['file_info']['word_count']
+        }
+    
+    try:
+        with time_stage('batch_ingestion'):
+            manifest = batch_ingestion.ingest(entries(), analyze, store, service_config.pdf_text_spill_chars)
+    except Exception as e:
+        logger.error(f"Error ingesting PDF batch: {e}")
+        return jsonify({'error': 'Failed to process batch'}), 500
+    finally:
+        for kind, _, part in parts:
+            if kind == 'zip':
+                part.close()
+    
+    return jsonify({'success': True, **manifest})
 
 @chatbot_bp.route('/documents', methods=['GET'])
 def get_documents():
@@ -330,6 +759,269 @@ def get_documents():
     
     return jsonify([doc.to_dict() for doc in documents])
 
+@chatbot_bp.route('/documents/search', methods=['GET'])
+def search_document_entities():
+    """Documents by the business data they mention, e.g. ?min_amount=10000&currency=EUR&quarter=2024-Q4"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        criteria = build_criteria(request.args)
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        results = search_documents(employee.id, criteria, limit)
+    except EntityQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching document entities: {e}")
+        return jsonify({'error': 'Document search failed'}), 500
+    
+    return jsonify({'count': len(results), 'documents': results})
+
+def get_active_document(employee, document_id):
+    """The employee's document if it exists and has not expired"""
+    return UploadedDocument.query.filter_by(
+        id=document_id,
+        employee_id=employee.id
+    ).filter(
+        UploadedDocument.expires_at > datetime.utcnow()
+    ).first()
+
+@chatbot_bp.route('/documents/<int:document_id>/text', methods=['GET'])
+def get_document_text(document_id):
+    """Extracted text of a document, optionally for ?pages=1-3,5 and with layout blocks (?blocks=true)"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    include_blocks = request.args.get('blocks', 'false').lower() == 'true'
+    try:
+        with document_artifacts.open_page_text(document, pdf_processor.write_page_text) as reader:
+            pages = parse_page_range(request.args.get('pages'), reader.page_count)
+            page_results = []
+            for page in pages:
+                page_result = {'page': page, 'text': reader.text(page)}
+                if include_blocks:
+                    page_result['blocks'] = reader.blocks(page)
+                page_results.append(page_result)
+            page_count = reader.page_count
+    except PageRangeError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error extracting text of document {document_id}: {e}")
+        return jsonify({'error': 'Failed to extract text'}), 500
+    
+    return jsonify({
+        'document_id': document.id,
+        'page_count': page_count,
+        'pages': page_results
+    })
+
+@chatbot_bp.route('/documents/<int:document_id>/analyze', methods=['POST'])
+def reanalyze_document(document_id):
+    """Analyze a document again, optionally for selected pages, a question or another context type.
+    
+    Page text comes from the stored page text file, so the PDF is not parsed again.
+    """
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'A JSON object is required'}), 400
+    question = data.get('question') or ''
+    context_type = data.get('context_type', 'pdf_analysis')
+    page_spec = data.get('pages')
+    if not isinstance(question, str):
+        return jsonify({'error': 'question must be a string'}), 400
+    if context_type not in prompt_registry.system_prompts:
+        return jsonify({'error': f"Unknown context type. Choose from: {', '.join(prompt_registry.system_prompts)}"}), 400
+    if page_spec is not None and not isinstance(page_spec, str):
+        return jsonify({'error': 'pages must be a string such as "1-3,7"'}), 400
+    question = question.strip()
+    
+    try:
+        with time_stage('pdf_extraction'):
+            with document_artifacts.open_page_text(document, pdf_processor.write_page_text) as reader:
+                pages = parse_page_range(page_spec, reader.page_count)
+                
+                # One page in memory at a time; only the prompt excerpt is kept
+                business_analysis = {}
+                word_count = 0
+                excerpt = []
+                excerpt_chars = 0
+                for page in pages:
+                    text = reader.text(page)
+                    if not text:
+                        continue
+                    word_count += len(text.split())
+                    for key, values in pdf_processor.analyze_business_content(text).items():
+                        business_analysis.setdefault(key, set()).update(values)
+                    if excerpt_chars < REANALYSIS_MAX_CHARS:
+                        excerpt.append(text[:REANALYSIS_MAX_CHARS - excerpt_chars])
+                        excerpt_chars += len(excerpt[-1])
+    except PageRangeError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error reading text of document {document_id}: {e}")
+        return jsonify({'error': 'Failed to read document text'}), 500
+    
+    business_analysis = {key: sorted(values) for key, values in business_analysis.items()}
+    analysis_prompt = prompt_registry.render(
+        "pdf_analysis",
+        page_count=len(pages),
+        word_count=word_count,
+        dates=', '.join(business_analysis.get('dates', [])[:5]),
+        amounts=', '.join(business_analysis.get('amounts', [])[:5]),
+        companies=', '.join(business_analysis.get('companies', [])[:5]),
+        key_terms=', '.join(business_analysis.get('key_terms', [])[:10]),
+        text_preview='\n\n'.join(excerpt)
+    )
+    if question:
+        analysis_prompt = f"{analysis_prompt}\n\nAnswer this question about the document: {question}"
+    
+    try:
+        ai_analysis = chatbot_service.get_response(
+            message=analysis_prompt,
+            context_type=context_type,
+            # The prompt is built from the employee's own document
+            use_cache=False
+        )
+        
+        analysis = ai_analysis.get('response', 'Analysis completed')
+        if 'message' in ai_analysis:
+            analysis = ai_analysis['message']['content']
+        
+        return jsonify({
+            'success': True,
+            'document_id': document.id,
+            'pages': pages,
+            'business_analysis': business_analysis,
+            'ai_analysis': analysis
+        })
+        
+    except Exception as e:
+        logger.error(f"Error re-analyzing document {document_id}: {e}")
+        return jsonify({'error': 'Document analysis failed'}), 500
+
+@chatbot_bp.route('/documents/<int:document_id>/entities', methods=['GET'])
+def get_document_entities(document_id):
+    """Normalized business entities of a document, optionally only one ?kind="""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    query = DocumentEntity.query.filter_by(document_id=document.id)
+    if request.args.get('kind'):
+        query = query.filter_by(kind=request.args['kind'])
+    entities = query.order_by(DocumentEntity.kind, DocumentEntity.normalized_value).all()
+    
+    return jsonify({
+        'document_id': document.id,
+        'entities': [entity.to_dict() for entity in entities]
+    })
+
+@chatbot_bp.route('/documents/<int:document_id>/tables', methods=['GET'])
+def get_document_tables(document_id):
+    """Tables detected in a document, optionally for ?pages=1-3,5"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    try:
+        result = document_artifacts.get_pages(
+            document, 'tables', request.args.get('pages'), pdf_processor.page_tables
+        )
+    except PageRangeError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error extracting tables of document {document_id}: {e}")
+        return jsonify({'error': 'Failed to extract tables'}), 500
+    
+    tables = [table for page_tables in result['pages'].values() for table in page_tables]
+    return jsonify({
+        'document_id': document.id,
+        'page_count': result['page_count'],
+        'pages': list(result['pages']),
+        'table_count': len(tables),
+        'tables': tables,
+        'cached': result['cached']
+    })
+
+@chatbot_bp.route('/documents/<int:document_id>/images', methods=['GET'])
+def get_document_images(document_id):
+    """Images embedded in a document, optionally for ?pages=1-3,5"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    images_dir = os.path.join(document_artifacts.directory(document), 'images')
+    
+    def extract_page_images(doc, page_num):
+        # Server paths are not stored; files are served by name from images_dir
+        return [
+            {key: value for key, value in image.items() if key != 'path'}
+            for image in pdf_processor.page_images(doc, page_num, images_dir)
+        ]
+    
+    try:
+        result = document_artifacts.get_pages(
+            document, 'images', request.args.get('pages'), extract_page_images
+        )
+    except PageRangeError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error extracting images of document {document_id}: {e}")
+        return jsonify({'error': 'Failed to extract images'}), 500
+    
+    images = [
+        {**image, 'url': f"/api/documents/{document.id}/images/{image['filename']}"}
+        for page_images in result['pages'].values() for image in page_images
+    ]
+    return jsonify({
+        'document_id': document.id,
+        'page_count': result['page_count'],
+        'pages': list(result['pages']),
+        'image_count': len(images),
+        'images': images,
+        'cached': result['cached']
+    })
+
+@chatbot_bp.route('/documents/<int:document_id>/images/<path:filename>', methods=['GET'])
+def get_document_image(document_id, filename):
+    """A previously extracted image of a document"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    document = get_active_document(employee, document_id)
+    if not document:
+        return jsonify({'error': 'Document not found'}), 404
+    
+    images_dir = os.path.join(document_artifacts.directory(document), 'images')
+    return send_from_directory(os.path.abspath(images_dir), filename, mimetype='image/png')
+
 @chatbot_bp.route('/translate', methods=['POST'])
 def translate_text():
     """Translate text between supported languages"""
@@ -394,6 +1086,66 @@ def generate_email():
         logger.error(f"Error generating email: {e}")
         return jsonify({'error': 'Email generation failed'}), 500
 
+@chatbot_bp.route('/email/generate/batch', methods=['POST'])
+def generate_email_batch():
+    """Generate email drafts for a batch of customer messages, streamed as NDJSON"""
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'A JSON object is required'}), 400
+    items = data.get('items')
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'A non-empty list of items is required'}), 400
+    
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'Every item must be an object'}), 400
+    
+    if len(items) > email_service.batch_max_items:
+        return jsonify({'error': f'Too many items. Maximum batch size: {email_service.batch_max_items}'}), 400
+    
+    concurrency = data.get('concurrency')
+    # bool is an int subclass, but true/false is not a concurrency
+    if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1):
+        return jsonify({'error': 'concurrency must be a positive integer'}), 400
+    
+    def generate():
+        succeeded = 0
+        failed = 0
+        for result in email_service.generate_email_batch(items, concurrency=concurrency):
+            if result.get('status') == 'ok':
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + '\n'
+        
+        yield json.dumps({
+            'status': 'complete',
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': failed
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def complaint_result(complaint_text, analysis, parse=True):
+    """Response body of a complaint analysis, with its parsed sections"""
+    result = {
+        'success': True,
+        'complaint_text': complaint_text,
+        'analysis': analysis
+    }
+    
+    if parse:
+        sections, method = structured_parser.parse(analysis, "complaint_handling")
+        if method == "json":
+            result['analysis'] = render_sections(sections, "complaint_handling")
+        result['sections'] = sections
+    return result
+
 @chatbot_bp.route('/complaint/analyze', methods=['POST'])
 def analyze_complaint():
     """Analyze customer complaint and provide handling suggestions"""
@@ -407,44 +1159,86 @@ def analyze_complaint():
     if not complaint_text:
         return jsonify({'error': 'Complaint text is required'}), 400
     
-    analysis_prompt = f"""
-    Analyze this customer complaint and provide handling recommendations:
-    
-    Complaint:
-    {complaint_text}
-    
-    Please provide:
-    1. Issue severity assessment (Low/Medium/High/Critical)
-    2. Main concerns identified
-    3. Recommended response strategy
-    4. Suggested resolution steps
-    5. Empathy points to address
-    6. Escalation recommendations if needed
-    7. Follow-up actions
+    analysis_prompt = prompt_registry.render(
+        "complaint_analysis",
+        complaint_text=complaint_text
+    )
     
-    Focus on turning this negative experience into a positive outcome for Wiko cutlery.
-    """
+    schema = SCHEMAS["complaint_handling"]
+    response_format = None
+    if service_config.structured_output:
+        analysis_prompt = f"{analysis_prompt}\n\n{schema.instructions}"
+        response_format = schema.json_schema
     
     try:
         ai_response = chatbot_service.get_response(
             message=analysis_prompt,
-            context_type="complaint_handling"
+            context_type="complaint_handling",
+            response_format=response_format,
+            cache_text=complaint_text
         )
         
         analysis = ai_response.get('response', 'Analysis failed')
         if 'message' in ai_response:
             analysis = ai_response['message']['content']
         
-        return jsonify({
-            'success': True,
-            'complaint_text': complaint_text,
-            'analysis': analysis
-        })
+        return jsonify(complaint_result(complaint_text, analysis, parse='error' not in ai_response))
         
     except Exception as e:
         logger.error(f"Error analyzing complaint: {e}")
         return jsonify({'error': 'Complaint analysis failed'}), 500
 
+@chatbot_bp.route('/complaint/analyze/stream', methods=['POST'])
+def analyze_complaint_stream():
+    """Analyze a customer complaint, streaming the analysis as NDJSON.
+    
+    Emits {"type": "token"} events as the analysis is generated and ends
+    with a {"type": "complete"} event holding the same body as
+    /complaint/analyze. The analysis is requested as free text, since a
+    JSON document is not readable while it streams; its sections are parsed
+    once it is complete.
+    """
+    employee = get_current_employee()
+    if not employee:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json() or {}
+    complaint_text = data.get('complaint_text', '').strip()
+    
+    if not complaint_text:
+        return jsonify({'error': 'Complaint text is required'}), 400
+    
+    analysis_prompt = prompt_registry.render(
+        "complaint_analysis",
+        complaint_text=complaint_text
+    )
+    
+    def generate():
+        try:
+            final = {}
+            parts = []
+            for event in chatbot_service.stream_response(
+                message=analysis_prompt,
+                context_type="complaint_handling",
+                cache_text=complaint_text
+            ):
+                if event.get('done'):
+                    final = event
+                    continue
+                parts.append(event['content'])
+                yield json.dumps({'type': 'token', 'content': event['content']}) + '\n'
+            
+            if final.get('error'):
+                logger.error(f"Error streaming complaint analysis: {final['error']}")
+            analysis = final.get('content') or ''.join(parts) or 'Analysis failed'
+            result = complaint_result(complaint_text, analysis, parse='error' not in final)
+            yield json.dumps({'type': 'complete', **result}) + '\n'
+        except Exception as e:
+            logger.error(f"Error analyzing complaint: {e}")
+            yield json.dumps({'type': 'error', 'error': 'Complaint analysis failed'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @chatbot_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -456,7 +1250,28 @@ def health_check():
     elif health_status["overall"] == "unhealthy":
         status_code = 503  # Service Unavailable
     
+    # Read before touching any service: a health check must not build them
+    health_status["services_initialized"] = {service.name: service.initialized for service in lazy_services}
+    chatbot = chatbot_service.get() if chatbot_service.initialized else None
+    if hasattr(chatbot, 'get_prompt_stats'):
+        health_status["prompt_stats"] = chatbot.get_prompt_stats()
+    health_status["structured_output"] = structured_parser.get_stats()
+    if service_config.model_lifecycle is not None:
+        health_status["models"] = service_config.model_lifecycle.status()
+    if getattr(chatbot, 'semantic_cache', None) is not None:
+        health_status["semantic_cache"] = chatbot.semantic_cache.get_stats()
+    
     health_status["timestamp"] = datetime.utcnow().isoformat()
     
     return jsonify(health_status), status_code
 
+@chatbot_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics endpoint"""
+    scheduler_stats = service_config.scheduler.get_stats()
+    llm_in_flight.set(scheduler_stats['in_flight'])
+    llm_queue_depth.set(scheduler_stats['waiting_interactive'], priority='interactive')
+    llm_queue_depth.set(scheduler_stats['waiting'] - scheduler_stats['waiting_interactive'], priority='batch')
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
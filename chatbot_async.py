@@ -0,0 +1,213 @@
+"""
+Async handlers for the LLM-bound routes of Wiko Cutlery Chatbot
+Served natively by src.asgi, so a request waiting for a scheduler slot or
+for the model is a suspended coroutine rather than a blocked worker thread.
+Database work is short and synchronous; it runs on the default thread pool
+inside an application context, and so does building a service on first use.
+"""
+
+import asyncio
+import json
+import logging
+from http.cookies import SimpleCookie
+from typing import Dict, Optional, Tuple
+
+from itsdangerous import BadSignature
+
+from src.models.employee import ChatSession, db
+from src.routes.chatbot import (
+    chatbot_service, translation_service, email_service,
+    prepare_chat_turn, finish_chat_turn
+)
+from src.utils.identity_cache import identity_cache
+from src.utils.metrics import time_stage
+from src.utils.service_config import LazyService
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the handlers need"""
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    @property
+    def cookies(self) -> Dict[str, str]:
+        cookie = SimpleCookie()
+        cookie.load(self.headers.get('cookie', ''))
+        return {key: morsel.value for key, morsel in cookie.items()}
+
+    def get_json(self) -> Optional[Dict]:
+        try:
+            data = json.loads(self.body or b'null')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+async def run_db(app, fn, *args):
+    """Run blocking DB work on a worker thread inside an application context"""
+    def call():
+        with app.app_context():
+            return fn(*args)
+    # to_thread copies context variables, so stage timings keep the endpoint label
+    return await asyncio.to_thread(call)
+
+
+async def resolve(service: LazyService):
+    """The service behind a LazyService; building it probes the backend, so that runs on a worker thread"""
+    if service.initialized:
+        return service.get()
+    return await asyncio.to_thread(service.get)
+
+
+def employee_id_from_cookie(app, request: AsyncRequest) -> Optional[int]:
+    """Read employee_id from Flask's signed session cookie"""
+    cookie = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if not cookie or serializer is None:
+        return None
+    try:
+        data = serializer.loads(cookie, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get('employee_id')
+
+
+async def current_employee_id(app, request: AsyncRequest) -> Optional[int]:
+    """Async counterpart of get_current_employee, returning only the id"""
+    employee_id = employee_id_from_cookie(app, request)
+    if not employee_id:
+        return None
+    # Cache hits need no thread hop at all
+    employee = identity_cache.cached(employee_id)
+    if employee is None:
+        employee = await run_db(app, identity_cache.get, employee_id)
+    return employee.id if employee else None
+
+
+async def send_message(app, request: AsyncRequest, session_id: int) -> Tuple[int, Dict]:
+    """Send message to chatbot.
+
+    Unlike the WSGI route, the user message is committed before the model is
+    called, so no DB connection is held while the reply is generated.
+    """
+    data = request.get_json() or {}
+    user_message = (data.get('message') or '').strip()
+    context_type = data.get('context_type', 'general')
+    employee_id = await current_employee_id(app, request)
+
+    def begin():
+        if employee_id is None:
+            return 401, {'error': 'Not authenticated'}
+
+        with time_stage('db_query'):
+            chat_session = ChatSession.query.filter_by(
+                id=session_id,
+                employee_id=employee_id
+            ).first()
+        if not chat_session:
+            return 404, {'error': 'Session not found'}
+        if not user_message:
+            return 400, {'error': 'Message cannot be empty'}
+
+        user_msg, conversation_history, prompt, relevant_chunks = prepare_chat_turn(
+            chat_session, employee_id, user_message, context_type
+        )
+        with time_stage('db_commit'):
+            db.session.commit()
+        return None, (user_msg.to_dict(), conversation_history, prompt, relevant_chunks)
+
+    def finish(response_content, relevant_chunks):
+        chat_session = db.session.get(ChatSession, session_id)
+        return finish_chat_turn(chat_session, response_content, relevant_chunks).to_dict()
+
+    status, result = await run_db(app, begin)
+    if status is not None:
+        return status, result
+    user_msg, conversation_history, prompt, relevant_chunks = result
+
+    try:
+        chatbot = await resolve(chatbot_service)
+        ai_response = await chatbot.aget_response(
+            message=prompt,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            cache_text=user_message,
+            # Answers grounded in the employee's own documents are not shared
+            use_cache=not relevant_chunks
+        )
+
+        if 'error' in ai_response:
+            response_content = ai_response.get('response', 'Sorry, I encountered an error.')
+        elif 'message' in ai_response:
+            response_content = ai_response['message']['content']
+        else:
+            response_content = ai_response.get('response', 'No response generated.')
+
+        ai_msg = await run_db(app, finish, response_content, relevant_chunks)
+        return 200, {'user_message': user_msg, 'ai_response': ai_msg}
+
+    except Exception as e:
+        logger.error(f"Error generating AI response: {e}")
+        return 500, {'error': 'Failed to generate response'}
+
+
+async def translate_text(app, request: AsyncRequest) -> Tuple[int, Dict]:
+    """Translate text between supported languages"""
+    if await current_employee_id(app, request) is None:
+        return 401, {'error': 'Not authenticated'}
+
+    data = request.get_json() or {}
+    text = (data.get('text') or '').strip()
+    source_lang = data.get('source_lang', 'auto')
+    target_lang = data.get('target_lang', 'en')
+
+    if not text:
+        return 400, {'error': 'Text to translate is required'}
+
+    try:
+        translator = await resolve(translation_service)
+        result = await translator.atranslate(text, source_lang, target_lang)
+        if result.get('success'):
+            return 200, result
+        return 500, {'error': result.get('error', 'Translation failed')}
+
+    except Exception as e:
+        logger.error(f"Error translating text: {e}")
+        return 500, {'error': 'Translation failed'}
+
+
+async def generate_email(app, request: AsyncRequest) -> Tuple[int, Dict]:
+    """Generate email response"""
+    if await current_employee_id(app, request) is None:
+        return 401, {'error': 'Not authenticated'}
+
+    data = request.get_json() or {}
+    email_type = data.get('email_type', 'general_response')
+    customer_message = data.get('customer_message', '')
+
+    if email_type in ['complaint_response', 'general_response'] and not customer_message:
+        return 400, {'error': 'Customer message is required for responses'}
+
+    try:
+        emails = await resolve(email_service)
+        result = await emails.agenerate_email_response(
+            customer_message=customer_message,
+            email_type=email_type,
+            customer_name=data.get('customer_name', ''),
+            order_number=data.get('order_number', ''),
+            product_name=data.get('product_name', ''),
+            additional_context=data.get('context', '')
+        )
+        if result.get('success'):
+            return 200, result
+        return 500, {'error': result.get('error', 'Email generation failed')}
+
+    except Exception as e:
+        logger.error(f"Error generating email: {e}")
+        return 500, {'error': 'Email generation failed'}
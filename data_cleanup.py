@@ -1,36 +1,123 @@
+import heapq
 import os
 import logging
+import time
 from datetime import datetime, timedelta
-from src.models.employee import UploadedDocument, ChatSession, ChatMessage, db
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, exists, select
+from src.models.employee import UploadedDocument, DocumentEntity, ChatSession, ChatMessage, db
+from src.utils.service_config import service_config
 
 logger = logging.getLogger(__name__)
 
+def delete_in_batches(model, condition, batch_size: int = 1000, pause_seconds: float = 0.0,
+                      deadline: Optional[float] = None) -> int:
+    """Delete rows of model matching condition, batch_size rows per transaction.
+    
+    Each batch selects at most batch_size primary keys and deletes them with
+    one DELETE ... WHERE id IN (...), so no ORM objects are loaded and write
+    locks are only held for one short transaction at a time. Stops early once
+    time.monotonic() passes deadline. Returns the number of rows deleted, as
+    reported by the DELETE statements.
+    """
+    total = 0
+    while True:
+        ids = db.session.execute(
+            select(model.id).where(condition).order_by(model.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return total
+        
+        result = db.session.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += result.rowcount
+        
+        if len(ids) < batch_size:
+            return total
+        if deadline is not None and time.monotonic() >= deadline:
+            return total
+        if pause_seconds:
+            # Let other writers in between batches
+            time.sleep(pause_seconds)
+
 class DataCleanupService:
-    def __init__(self):
+    def __init__(self, batch_size: Optional[int] = None, batch_pause_ms: Optional[float] = None,
+                 io_budget=None):
         self.retention_days = 30
+        self.batch_size = batch_size or service_config.cleanup_batch_size
+        self.batch_pause_ms = service_config.cleanup_batch_pause_ms if batch_pause_ms is None else batch_pause_ms
+        # Files younger than this may belong to an upload whose record is not committed yet
+        self.orphan_grace_seconds = service_config.orphan_grace_seconds
+        # Optional throttle with a spend(ops) method, used by the background sweeper
+        self.io_budget = io_budget
+    
+    def _spend_io(self, ops: int = 1):
+        if self.io_budget is not None:
+            self.io_budget.spend(ops)
+    
+    def _remove_file(self, file_path: str) -> bool:
+        self._spend_io()
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.error(f"Failed to remove file {file_path}: {e}")
+            return False
+    
+    def expire_documents_batch(self, now: Optional[datetime] = None, limit: Optional[int] = None) -> int:
+        """Remove up to limit expired documents in one transaction, then their files and index entries"""
+        now = now or datetime.utcnow()
+        limit = limit or self.batch_size
+        
+        # Served by the expires_at index, oldest expiry first
+        expired_docs = db.session.execute(
+            select(UploadedDocument.id, UploadedDocument.employee_id, UploadedDocument.file_path,
+                   UploadedDocument.content_hash)
+            .where(UploadedDocument.expires_at <= now)
+            .order_by(UploadedDocument.expires_at, UploadedDocument.id)
+            .limit(limit)
+        ).all()
+        if not expired_docs:
+            return 0
+        
+        expired_ids = [doc[0] for doc in expired_docs]
+        db.session.execute(
+            delete(DocumentEntity)
+            .where(DocumentEntity.document_id.in_(expired_ids))
+            .execution_options(synchronize_session=False)
+        )
+        result = db.session.execute(
+            delete(UploadedDocument)
+            .where(UploadedDocument.id.in_(expired_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        
+        # Files go only once the rows are gone; a crash here leaves orphans for the orphan scan
+        removed_by_employee = {}
+        for doc_id, employee_id, file_path, _ in expired_docs:
+            if self._remove_file(file_path):
+                logger.info(f"Removed file: {file_path}")
+            removed_by_employee.setdefault(employee_id, []).append(doc_id)
+        self._remove_from_index(removed_by_employee)
+        self._remove_artifacts(expired_docs)
+        return result.rowcount
     
     def cleanup_expired_documents(self):
         """Remove expired documents and their files"""
         try:
-            expired_docs = UploadedDocument.query.filter(
-                UploadedDocument.expires_at <= datetime.utcnow()
-            ).all()
-            
+            now = datetime.utcnow()
             cleaned_count = 0
-            for doc in expired_docs:
-                # Remove physical file
-                if os.path.exists(doc.file_path):
-                    try:
-                        os.remove(doc.file_path)
-                        logger.info(f"Removed file: {doc.file_path}")
-                    except OSError as e:
-                        logger.error(f"Failed to remove file {doc.file_path}: {e}")
-                
-                # Remove database record
-                db.session.delete(doc)
-                cleaned_count += 1
+            while True:
+                removed = self.expire_documents_batch(now)
+                cleaned_count += removed
+                if removed < self.batch_size:
+                    break
             
-            db.session.commit()
             logger.info(f"Cleaned up {cleaned_count} expired documents")
             return cleaned_count
             
@@ -39,63 +126,140 @@ class DataCleanupService:
             db.session.rollback()
             return 0
     
+    def _remove_from_index(self, removed_by_employee):
+        """Drop deleted documents from the retrieval index"""
+        if not removed_by_employee:
+            return
+        
+        try:
+            from src.services.document_index import DocumentIndex
+            from src.utils.service_config import service_config
+        except ImportError:
+            return
+        
+        if not os.path.exists(service_config.document_index_dir):
+            return
+        
+        index = DocumentIndex(service_config.document_index_dir)
+        for employee_id, document_ids in removed_by_employee.items():
+            try:
+                index.remove_documents(employee_id, document_ids)
+            except Exception as e:
+                logger.error(f"Failed to remove documents from index for employee {employee_id}: {e}")
+    
+    def _remove_artifacts(self, removed_docs):
+        """Drop cached extraction artifacts no remaining document shares"""
+        try:
+            from src.services.document_artifacts import DocumentArtifacts
+        except ImportError:
+            return
+        
+        hashes = {content_hash for _, _, _, content_hash in removed_docs if content_hash}
+        if hashes:
+            # Another upload of the same file keeps the artifacts alive
+            hashes -= set(db.session.execute(
+                select(UploadedDocument.content_hash).where(UploadedDocument.content_hash.in_(hashes))
+            ).scalars())
+        keys = hashes | {f"document-{doc_id}" for doc_id, _, _, content_hash in removed_docs if not content_hash}
+        
+        self._spend_io(len(keys))
+        DocumentArtifacts(service_config.document_artifacts_dir).remove(keys)
+    
+    def purge_chat_sessions(self, cutoff_date: datetime, deadline: Optional[float] = None) -> Dict[str, int]:
+        """Delete sessions last updated before cutoff_date, and their messages, in batches"""
+        old_session_ids = select(ChatSession.id).where(ChatSession.updated_at <= cutoff_date)
+        pause_seconds = self.batch_pause_ms / 1000.0
+        
+        deleted_messages = delete_in_batches(
+            ChatMessage,
+            ChatMessage.session_id.in_(old_session_ids),
+            self.batch_size,
+            pause_seconds,
+            deadline
+        )
+        # Skip sessions that received a message while their old ones were being removed
+        deleted_sessions = delete_in_batches(
+            ChatSession,
+            (ChatSession.updated_at <= cutoff_date)
+            & ~exists().where(ChatMessage.session_id == ChatSession.id),
+            self.batch_size,
+            pause_seconds,
+            deadline
+        )
+        return {'sessions': deleted_sessions, 'messages': deleted_messages}
+    
     def cleanup_old_chat_sessions(self):
         """Remove chat sessions older than retention period"""
         try:
             cutoff_date = datetime.utcnow() - timedelta(days=self.retention_days)
+            deleted = self.purge_chat_sessions(cutoff_date)
             
-            # Get old sessions
-            old_sessions = ChatSession.query.filter(
-                ChatSession.updated_at <= cutoff_date
-            ).all()
-            
-            cleaned_count = 0
-            for session in old_sessions:
-                # Remove associated messages first
-                ChatMessage.query.filter_by(session_id=session.id).delete()
-                
-                # Remove session
-                db.session.delete(session)
-                cleaned_count += 1
-            
-            db.session.commit()
-            logger.info(f"Cleaned up {cleaned_count} old chat sessions")
-            return cleaned_count
+            logger.info(f"Cleaned up {deleted['sessions']} old chat sessions ({deleted['messages']} messages)")
+            return deleted['sessions']
             
         except Exception as e:
             logger.error(f"Error during chat session cleanup: {e}")
             db.session.rollback()
             return 0
     
+    def scan_orphaned_files(self, upload_dir: str, after: Optional[str] = None,
+                            limit: Optional[int] = None) -> Tuple[int, Optional[str]]:
+        """Remove orphaned files among the next limit file names after `after`, in name order.
+        
+        The directory is streamed with os.scandir and only the limit smallest
+        names are kept, then checked against the database with one IN query,
+        so memory stays bounded however many files there are. Returns the
+        number of files removed and the last name examined, or None once the
+        directory is exhausted, so a scan can be resumed from any batch.
+        """
+        limit = limit or self.batch_size
+        if not os.path.isdir(upload_dir):
+            return 0, None
+        
+        self._spend_io()
+        with os.scandir(upload_dir) as entries:
+            batch: List[Tuple[str, str]] = heapq.nsmallest(
+                limit,
+                (
+                    (entry.name, entry.path) for entry in entries
+                    if (after is None or entry.name > after) and entry.is_file(follow_symlinks=False)
+                )
+            )
+        if not batch:
+            return 0, None
+        
+        paths = [path for _, path in batch]
+        known = set(db.session.execute(
+            select(UploadedDocument.file_path).where(UploadedDocument.file_path.in_(paths))
+        ).scalars())
+        
+        cleaned_count = 0
+        cutoff = time.time() - self.orphan_grace_seconds
+        for path in paths:
+            if path in known:
+                continue
+            try:
+                self._spend_io()
+                if os.stat(path).st_mtime > cutoff:
+                    continue
+            except OSError:
+                continue
+            if self._remove_file(path):
+                logger.info(f"Removed orphaned file: {path}")
+                cleaned_count += 1
+        
+        return cleaned_count, batch[-1][0] if len(batch) == limit else None
+    
     def cleanup_orphaned_files(self, upload_dir):
         """Remove files that don't have database records"""
         try:
-            if not os.path.exists(upload_dir):
-                return 0
-            
-            # Get all files in upload directory
-            files_on_disk = set()
-            for root, dirs, files in os.walk(upload_dir):
-                for file in files:
-                    files_on_disk.add(os.path.join(root, file))
-            
-            # Get all file paths from database
-            db_files = set()
-            documents = UploadedDocument.query.all()
-            for doc in documents:
-                db_files.add(doc.file_path)
-            
-            # Find orphaned files
-            orphaned_files = files_on_disk - db_files
-            
             cleaned_count = 0
-            for file_path in orphaned_files:
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Removed orphaned file: {file_path}")
-                    cleaned_count += 1
-                except OSError as e:
-                    logger.error(f"Failed to remove orphaned file {file_path}: {e}")
+            after = None
+            while True:
+                removed, after = self.scan_orphaned_files(upload_dir, after)
+                cleaned_count += removed
+                if after is None:
+                    break
             
             logger.info(f"Cleaned up {cleaned_count} orphaned files")
             return cleaned_count
@@ -0,0 +1,152 @@
+"""
+Lazily computed, cached per-document extraction artifacts
+Tables and images of an uploaded PDF are only extracted when a route asks
+for them, page by page, and the results are kept on disk next to each other
+until the document expires. Per-page text and layout blocks live in the same
+directory in a memory-mapped page text file (see page_text_store), written
+during upload. Artifacts are keyed by the document's content hash, so
+re-uploads of the same file share them.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.services.page_text_store import PageTextReader, PageTextWriter, has_page_text
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_KINDS = ('tables', 'images')
+
+
+class PageRangeError(ValueError):
+    """Raised for a malformed or out-of-range page selection"""
+
+
+def parse_page_range(spec: Optional[str], page_count: int) -> List[int]:
+    """Parse "1-3,7" into sorted 1-based page numbers; all pages if spec is empty"""
+    if not spec:
+        return list(range(1, page_count + 1))
+
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = end = int(part)
+        except ValueError:
+            raise PageRangeError(f"Invalid page range: {part}")
+        if start < 1 or end > page_count or start > end:
+            raise PageRangeError(f"Pages must be between 1 and {page_count}")
+        pages.update(range(start, end + 1))
+    return sorted(pages)
+
+
+def artifact_key(document) -> str:
+    """Directory name for a document's artifacts"""
+    return document.content_hash or f"document-{document.id}"
+
+
+class DocumentArtifacts:
+    """On-disk cache of per-page extraction results"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def directory_for(self, key: str) -> str:
+        return os.path.join(self.root_dir, key)
+
+    def directory(self, document) -> str:
+        return self.directory_for(artifact_key(document))
+
+    def _path(self, document, kind: str) -> str:
+        return os.path.join(self.directory(document), f"{kind}.json")
+
+    def _load(self, document, kind: str) -> Dict:
+        path = self._path(document, kind)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)
+        return {'page_count': None, 'pages': {}}
+
+    def _save(self, document, kind: str, artifact: Dict):
+        path = self._path(document, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(artifact, f)
+        os.replace(tmp_path, path)
+
+    def has_page_text(self, key: str) -> bool:
+        return has_page_text(self.directory_for(key))
+
+    def page_text_writer(self, key: str) -> PageTextWriter:
+        """Writer for the page text of the document with this key"""
+        return PageTextWriter(self.directory_for(key))
+
+    def open_page_text(self, document, build: Callable[[str, PageTextWriter], None]) -> PageTextReader:
+        """Reader for a document's page text, building it with build(file_path, writer) if missing"""
+        key = artifact_key(document)
+        if not self.has_page_text(key):
+            with self._lock(key):
+                if not self.has_page_text(key):
+                    writer = self.page_text_writer(key)
+                    try:
+                        build(document.file_path, writer)
+                    except Exception:
+                        writer.abort()
+                        raise
+                    writer.commit()
+        return PageTextReader(self.directory_for(key))
+
+    def get_pages(self, document, kind: str, page_spec: Optional[str],
+                  compute: Callable[[Any, int], Any]) -> Dict:
+        """Return the artifact for the pages in page_spec, computing only those not cached yet.
+
+        compute(doc, page_num) is called with the opened PDF for each missing page.
+        Raises PageRangeError for an invalid page_spec.
+        """
+        with self._lock(artifact_key(document)):
+            artifact = self._load(document, kind)
+            page_count = artifact['page_count']
+            pages = parse_page_range(page_spec, page_count) if page_count else None
+            missing = [page for page in pages if str(page) not in artifact['pages']] if pages else None
+            cached = missing == []
+
+            if not cached:
+                import fitz  # PyMuPDF, loaded on first use to keep app startup fast
+                doc = fitz.open(document.file_path)
+                try:
+                    page_count = artifact['page_count'] = len(doc)
+                    pages = parse_page_range(page_spec, page_count)
+                    for page in pages:
+                        if str(page) not in artifact['pages']:
+                            artifact['pages'][str(page)] = compute(doc, page)
+                finally:
+                    doc.close()
+                self._save(document, kind, artifact)
+
+        return {
+            'page_count': page_count,
+            'pages': {page: artifact['pages'][str(page)] for page in pages},
+            'cached': cached
+        }
+
+    def remove(self, keys: Iterable[str]):
+        for key in keys:
+            shutil.rmtree(os.path.join(self.root_dir, key), ignore_errors=True)
+            with self._locks_guard:
+                self._locks.pop(key, None)
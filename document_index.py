@@ -0,0 +1,420 @@
+"""
+Local embedding index for retrieval over uploaded documents
+Document text is split into overlapping chunks at upload, embedded through
+the chatbot backend and stored per employee as a flat float32 matrix that is
+memory-mapped for search. Chat messages can then pull in only the most
+relevant chunks instead of whole documents.
+"""
+
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: shards are only locked against threads of this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_prefix(text: str, chunk_size: int, overlap: int, final: bool) -> Tuple[List[str], int]:
+    """Chunks of text and the offset where the next chunk starts.
+
+    Unless final, stops before a chunk that would end at the end of text,
+    since more text may follow it.
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end == len(text) and not final:
+            break
+        if end < len(text):
+            # Back up to the nearest natural break in the second half of the window
+            window = text[start:end]
+            for separator in ('\n\n', '\n', '. '):
+                cut = window.rfind(separator)
+                if cut > chunk_size // 2:
+                    end = start + cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            return chunks, len(text)
+        start = max(end - overlap, start + 1)
+    return chunks, start
+
+
+def chunk_text(text: str, chunk_size: int = 1200, overlap: int = 200) -> List[str]:
+    """Split text into overlapping chunks, preferring paragraph and sentence breaks"""
+    text = re.sub(r'[ \t]+', ' ', text).strip()
+    if not text:
+        return []
+    return _chunk_prefix(text, chunk_size, overlap, final=True)[0]
+
+
+def iter_text_chunks(pages: Iterable[str], chunk_size: int = 1200, overlap: int = 200) -> Iterator[str]:
+    """Same chunks as chunk_text('\\n\\n'.join(pages)), holding only a few chunks of text at a time"""
+    buffer = ''
+    started = False
+    for page in pages:
+        page = re.sub(r'[ \t]+', ' ', page)
+        if not started:
+            page = page.lstrip()
+            if not page:
+                continue
+            started = True
+            buffer = page
+        else:
+            buffer += '\n\n' + page
+        if len(buffer) > 8 * chunk_size:
+            # Trailing whitespace may still be stripped off the end of the text
+            chunks, start = _chunk_prefix(buffer.rstrip(), chunk_size, overlap, final=False)
+            yield from chunks
+            buffer = buffer[start:]
+
+    buffer = buffer.rstrip()
+    if buffer:
+        yield from _chunk_prefix(buffer, chunk_size, overlap, final=True)[0]
+
+
+class _EmployeeShard:
+    """Vectors and chunk metadata for one employee.
+
+    Several processes (app workers, the cleanup job) may open the same shard,
+    so every operation takes a file lock on the shard and reloads meta.json,
+    which is the commit point: appends truncate whatever a crashed writer
+    left past the committed sizes, and compaction writes a new generation of
+    files before switching meta.json over to it.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'meta.json')
+        self.lock_path = os.path.join(directory, '.lock')
+        self.lock = threading.RLock()
+        self._matrix = None
+        self._chunks = None
+        self._meta = None
+
+    def _path(self, kind: str, generation: int) -> str:
+        extension = 'f32' if kind == 'vectors' else 'jsonl'
+        # Generation 0 keeps the file names of shards written before generations existed
+        if generation == 0:
+            return os.path.join(self.directory, f"{kind}.{extension}")
+        return os.path.join(self.directory, f"{kind}.{generation}.{extension}")
+
+    @property
+    def vectors_path(self) -> str:
+        return self._path('vectors', self.meta.get("generation", 0))
+
+    @property
+    def chunks_path(self) -> str:
+        return self._path('chunks', self.meta.get("generation", 0))
+
+    @contextmanager
+    def locked(self, exclusive: bool):
+        """Hold the shard against other threads and processes, with meta reloaded from disk"""
+        with self.lock:
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                # Closing the file releases the flock
+                self.reload()
+                yield
+
+    def reload(self):
+        meta = self._read_meta()
+        if meta != self._meta:
+            self.invalidate()
+        self._meta = meta
+
+    def _read_meta(self) -> Dict:
+        if not os.path.exists(self.meta_path):
+            return {"dimensions": None, "count": 0, "generation": 0, "chunks_bytes": 0}
+        with open(self.meta_path, 'r') as f:
+            meta = json.load(f)
+        if "chunks_bytes" not in meta:
+            meta = self._repair_legacy_meta(meta)
+        return meta
+
+    def _repair_legacy_meta(self, meta: Dict) -> Dict:
+        """Meta from before committed sizes were recorded; count may not match the files"""
+        meta = {**meta, "generation": 0}
+        vectors_path = self._path('vectors', 0)
+        chunks_path = self._path('chunks', 0)
+        count = meta.get("count", 0)
+        if meta.get("dimensions") and os.path.exists(vectors_path):
+            count = min(count, os.path.getsize(vectors_path) // (meta["dimensions"] * 4))
+        else:
+            count = 0
+
+        chunks_bytes = 0
+        lines = 0
+        if os.path.exists(chunks_path):
+            with open(chunks_path, 'rb') as f:
+                for line in itertools.islice(f, count):
+                    if not line.endswith(b'\n'):
+                        break
+                    chunks_bytes += len(line)
+                    lines += 1
+        meta["count"] = min(count, lines)
+        meta["chunks_bytes"] = chunks_bytes
+        return meta
+
+    @property
+    def meta(self) -> Dict:
+        if self._meta is None:
+            self._meta = self._read_meta()
+        return self._meta
+
+    def write_meta(self, meta: Dict):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+        self.invalidate()
+        self._meta = meta
+
+    @property
+    def matrix(self) -> Optional[np.ndarray]:
+        if self._matrix is None and self.meta["count"]:
+            # Bytes past the committed count belong to an unfinished append and are ignored
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode='r',
+                shape=(self.meta["count"], self.meta["dimensions"])
+            )
+        return self._matrix
+
+    @property
+    def chunks(self) -> List[Dict]:
+        if self._chunks is None:
+            self._chunks = []
+            if self.meta["count"]:
+                with open(self.chunks_path, 'r', encoding='utf-8') as f:
+                    self._chunks = [json.loads(line) for line in itertools.islice(f, self.meta["count"])]
+        return self._chunks
+
+    def invalidate(self):
+        self._matrix = None
+        self._chunks = None
+        self._meta = None
+
+
+def _write_synced(path: str, data: bytes, keep: Optional[int] = None):
+    """Write data to path, after the first keep bytes if given, and flush it to disk"""
+    with open(path, 'ab' if keep is not None else 'wb') as f:
+        if keep is not None:
+            f.truncate(keep)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class DocumentIndex:
+    """Per-employee, memory-mapped vector index of document chunks"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._shards: Dict[int, _EmployeeShard] = {}
+        self._shards_lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _shard(self, employee_id: int) -> _EmployeeShard:
+        with self._shards_lock:
+            shard = self._shards.get(employee_id)
+            if shard is None:
+                directory = os.path.join(self.index_dir, f"employee_{int(employee_id)}")
+                os.makedirs(directory, exist_ok=True)
+                shard = _EmployeeShard(directory)
+                self._shards[employee_id] = shard
+            return shard
+
+    def add_document(self, employee_id: int, document_id: int, chunks: List[str], vectors: np.ndarray,
+                     first_chunk_index: int = 0) -> int:
+        """Append a document's chunks and their embeddings, possibly one batch at a time"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(chunks) != len(vectors):
+            raise ValueError("Each chunk needs exactly one embedding")
+        if not chunks:
+            return 0
+
+        # Normalise once so search is a plain dot product
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        shard = self._shard(employee_id)
+        with shard.locked(exclusive=True):
+            meta = shard.meta
+            dimensions = meta["dimensions"]
+            if dimensions is not None and dimensions != vectors.shape[1]:
+                raise ValueError(
+                    f"Embedding size {vectors.shape[1]} does not match index size {dimensions}"
+                )
+
+            chunk_lines = ''.join(
+                json.dumps({
+                    "document_id": document_id,
+                    "chunk_index": chunk_index,
+                    "text": text
+                }) + '\n'
+                for chunk_index, text in enumerate(chunks, start=first_chunk_index)
+            ).encode('utf-8')
+            vectors_bytes = meta["count"] * (dimensions or 0) * 4
+            _write_synced(shard.vectors_path, vectors.tobytes(), keep=vectors_bytes)
+            _write_synced(shard.chunks_path, chunk_lines, keep=meta["chunks_bytes"])
+
+            shard.write_meta({
+                **meta,
+                "dimensions": int(vectors.shape[1]),
+                "count": meta["count"] + len(chunks),
+                "chunks_bytes": meta["chunks_bytes"] + len(chunk_lines)
+            })
+
+        return len(chunks)
+
+    def search(
+        self,
+        employee_id: int,
+        query_vector,
+        top_k: int = 4,
+        min_score: float = 0.0,
+        document_ids: Optional[Iterable[int]] = None
+    ) -> List[Dict]:
+        """Return the top-k chunks by cosine similarity for one employee"""
+        shard = self._shard(employee_id)
+        with shard.locked(exclusive=False):
+            matrix = shard.matrix
+            if matrix is None:
+                return []
+            chunks = shard.chunks
+
+            query = np.asarray(query_vector, dtype=np.float32)
+            if query.shape[0] != matrix.shape[1]:
+                logger.warning("Query embedding size does not match document index")
+                return []
+            query = query / (np.linalg.norm(query) or 1.0)
+
+            scores = matrix @ query
+            if document_ids is not None:
+                allowed = set(document_ids)
+                mask = np.fromiter(
+                    (chunk["document_id"] in allowed for chunk in chunks),
+                    dtype=bool,
+                    count=len(chunks)
+                )
+                scores = np.where(mask, scores, -np.inf)
+
+            k = min(top_k, len(scores))
+            if k == 0:
+                return []
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            ranked = candidates[np.argsort(-scores[candidates])]
+
+            return [
+                {**chunks[i], "score": float(scores[i])}
+                for i in ranked
+                if np.isfinite(scores[i]) and scores[i] >= min_score
+            ]
+
+    def remove_documents(self, employee_id: int, document_ids: Iterable[int]) -> int:
+        """Drop all chunks of the given documents, compacting the shard into a new generation of files"""
+        remove = set(document_ids)
+        shard = self._shard(employee_id)
+        with shard.locked(exclusive=True):
+            matrix = shard.matrix
+            if matrix is None:
+                return 0
+            chunks = shard.chunks
+            keep = [i for i, chunk in enumerate(chunks) if chunk["document_id"] not in remove]
+            removed = len(chunks) - len(keep)
+            if not removed:
+                return 0
+
+            kept_vectors = np.array(matrix[keep], dtype=np.float32)
+            chunk_lines = ''.join(json.dumps(chunks[i]) + '\n' for i in keep).encode('utf-8')
+            meta = shard.meta
+            old_files = (shard.vectors_path, shard.chunks_path)
+            generation = meta["generation"] + 1
+            _write_synced(shard._path('vectors', generation), kept_vectors.tobytes())
+            _write_synced(shard._path('chunks', generation), chunk_lines)
+
+            # Readers switch to the new files here; until then they see the old ones
+            shard.write_meta({
+                **meta,
+                "count": len(keep),
+                "chunks_bytes": len(chunk_lines),
+                "generation": generation
+            })
+            for path in old_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            return removed
+
+
+class RetrievalService:
+    """Indexes document text and retrieves relevant chunks using the chatbot's embeddings"""
+
+    def __init__(self, chatbot_service, index: DocumentIndex, chunk_size: int = 1200,
+                 chunk_overlap: int = 200, top_k: int = 4, min_score: float = 0.3):
+        self.chatbot_service = chatbot_service
+        self.index = index
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.top_k = top_k
+        self.min_score = min_score
+
+    def index_document(self, employee_id: int, document_id: int, text: Union[str, Iterable[str]],
+                       batch_size: int = 32) -> int:
+        """Chunk, embed and store a document's text.
+
+        text may also be an iterable of page texts, which is chunked as it is
+        read, so only one batch of chunks and embeddings is held at a time.
+        """
+        if isinstance(text, str):
+            chunks = iter(chunk_text(text, self.chunk_size, self.chunk_overlap))
+        else:
+            chunks = iter_text_chunks(text, self.chunk_size, self.chunk_overlap)
+
+        indexed = 0
+        while True:
+            batch = list(itertools.islice(chunks, batch_size))
+            if not batch:
+                return indexed
+            vectors = self.chatbot_service.embed(batch)
+            if not vectors:
+                logger.warning(f"Embedding failed, document {document_id} not indexed")
+                if indexed:
+                    self.index.remove_documents(employee_id, [document_id])
+                return 0
+            indexed += self.index.add_document(employee_id, document_id, batch, np.array(vectors), indexed)
+
+    def retrieve(self, employee_id: int, query: str, document_ids: Optional[Iterable[int]] = None,
+                 top_k: Optional[int] = None) -> List[Dict]:
+        """Find the chunks most relevant to a query"""
+        embedding = self.chatbot_service.embed([query])
+        if not embedding:
+            return []
+        return self.index.search(
+            employee_id,
+            embedding[0],
+            top_k=top_k or self.top_k,
+            min_score=self.min_score,
+            document_ids=document_ids
+        )
+
+    def remove_documents(self, employee_id: int, document_ids: Iterable[int]) -> int:
+        return self.index.remove_documents(employee_id, document_ids)
@@ -36,7 +36,7 @@ class ChatSession(db.Model):
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
     session_name = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     is_active = db.Column(db.Boolean, default=True)
 
     employee = db.relationship('Employee', backref=db.backref('chat_sessions', lazy=True))
@@ -53,7 +53,7 @@ class ChatSession(db.Model):
 
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False, index=True)
     message_type = db.Column(db.String(20), nullable=False)  # 'user' or 'assistant'
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
@@ -80,8 +80,9 @@ class UploadedDocument(db.Model):
     file_size = db.Column(db.Integer, nullable=False)
     mime_type = db.Column(db.String(100), nullable=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)  # 30-day retention
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # 30-day retention
     analysis_summary = db.Column(db.Text, nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the file
 
     employee = db.relationship('Employee', backref=db.backref('uploaded_documents', lazy=True))
 
@@ -95,6 +96,86 @@ class UploadedDocument(db.Model):
             'mime_type': self.mime_type,
             'uploaded_at': self.uploaded_at.isoformat(),
             'expires_at': self.expires_at.isoformat(),
-            'analysis_summary': self.analysis_summary
+            'analysis_summary': self.analysis_summary,
+            'content_hash': self.content_hash
         }
 
+
+class DocumentEntity(db.Model):
+    """A normalized business entity (date, amount, email, ...) found in an uploaded document"""
+    __table_args__ = (
+        db.Index('ix_document_entity_date', 'employee_id', 'kind', 'date_value'),
+        # Currency is filtered on the rows of the amount range, so it stays out of the key
+        db.Index('ix_document_entity_amount_range', 'employee_id', 'kind', 'amount'),
+        db.Index('ix_document_entity_value', 'employee_id', 'kind', 'normalized_value'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('uploaded_document.id'), nullable=False, index=True)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'date', 'amount', 'email', 'phone', 'company', 'key_term'
+    value = db.Column(db.String(255), nullable=False)  # As found in the text
+    normalized_value = db.Column(db.String(255), nullable=False)
+    date_value = db.Column(db.Date, nullable=True)
+    amount = db.Column(db.Float, nullable=True)
+    currency = db.Column(db.String(3), nullable=True)  # ISO 4217
+
+    document = db.relationship('UploadedDocument', backref=db.backref('entities', lazy=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'document_id': self.document_id,
+            'kind': self.kind,
+            'value': self.value,
+            'normalized_value': self.normalized_value,
+            'date': self.date_value.isoformat() if self.date_value else None,
+            'amount': self.amount,
+            'currency': self.currency
+        }
+
+
+class StatsSnapshot(db.Model):
+    """Periodically recomputed aggregate statistics, shared by all app processes"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    data = db.Column(db.JSON, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    compute_ms = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'data': self.data,
+            'computed_at': self.computed_at.isoformat(),
+            'compute_ms': self.compute_ms
+        }
+
+
+# Indexes replaced by a differently keyed one under a new name
+RETIRED_INDEXES = ('ix_document_entity_amount',)
+
+
+def add_missing_columns():
+    """Add nullable columns and indexes that were introduced after a table was created.
+
+    db.create_all() only creates missing tables, so existing databases would
+    otherwise fail on any query touching a newer column. Retired indexes are
+    dropped so they stop costing writes.
+    """
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    with db.engine.begin() as connection:
+        for name in RETIRED_INDEXES:
+            connection.exec_driver_sql(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,110 @@
+"""
+Employee identity cache for Wiko Cutlery Chatbot
+Authenticated requests used to load the Employee row on every call. The
+employee id in Flask's signed session cookie is trusted as the identity
+claim; whether that employee still exists and is active comes from a small
+TTL cache of read-only snapshots, memoised on flask.g for the rest of the
+request. Admin changes invalidate the entry immediately, and the TTL bounds
+how long other processes keep serving a stale record.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from src.models.employee import Employee, db
+from src.utils.metrics import metrics, time_stage
+from src.utils.service_config import service_config
+
+identity_lookups = metrics.counter(
+    'wiko_identity_cache_lookups_total',
+    'Employee identity cache lookups by result',
+    ['result']
+)
+
+
+class EmployeeSnapshot:
+    """Read-only copy of the Employee fields needed for authentication"""
+
+    def __init__(self, employee: Employee):
+        self.id = employee.id
+        self.username = employee.username
+        self.is_active = bool(employee.is_active)
+        self.is_admin = bool(getattr(employee, 'is_admin', False))
+        self._data = employee.to_dict()
+
+    def to_dict(self) -> Dict:
+        return dict(self._data)
+
+
+class IdentityCache:
+    """LRU + TTL cache of active-employee snapshots"""
+
+    def __init__(self, ttl_seconds: float = 10, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cached(self, employee_id: int) -> Optional[EmployeeSnapshot]:
+        """Snapshot if cached and fresh, without touching the database"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(employee_id)
+            if entry is None:
+                return None
+            snapshot, loaded_at = entry
+            if time.monotonic() - loaded_at > self.ttl_seconds:
+                del self._entries[employee_id]
+                return None
+            self._entries.move_to_end(employee_id)
+        identity_lookups.inc(result='hit')
+        return snapshot
+
+    def get(self, employee_id: int) -> Optional[EmployeeSnapshot]:
+        """Snapshot of an active employee, loading it on a miss; None if missing or inactive"""
+        snapshot = self.cached(employee_id)
+        if snapshot is not None:
+            return snapshot
+
+        identity_lookups.inc(result='miss')
+        with time_stage('db_query'):
+            employee = db.session.get(Employee, employee_id)
+        if employee is None or not employee.is_active:
+            # Not cached, so a reactivated account works on its next request
+            return None
+
+        snapshot = EmployeeSnapshot(employee)
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._entries[employee_id] = (snapshot, time.monotonic())
+                self._entries.move_to_end(employee_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, employee_id: int):
+        with self._lock:
+            self._entries.pop(employee_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache(
+    ttl_seconds=service_config.identity_cache_ttl,
+    max_entries=service_config.identity_cache_max_entries
+)
+
+
+def current_identity() -> Optional[EmployeeSnapshot]:
+    """Snapshot for the employee in the session cookie, looked up at most once per request"""
+    from flask import g, session
+
+    if 'identity' not in g:
+        employee_id = session.get('employee_id')
+        g.identity = identity_cache.get(employee_id) if employee_id else None
+    return g.identity
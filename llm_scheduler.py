@@ -0,0 +1,138 @@
+"""
+Priority scheduler for LLM backend calls
+Limits how many generations run against the backend at once and lets
+interactive chat jump ahead of background work such as batch email drafts.
+Worker threads and asyncio tasks wait in the same queue, so the sync and
+async serving paths share one set of backend slots.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from src.utils.metrics import observe_stage
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class _ThreadWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.cancelled = False
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.admitted = False
+        self.cancelled = False
+
+    def wake(self):
+        # May be called from any thread when a slot is released
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """Bounded, priority-ordered admission to the LLM backend"""
+
+    def __init__(self, max_concurrency: int = 2):
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._waiting = []  # heap of (priority, sequence, waiter)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._completed = 0
+
+    def _admit_locked(self):
+        """Hand free slots to waiters in (priority, arrival) order"""
+        while self._waiting and self._in_flight < self.max_concurrency:
+            _, _, waiter = heapq.heappop(self._waiting)
+            if waiter.cancelled:
+                continue
+            self._in_flight += 1
+            waiter.admitted = True
+            waiter.wake()
+
+    def _enqueue(self, priority: int, waiter):
+        with self._lock:
+            heapq.heappush(self._waiting, (priority, next(self._sequence), waiter))
+            self._admit_locked()
+
+    def _release(self, admitted_at: Optional[float]):
+        if admitted_at is not None:
+            observe_stage('generation', time.perf_counter() - admitted_at)
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            self._admit_locked()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Hold one backend slot for the duration of the block.
+
+        Waiters are admitted strictly in (priority, arrival) order, so a
+        batch job never takes a freed slot while an interactive request
+        is queued.
+        """
+        waiter = _ThreadWaiter()
+        queued_at = time.perf_counter()
+        self._enqueue(priority, waiter)
+        waiter.event.wait()
+
+        admitted_at = time.perf_counter()
+        observe_stage('llm_queue_wait', admitted_at - queued_at)
+        try:
+            yield
+        finally:
+            self._release(admitted_at)
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Async variant of slot(); waiting does not block the event loop"""
+        waiter = _AsyncWaiter(asyncio.get_running_loop())
+        queued_at = time.perf_counter()
+        self._enqueue(priority, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                # The slot may have been handed over just before the cancellation
+                admitted = waiter.admitted
+            if admitted:
+                self._release(None)
+            raise
+
+        admitted_at = time.perf_counter()
+        observe_stage('llm_queue_wait', admitted_at - queued_at)
+        try:
+            yield
+        finally:
+            self._release(admitted_at)
+
+    def get_stats(self) -> Dict:
+        """Current queue statistics"""
+        with self._lock:
+            waiting = [priority for priority, _, waiter in self._waiting if not waiter.cancelled]
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "waiting": len(waiting),
+                "waiting_interactive": sum(1 for p in waiting if p <= PRIORITY_INTERACTIVE),
+                "completed": self._completed
+            }
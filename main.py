@@ -5,30 +5,61 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
-from src.models.employee import db
+from src.models.employee import db, add_missing_columns
 from src.routes.user import user_bp
-from src.routes.chatbot import chatbot_bp
+from src.routes.chatbot import chatbot_bp, lazy_services
+# Registers the WebSocket route on chatbot_bp, so it must be imported before the blueprint is registered
+from src.routes.chat_socket import sock
+from src.utils.service_config import service_config, start_service_warmup
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'wiko_cutlery_chatbot_secret_key_2025'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 
-# Enable CORS for all routes with specific origins
+# Batch extraction workers are spawned processes. When this file is the entry script
+# they re-import it as __mp_main__, and must not touch the schema or start background work.
+EXTRACTION_WORKER = __name__ == '__mp_main__'
+
+# Enable CORS for all routes with specific origins (also used by src.asgi)
+CORS_ORIGINS = ['http://localhost:4173', 'http://localhost:5173', 'http://localhost:3000']
 CORS(app, 
      supports_credentials=True,
-     origins=['http://localhost:4173', 'http://localhost:5173', 'http://localhost:3000'],
+     origins=CORS_ORIGINS,
      allow_headers=['Content-Type', 'Authorization'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(chatbot_bp, url_prefix='/api')
+if sock is not None:
+    sock.init_app(app)
 
 # uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
-with app.app_context():
-    db.create_all()
+if not EXTRACTION_WORKER:
+    with app.app_context():
+        db.create_all()
+        add_missing_columns()
+        if service_config.sqlite_wal and db.engine.dialect.name == 'sqlite':
+            # Persistent for the database file; also what incremental backups copy
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+# Incremental background cleanup instead of (or alongside) the data_cleanup cron job
+if service_config.retention_sweeper_enabled and not EXTRACTION_WORKER:
+    from src.services.retention_sweeper import start_retention_sweeper
+    retention_sweeper = start_retention_sweeper(app, os.path.join(app.root_path, 'uploads'))
+
+# Load the models now so the first chat after a deploy does not wait for them
+if not EXTRACTION_WORKER:
+    service_config.start_model_lifecycle()
+    if service_config.service_warmup_enabled:
+        # Build the chat services off the import path; the first request waits only if this has not finished
+        start_service_warmup(lazy_services)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
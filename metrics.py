@@ -0,0 +1,264 @@
+"""
+In-process metrics for Wiko Cutlery Chatbot
+Minimal counters, gauges and histograms rendered in the Prometheus text
+exposition format, so /api/metrics can be scraped without running any
+additional services.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond DB lookups to long generations
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()
+            ]
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()
+            ]
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound) if bound != float("inf") else "+Inf"}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all metrics and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+request_duration = metrics.histogram(
+    'wiko_request_duration_seconds',
+    'HTTP request latency by endpoint',
+    ['endpoint', 'method', 'status']
+)
+stage_duration = metrics.histogram(
+    'wiko_stage_duration_seconds',
+    'Latency of individual processing stages',
+    ['endpoint', 'stage']
+)
+llm_tokens_per_second = metrics.gauge(
+    'wiko_llm_tokens_per_second',
+    'Token throughput of the most recent LLM call',
+    ['model', 'phase']
+)
+llm_tokens_total = metrics.counter(
+    'wiko_llm_tokens_total',
+    'Tokens processed by the LLM backend',
+    ['model', 'phase']
+)
+llm_load_duration = metrics.histogram(
+    'wiko_llm_load_duration_seconds',
+    'Model load time reported by the backend',
+    ['model']
+)
+
+
+# Set by the ASGI routes, which run outside a Flask request context
+current_endpoint: ContextVar[Optional[str]] = ContextVar('current_endpoint', default=None)
+
+
+def _current_endpoint() -> str:
+    endpoint = current_endpoint.get()
+    if endpoint is not None:
+        return endpoint
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return 'background'
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return 'background'
+
+
+@contextmanager
+def time_stage(stage: str, endpoint: Optional[str] = None):
+    """Time a processing stage, labelled with the current Flask endpoint"""
+    label = endpoint or _current_endpoint()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration.observe(time.perf_counter() - started, endpoint=label, stage=stage)
+
+
+def observe_stage(stage: str, seconds: float, endpoint: Optional[str] = None):
+    """Record an already-measured stage duration"""
+    stage_duration.observe(seconds, endpoint=endpoint or _current_endpoint(), stage=stage)
+
+
+def observe_llm_response(model: str, response: Dict):
+    """Record token throughput from Ollama-style response fields.
+
+    Ollama reports durations in nanoseconds: prompt_eval_duration for the
+    prompt, eval_duration for generated tokens and load_duration for model
+    loading.
+    """
+    prompt_tokens = response.get('prompt_eval_count') or 0
+    prompt_ns = response.get('prompt_eval_duration') or 0
+    eval_tokens = response.get('eval_count') or 0
+    eval_ns = response.get('eval_duration') or 0
+    load_ns = response.get('load_duration') or 0
+
+    if prompt_tokens:
+        llm_tokens_total.inc(prompt_tokens, model=model, phase='prompt')
+    if eval_tokens:
+        llm_tokens_total.inc(eval_tokens, model=model, phase='generation')
+    if prompt_tokens and prompt_ns:
+        llm_tokens_per_second.set(prompt_tokens / (prompt_ns / 1e9), model=model, phase='prompt')
+    if eval_tokens and eval_ns:
+        llm_tokens_per_second.set(eval_tokens / (eval_ns / 1e9), model=model, phase='generation')
+    if load_ns:
+        llm_load_duration.observe(load_ns / 1e9, model=model)
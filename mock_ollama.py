@@ -3,18 +3,63 @@ Mock Ollama service for testing when Ollama is not available
 This allows testing of the application logic without requiring Ollama to be running
 """
 
+import asyncio
+import hashlib
 import logging
+import math
+import random
+import re
 import time
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from src.services.llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
+class MockLatencyProfile:
+    """Latency, token rate and failure behaviour of the mock backend.
+    
+    The defaults reproduce the old fixed 0.5s reply. For load testing, a
+    token rate makes longer answers slower, jitter multiplies every delay by
+    a log-normal factor (median 1) and failure_rate injects error replies.
+    """
+    
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        tokens_per_second: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+    
+    def sample(self, eval_tokens: int) -> Dict[str, float]:
+        """Draw the simulated durations (in seconds) for one call"""
+        base = self.latency_ms / 1000.0
+        generation = eval_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        factor = self._random.lognormvariate(0.0, self.jitter) if self.jitter > 0 else 1.0
+        return {
+            "load": base * 0.2 * factor,
+            "prompt_eval": base * 0.1 * factor,
+            "eval": (base * 0.7 + generation) * factor
+        }
+    
+    def should_fail(self) -> bool:
+        return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
 class MockOllamaClient:
     """Mock Ollama client that simulates responses"""
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434",
+                 latency_profile: Optional[MockLatencyProfile] = None):
         self.base_url = base_url
         self.api_url = f"{base_url}/api"
+        self.latency_profile = latency_profile or MockLatencyProfile()
         self.mock_responses = {
             "general": "I'm a helpful AI assistant for Wiko cutlery employees. I can help with document analysis, translations, email responses, and complaint handling. How can I assist you today?",
             
@@ -117,27 +162,29 @@ Phone: (555) 123-4567""",
         """Mock model list"""
         return [
             {"name": "llama3:8b", "size": 4661224676},
-            {"name": "mistral:7b", "size": 4109865159}
+            {"name": "mistral:7b", "size": 4109865159},
+            {"name": "nomic-embed-text", "size": 274302450}
         ]
     
     def pull_model(self, model_name: str) -> bool:
         """Mock model pull - always succeeds"""
         return True
     
-    def generate_response(
-        self, 
-        model: str, 
-        prompt: str, 
-        system_message: Optional[str] = None,
-        context: Optional[List] = None,
-        temperature: float = 0.7,
-        stream: bool = False
-    ) -> Dict:
-        """Generate mock response based on prompt content"""
-        
-        # Simulate processing time
-        time.sleep(0.5)
-        
+    def embed(self, model: str, texts: List[str], dimensions: int = 256) -> List[List[float]]:
+        """Deterministic hashed bag-of-words embeddings"""
+        embeddings = []
+        for text in texts:
+            vector = [0.0] * dimensions
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.md5(word.encode('utf-8')).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % dimensions
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+            embeddings.append([value / norm for value in vector])
+        return embeddings
+    
+    def select_response(self, prompt: str) -> str:
+        """Pick the canned response matching the prompt content"""
         prompt_lower = prompt.lower()
         
         # Determine response type based on prompt content
@@ -156,47 +203,61 @@ Phone: (555) 123-4567""",
             response_text = self.mock_responses["complaint_handling"]
         else:
             response_text = self.mock_responses["general"]
+        return response_text
+    
+    def _simulate(self, model: str, prompt: str):
+        """Build a mock generate reply and the delay it should take to arrive.
+        
+        Returns (response, delay_seconds) without sleeping, so the sync and
+        async clients can wait in their own way.
+        """
+        response_text = self.select_response(prompt)
+        
+        eval_count = len(response_text.split())
+        durations = self.latency_profile.sample(eval_count)
+        total = sum(durations.values())
+        
+        if self.latency_profile.should_fail():
+            logger.error("Failed to generate response: simulated backend failure")
+            return {
+                "error": "Simulated backend failure",
+                "response": "I'm sorry, I'm having trouble connecting to the AI service. Please try again later."
+            }, total
         
         return {
             "model": model,
             "created_at": "2025-01-30T12:00:00Z",
             "response": response_text,
             "done": True,
-            "total_duration": 500000000,
-            "load_duration": 100000000,
+            "total_duration": int(total * 1e9),
+            "load_duration": int(durations["load"] * 1e9),
             "prompt_eval_count": len(prompt.split()),
-            "prompt_eval_duration": 50000000,
-            "eval_count": len(response_text.split()),
-            "eval_duration": 400000000
-        }
+            "prompt_eval_duration": int(durations["prompt_eval"] * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(durations["eval"] * 1e9)
+        }, total
     
-    def chat_completion(
-        self,
-        model: str,
-        messages: List[Dict[str, str]],
-        temperature: float = 0.7,
-        stream: bool = False
-    ) -> Dict:
-        """Generate mock chat completion"""
-        
-        # Get the last user message
-        user_message = ""
+    @staticmethod
+    def _last_user_message(messages: List[Dict[str, str]]) -> str:
         for msg in reversed(messages):
             if msg.get("role") == "user":
-                user_message = msg.get("content", "")
-                break
-        
-        # Use generate_response logic
-        response_data = self.generate_response(
-            model=model,
-            prompt=user_message,
-            temperature=temperature,
-            stream=stream
-        )
+                return msg.get("content", "")
+        return ""
+    
+    @staticmethod
+    def _to_chat(response_data: Dict) -> Dict:
+        """Convert a generate-shaped reply to the chat format"""
+        if 'error' in response_data:
+            return {
+                "error": response_data["error"],
+                "message": {
+                    "role": "assistant",
+                    "content": response_data["response"]
+                }
+            }
         
-        # Convert to chat format
         return {
-            "model": model,
+            "model": response_data["model"],
             "created_at": response_data["created_at"],
             "message": {
                 "role": "assistant",
@@ -210,13 +271,72 @@ Phone: (555) 123-4567""",
             "eval_count": response_data["eval_count"],
             "eval_duration": response_data["eval_duration"]
         }
+    
+    def generate_response(
+        self, 
+        model: str, 
+        prompt: str, 
+        system_message: Optional[str] = None,
+        context: Optional[List] = None,
+        temperature: float = 0.7,
+        stream: bool = False
+    ) -> Dict:
+        """Generate mock response based on prompt content"""
+        response, delay = self._simulate(model, prompt)
+        # Simulate processing time
+        time.sleep(delay)
+        return response
+    
+    def chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        stream: bool = False
+    ) -> Dict:
+        """Generate mock chat completion"""
+        return self._to_chat(self.generate_response(
+            model=model,
+            prompt=self._last_user_message(messages),
+            temperature=temperature,
+            stream=stream
+        ))
+    
+    async def agenerate_response(
+        self,
+        model: str,
+        prompt: str,
+        system_message: Optional[str] = None,
+        temperature: float = 0.7
+    ) -> Dict:
+        """Async generate_response; waits without holding a thread"""
+        response, delay = self._simulate(model, prompt)
+        await asyncio.sleep(delay)
+        return response
+    
+    async def achat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7
+    ) -> Dict:
+        """Async chat_completion"""
+        return self._to_chat(await self.agenerate_response(
+            model=model,
+            prompt=self._last_user_message(messages),
+            temperature=temperature
+        ))
 
 class MockChatbotService:
     """Mock chatbot service using MockOllamaClient"""
     
-    def __init__(self, model_name: str = "llama3:8b"):
-        self.ollama = MockOllamaClient()
+    def __init__(self, model_name: str = "llama3:8b", scheduler: Optional[LLMScheduler] = None,
+                 embedding_model: str = "nomic-embed-text",
+                 latency_profile: Optional[MockLatencyProfile] = None):
+        self.ollama = MockOllamaClient(latency_profile=latency_profile)
         self.model_name = model_name
+        self.embedding_model = embedding_model
+        self.scheduler = scheduler or LLMScheduler()
         self.system_prompts = {
             "general": "You are a helpful AI assistant for Wiko cutlery employees.",
             "pdf_analysis": "You are an expert document analyst.",
@@ -225,14 +345,20 @@ class MockChatbotService:
             "complaint_handling": "You are a customer service expert specializing in complaint resolution."
         }
     
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the mock embedding function"""
+        return self.ollama.embed(self.embedding_model, texts)
+    
     def get_response(
         self, 
         message: str, 
         context_type: str = "general",
         conversation_history: Optional[List[Dict]] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
     ) -> Dict:
-        """Get a mock response from the chatbot"""
+        """Get a mock response from the chatbot (always free text; response_format is ignored)"""
         
         system_message = self.system_prompts.get(context_type, self.system_prompts["general"])
         
@@ -242,17 +368,111 @@ class MockChatbotService:
             messages.extend(conversation_history)
             messages.append({"role": "user", "content": message})
             
-            return self.ollama.chat_completion(
-                model=self.model_name,
-                messages=messages,
-                temperature=temperature
-            )
+            with self.scheduler.slot(priority):
+                return self.ollama.chat_completion(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature
+                )
         else:
             # Use simple generation for single queries
-            return self.ollama.generate_response(
+            with self.scheduler.slot(priority):
+                return self.ollama.generate_response(
+                    model=self.model_name,
+                    prompt=message,
+                    system_message=system_message,
+                    temperature=temperature
+                )
+
+    
+    async def aget_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
+    ) -> Dict:
+        """Async get_response; the simulated latency is awaited, not slept"""
+        system_message = self.system_prompts.get(context_type, self.system_prompts["general"])
+        
+        async with self.scheduler.aslot(priority):
+            if conversation_history:
+                messages = [{"role": "system", "content": system_message}]
+                messages.extend(conversation_history)
+                messages.append({"role": "user", "content": message})
+                return await self.ollama.achat_completion(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature
+                )
+            return await self.ollama.agenerate_response(
                 model=self.model_name,
                 prompt=message,
                 system_message=system_message,
                 temperature=temperature
             )
-
+    
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Async embed; the mock embedding is pure CPU and returns immediately"""
+        return self.embed(texts)
+    
+    @staticmethod
+    def _stream_events(response: Dict) -> Iterator[Dict]:
+        """Split a complete mock reply into stream events, word by word"""
+        if 'error' in response:
+            yield {"done": True, "error": response["error"]}
+            return
+        
+        content = response.get("response", "")
+        if "message" in response:
+            content = response["message"]["content"]
+        
+        for index, word in enumerate(content.split(" ")):
+            yield {"content": word if index == 0 else " " + word}
+        
+        yield {
+            "done": True,
+            "content": content,
+            "prompt_eval_count": response.get("prompt_eval_count", 0),
+            "eval_count": response.get("eval_count", 0),
+            "total_duration": response.get("total_duration", 0)
+        }
+    
+    def stream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Iterator[Dict]:
+        """Stream a mock response word by word"""
+        response = self.get_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority
+        )
+        yield from self._stream_events(response)
+    
+    async def astream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[Dict]:
+        """Async stream_response"""
+        response = await self.aget_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority
+        )
+        for event in self._stream_events(response):
+            yield event
@@ -0,0 +1,354 @@
+"""
+Mock Ollama HTTP server for Wiko Cutlery Chatbot
+Speaks the Ollama wire protocol (/api/tags, /api/ps, /api/generate,
+/api/chat, /api/embed, /api/embeddings, /api/pull) including NDJSON streaming, so the
+real OllamaClient - connection pooling, timeouts and the streaming parser -
+can be exercised and load-tested without Ollama or a GPU.
+
+Run standalone:
+    python -m src.services.mock_ollama_server --port 11434 --tokens-per-second 40
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from src.services.mock_ollama import MockLatencyProfile, MockOllamaClient
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Split text into word-sized pieces that concatenate back to the original"""
+    return _TOKEN_PATTERN.findall(text) or [""]
+
+
+class _MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOllama/1.0"
+
+    @property
+    def mock(self) -> "MockOllamaServer":
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    # Response helpers
+
+    def _send_json(self, status: int, body: Dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, body: Dict):
+        data = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Optional[Dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return None
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "request body must be a JSON object"})
+            return None
+        return payload
+
+    # Routing
+
+    def do_GET(self):
+        if self.path == "/":
+            data = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": self.mock.client.list_models()})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": [{"name": name, "model": name} for name in self.mock.loaded_models()]})
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-mock"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        routes = {
+            "/api/generate": self._generate,
+            "/api/chat": self._chat,
+            "/api/embed": self._embed,
+            "/api/embeddings": self._embeddings,
+            "/api/pull": self._pull,
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        payload = self._read_json()
+        if payload is None:
+            return
+        try:
+            route(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away (e.g. timed out) mid-response
+            self.close_connection = True
+
+    # Endpoints
+
+    def _generate(self, payload: Dict):
+        if not payload.get("model"):
+            self._send_json(400, {"error": "model is required"})
+            return
+        prompt = payload.get("prompt", "")
+        self._complete(payload, prompt, len(prompt.split()), chat=False)
+
+    def _chat(self, payload: Dict):
+        if not payload.get("model"):
+            self._send_json(400, {"error": "model is required"})
+            return
+        messages = payload.get("messages") or []
+        user_message = ""
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                user_message = message.get("content", "")
+                break
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        self._complete(payload, user_message, prompt_tokens, chat=True)
+
+    def _complete(self, payload: Dict, prompt: str, prompt_tokens: int, chat: bool):
+        """Shared generate/chat implementation with simulated timing and faults"""
+        model = payload["model"]
+        self.mock.mark_loaded(model)
+        fault = self.mock.draw_fault()
+
+        if fault == "stall":
+            time.sleep(self.mock.stall_ms / 1000.0)
+        if fault == "error":
+            self._send_json(500, {"error": "simulated server error"})
+            return
+
+        text = self.mock.client.select_response(prompt)
+        tokens = _tokenize(text)
+        durations = self.mock.latency_profile.sample(len(tokens))
+        stats = {
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(sum(durations.values()) * 1e9),
+            "load_duration": int(durations["load"] * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(durations["prompt_eval"] * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(durations["eval"] * 1e9),
+        }
+
+        def piece(content: str) -> Dict:
+            base = {"model": model, "created_at": datetime.utcnow().isoformat() + "Z"}
+            if chat:
+                base["message"] = {"role": "assistant", "content": content}
+            else:
+                base["response"] = content
+            return base
+
+        # Ollama streams unless the request explicitly asks otherwise
+        if not payload.get("stream", True):
+            time.sleep(sum(durations.values()))
+            self._send_json(200, {**piece(text), **stats})
+            return
+
+        self._start_stream()
+        time.sleep(durations["load"] + durations["prompt_eval"])
+        per_token = durations["eval"] / len(tokens)
+        disconnect_at = len(tokens) // 2 if fault == "disconnect" else None
+        for index, token in enumerate(tokens):
+            if index == disconnect_at:
+                # Drop the connection without the terminating chunk
+                self.close_connection = True
+                return
+            self._write_chunk({**piece(token), "done": False})
+            time.sleep(per_token)
+        self._write_chunk({**piece(""), **stats})
+        self._end_stream()
+
+    def _embed(self, payload: Dict):
+        self.mock.mark_loaded(payload.get("model"))
+        texts = payload.get("input", "")
+        if isinstance(texts, str):
+            texts = [texts]
+        self._send_json(200, {
+            "model": payload.get("model"),
+            "embeddings": self.mock.client.embed(payload.get("model"), texts)
+        })
+
+    def _embeddings(self, payload: Dict):
+        embedding = self.mock.client.embed(payload.get("model"), [payload.get("prompt", "")])[0]
+        self._send_json(200, {"embedding": embedding})
+
+    def _pull(self, payload: Dict):
+        statuses = [{"status": "pulling manifest"}, {"status": "verifying sha256 digest"}, {"status": "success"}]
+        if not payload.get("stream", True):
+            self._send_json(200, statuses[-1])
+            return
+        self._start_stream()
+        for status in statuses:
+            self._write_chunk(status)
+        self._end_stream()
+
+
+class _QuietThreadingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping pooled keep-alive connections is routine, not an error
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockOllamaServer:
+    """Mock Ollama server with configurable latency and fault injection.
+
+    Latency and the error rate come from a MockLatencyProfile. On top of
+    that, disconnect_rate drops streamed responses halfway through and
+    stall_rate delays the response by stall_ms before anything is sent, to
+    exercise client timeouts.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 11434,
+        latency_profile: Optional[MockLatencyProfile] = None,
+        disconnect_rate: float = 0.0,
+        stall_rate: float = 0.0,
+        stall_ms: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_profile = latency_profile or MockLatencyProfile()
+        self.client = MockOllamaClient(latency_profile=self.latency_profile)
+        self.disconnect_rate = disconnect_rate
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._loaded = set()
+        self._loaded_lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = _QuietThreadingHTTPServer((host, port), _MockOllamaHandler)
+        self.httpd.mock = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw_fault(self) -> Optional[str]:
+        """Decide which fault, if any, to inject into the next completion"""
+        with self._random_lock:
+            roll = self._random.random()
+        for fault, rate in (
+            ("error", self.latency_profile.failure_rate),
+            ("disconnect", self.disconnect_rate),
+            ("stall", self.stall_rate),
+        ):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def mark_loaded(self, model: Optional[str]):
+        """Record a model as loaded, as Ollama does on first use; models are never evicted"""
+        if model:
+            with self._loaded_lock:
+                self._loaded.add(model if ":" in model else f"{model}:latest")
+
+    def loaded_models(self) -> List[str]:
+        with self._loaded_lock:
+            return sorted(self._loaded)
+
+    def start(self) -> "MockOllamaServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Mock Ollama server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Base latency per completion")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Simulated generation speed")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Log-normal sigma applied to every delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions answered with HTTP 500")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of streams dropped midway")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of completions delayed by --stall-ms")
+    parser.add_argument("--stall-ms", type=float, default=90000.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockOllamaServer(
+        args.host,
+        args.port,
+        latency_profile=MockLatencyProfile(
+            latency_ms=args.latency_ms,
+            tokens_per_second=args.tokens_per_second,
+            jitter=args.jitter,
+            failure_rate=args.error_rate,
+            seed=args.seed
+        ),
+        disconnect_rate=args.disconnect_rate,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+        seed=args.seed
+    )
+    logger.info(f"Mock Ollama server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
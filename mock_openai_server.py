@@ -0,0 +1,287 @@
+"""
+Mock OpenAI-compatible HTTP server for Wiko Cutlery Chatbot
+Speaks the parts of the OpenAI wire protocol the OpenAI backend uses
+(/v1/models, /v1/chat/completions with and without SSE streaming, and
+/v1/embeddings), including token usage, so OpenAIChatbotService can be
+exercised and load-tested without an API key or a local model server.
+Responses and timing come from the same mock as MockOllamaServer.
+
+Run standalone, then point the app at it:
+    python -m src.services.mock_openai_server --port 8001
+    LLM_BACKEND=openai OPENAI_API_BASE=http://127.0.0.1:8001/v1 ...
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+
+from src.services.mock_ollama import MockLatencyProfile, MockOllamaClient
+from src.services.mock_ollama_server import _QuietThreadingHTTPServer, _tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class _MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenAI/1.0"
+
+    @property
+    def mock(self) -> "MockOpenAIServer":
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    # Response helpers
+
+    def _send_json(self, status: int, body: Dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status: int, message: str, param: Optional[str] = None):
+        self._send_json(status, {"error": {"message": message, "type": "invalid_request_error", "param": param}})
+
+    def _write_event(self, data: str):
+        event = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> Optional[Dict]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(raw or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "invalid JSON body")
+            return None
+        if not isinstance(payload, dict):
+            self._send_error(400, "request body must be a JSON object")
+            return None
+        return payload
+
+    # Routing
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json(200, {
+                "object": "list",
+                "data": [
+                    {"id": model, "object": "model", "created": 0, "owned_by": "mock"}
+                    for model in self.mock.models
+                ]
+            })
+        else:
+            self._send_error(404, "not found")
+
+    def do_POST(self):
+        routes = {
+            "/v1/chat/completions": self._chat_completions,
+            "/v1/embeddings": self._embeddings,
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_error(404, "not found")
+            return
+
+        payload = self._read_json()
+        if payload is None:
+            return
+        self.mock.record_request(self.path, payload)
+        try:
+            route(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    # Endpoints
+
+    def _chat_completions(self, payload: Dict):
+        model = payload.get("model")
+        if not model:
+            self._send_error(400, "model is required", "model")
+            return
+        if self.mock.reject_response_format and "response_format" in payload:
+            self._send_error(400, "response_format is not supported by this model", "response_format")
+            return
+        if self.mock.latency_profile.should_fail():
+            self._send_json(500, {"error": {"message": "simulated server error", "type": "server_error"}})
+            return
+
+        messages = payload.get("messages") or []
+        user_message = next(
+            (message.get("content", "") for message in reversed(messages) if message.get("role") == "user"), ""
+        )
+        text = self.mock.client.select_response(user_message)
+        tokens = _tokenize(text)
+        durations = self.mock.latency_profile.sample(len(tokens))
+        usage = {
+            "prompt_tokens": sum(len(str(message.get("content", "")).split()) for message in messages),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not payload.get("stream"):
+            time.sleep(sum(durations.values()))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+            return
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None) -> str:
+            return json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(durations["load"] + durations["prompt_eval"])
+        per_token = durations["eval"] / len(tokens)
+        self._write_event(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            self._write_event(chunk({"content": token}))
+            time.sleep(per_token)
+        self._write_event(chunk({}, "stop"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            self._write_event(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [],
+                "usage": usage
+            }))
+        self._write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _embeddings(self, payload: Dict):
+        texts = payload.get("input", "")
+        if isinstance(texts, str):
+            texts = [texts]
+        embeddings = self.mock.client.embed(payload.get("model"), texts)
+        self._send_json(200, {
+            "object": "list",
+            "model": payload.get("model"),
+            "data": [
+                {"object": "embedding", "index": index, "embedding": embedding}
+                for index, embedding in enumerate(embeddings)
+            ],
+            "usage": {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": 0}
+        })
+
+
+class MockOpenAIServer:
+    """Mock OpenAI-compatible server with configurable latency and errors.
+
+    models is what /v1/models lists. With reject_response_format, requests
+    that ask for structured output fail with a 400, like local servers
+    without JSON schema support. Every request body is kept in requests for
+    assertions.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8001,
+        latency_profile: Optional[MockLatencyProfile] = None,
+        models: Optional[List[str]] = None,
+        reject_response_format: bool = False
+    ):
+        self.latency_profile = latency_profile or MockLatencyProfile(latency_ms=0)
+        self.client = MockOllamaClient(latency_profile=self.latency_profile)
+        self.models = models or ["gpt-4o-mini", "text-embedding-3-small"]
+        self.reject_response_format = reject_response_format
+        self.requests: List[Dict] = []
+        self._requests_lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = _QuietThreadingHTTPServer((host, port), _MockOpenAIHandler)
+        self.httpd.mock = self
+
+    @property
+    def url(self) -> str:
+        """Base URL including /v1, as OPENAI_API_BASE expects"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, path: str, payload: Dict):
+        with self._requests_lock:
+            self.requests.append({"path": path, **payload})
+
+    def start(self) -> "MockOpenAIServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Mock OpenAI server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Base latency per completion")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="Simulated generation speed")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Log-normal sigma applied to every delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions answered with HTTP 500")
+    parser.add_argument("--reject-response-format", action="store_true",
+                        help="Answer structured output requests with HTTP 400")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockOpenAIServer(
+        args.host,
+        args.port,
+        latency_profile=MockLatencyProfile(
+            latency_ms=args.latency_ms,
+            tokens_per_second=args.tokens_per_second,
+            jitter=args.jitter,
+            failure_rate=args.error_rate,
+            seed=args.seed
+        ),
+        reject_response_format=args.reject_response_format
+    )
+    logger.info(f"Mock OpenAI server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Ollama model lifecycle for Wiko Cutlery Chatbot
+At startup the configured chat and embedding models are pulled if they are
+missing and warmed with a short generation. Without this, the first request
+after a deploy pays the full model load. While traffic is expected, a
+daemon thread then keeps the models resident: it extends their keep_alive
+and reloads any model Ollama has evicted. Every load time is recorded, both
+in the status and in the wiko_llm_load_duration_seconds histogram.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.services.llm_scheduler import PRIORITY_BATCH
+from src.utils.metrics import metrics, observe_llm_response
+
+logger = logging.getLogger(__name__)
+
+model_resident = metrics.gauge(
+    'wiko_model_resident',
+    'Whether a managed model was loaded in Ollama at the last check',
+    ['model']
+)
+
+
+def parse_active_hours(spec: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse "7-19" into (7, 19); None or empty means always active"""
+    if not spec:
+        return None
+    try:
+        start, end = (int(hour) for hour in spec.split('-', 1))
+    except ValueError:
+        raise ValueError(f"Active hours must look like 7-19, got {spec!r}")
+    if not (0 <= start <= 23 and 1 <= end <= 24):
+        raise ValueError(f"Active hours must be within 0-24, got {spec!r}")
+    return start, end
+
+
+def _model_key(name: str) -> str:
+    # Ollama reports untagged models as name:latest
+    return name if ':' in name else f"{name}:latest"
+
+
+class ModelLifecycleManager:
+    """Pulls, warms and keeps the configured Ollama models loaded"""
+
+    def __init__(self, client, chat_models: Iterable[str], embedding_models: Iterable[str] = (),
+                 keep_alive: Optional[str] = '30m', refresh_interval: float = 300,
+                 active_hours: Optional[str] = None, pull_missing: bool = True, scheduler=None):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.active_hours = parse_active_hours(active_hours)
+        self.pull_missing = pull_missing
+        self.scheduler = scheduler
+        self.models: Dict[str, Dict] = {}
+        for kind, names in (('chat', chat_models), ('embedding', embedding_models)):
+            for name in names:
+                self.models.setdefault(name, {
+                    'kind': kind,
+                    'status': 'pending',
+                    'pulled': None,
+                    'pull_seconds': None,
+                    'load_ms': None,
+                    'warm_ms': None,
+                    'loads': 0,
+                    'warmed_at': None,
+                    'refreshed_at': None,
+                    'resident': False,
+                    'error': None
+                })
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self.models[name].update(fields)
+
+    def traffic_expected(self, now: Optional[datetime] = None) -> bool:
+        if self.active_hours is None:
+            return True
+        start, end = self.active_hours
+        hour = (now or datetime.now()).hour
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end  # e.g. 22-6
+
+    def ensure_pulled(self, name: str) -> bool:
+        """Pull the model unless Ollama already has it"""
+        installed = {_model_key(model.get('name', '')) for model in self.client.list_models()}
+        if _model_key(name) in installed:
+            self._update(name, pulled=True)
+            return True
+        if not self.pull_missing:
+            self._update(name, pulled=False, status='error', error='Model is not installed')
+            return False
+
+        logger.info(f"Pulling model {name}")
+        started = time.monotonic()
+        pulled = self.client.pull_model(name)
+        self._update(
+            name,
+            pulled=pulled,
+            pull_seconds=round(time.monotonic() - started, 1),
+            status='pulled' if pulled else 'error',
+            error=None if pulled else 'Pull failed'
+        )
+        return pulled
+
+    def warm(self, name: str) -> bool:
+        """Load the model with a short generation and record how long the load took"""
+        embedding = self.models[name]['kind'] == 'embedding'
+        started = time.monotonic()
+        if self.scheduler is not None and not embedding:
+            with self.scheduler.slot(PRIORITY_BATCH):
+                response = self.client.warm_model(name, self.keep_alive, embedding=embedding)
+        else:
+            response = self.client.warm_model(name, self.keep_alive, embedding=embedding)
+        warm_ms = round((time.monotonic() - started) * 1000)
+
+        if 'error' in response:
+            self._update(name, status='error', error=response['error'], resident=False)
+            model_resident.set(0, model=name)
+            return False
+
+        observe_llm_response(name, response)
+        load_ms = round((response.get('load_duration') or 0) / 1e6)
+        with self._lock:
+            state = self.models[name]
+            state.update({
+                'status': 'ready',
+                'error': None,
+                'load_ms': load_ms,
+                'warm_ms': warm_ms,
+                'warmed_at': datetime.utcnow().isoformat(),
+                'refreshed_at': datetime.utcnow().isoformat(),
+                'resident': True
+            })
+            state['loads'] += 1
+        model_resident.set(1, model=name)
+        logger.info(f"Warmed model {name}: loaded in {load_ms}ms, {warm_ms}ms in total")
+        return True
+
+    def warm_up(self):
+        """Pull and warm every model; failures are retried on the next refresh"""
+        for name in list(self.models):
+            if self._stop.is_set():
+                return
+            if self.ensure_pulled(name):
+                self.warm(name)
+
+    def refresh(self):
+        """Extend the keep-alive of loaded models and reload evicted ones, if traffic is expected"""
+        if not self.traffic_expected():
+            return
+        running = self.client.running_models()
+        if running is None:
+            return
+        resident = {_model_key(model.get('name', '')) for model in running}
+
+        for name, state in list(self.models.items()):
+            if self._stop.is_set():
+                return
+            if not state['pulled']:
+                if self.ensure_pulled(name):
+                    self.warm(name)
+            elif _model_key(name) not in resident:
+                logger.info(f"Model {name} was unloaded, reloading it")
+                self.warm(name)
+            else:
+                # Loading an already loaded model only resets its keep-alive timer
+                response = self.client.warm_model(
+                    name, self.keep_alive, embedding=state['kind'] == 'embedding', generate=False
+                )
+                if 'error' not in response:
+                    self._update(name, resident=True, refreshed_at=datetime.utcnow().isoformat())
+                    model_resident.set(1, model=name)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'keep_alive': self.keep_alive,
+                'refresh_interval': self.refresh_interval,
+                'traffic_expected': self.traffic_expected(),
+                'models': {name: dict(state) for name, state in self.models.items()}
+            }
+
+    def _run(self):
+        try:
+            self.warm_up()
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}")
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Model keep-alive refresh failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='model-lifecycle', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -1,19 +1,43 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
-from typing import Dict, List, Optional, Generator
+import threading
+import time
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Generator, Iterator
+
+from src.services.prompt_templates import prompt_registry
+from src.services.llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - only needed for the async serving path
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
+UNAVAILABLE_MESSAGE = "I'm sorry, the AI service is currently unavailable. Please check that Ollama is running and try again."
+CONNECTION_ERROR_MESSAGE = "I'm sorry, I'm having trouble connecting to the AI service. Please try again later."
+
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434", keep_alive: Optional[str] = None,
+                 timeout: float = 60, pool_size: int = 10):
         self.base_url = base_url
         self.api_url = f"{base_url}/api"
+        # How long Ollama keeps the model (and its prompt cache) loaded after a request
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        # Reuse keep-alive connections instead of opening one per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
     def is_available(self) -> bool:
         """Check if Ollama service is available"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=5)
             return response.status_code == 200
         except requests.RequestException:
             return False
@@ -21,7 +45,7 @@ class OllamaClient:
     def list_models(self) -> List[Dict]:
         """List available models"""
         try:
-            response = requests.get(f"{self.api_url}/tags")
+            response = self.session.get(f"{self.api_url}/tags")
             response.raise_for_status()
             return response.json().get('models', [])
         except requests.RequestException as e:
@@ -29,19 +53,64 @@ class OllamaClient:
             return []
     
     def pull_model(self, model_name: str) -> bool:
-        """Pull a model if not available"""
+        """Pull a model, waiting until the download has finished"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/pull",
                 json={"name": model_name},
+                timeout=self.timeout,
                 stream=True
             )
             response.raise_for_status()
-            return True
+            status = None
+            for progress in self._handle_streaming_response(response):
+                if "error" in progress:
+                    logger.error(f"Failed to pull model {model_name}: {progress['error']}")
+                    return False
+                status = progress.get("status", status)
+            return status == "success"
         except requests.RequestException as e:
             logger.error(f"Failed to pull model {model_name}: {e}")
             return False
     
+    def running_models(self) -> Optional[List[Dict]]:
+        """Models currently loaded in memory, or None if Ollama cannot be reached"""
+        try:
+            response = self.session.get(f"{self.api_url}/ps", timeout=5)
+            response.raise_for_status()
+            return response.json().get('models', [])
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Failed to list running models: {e}")
+            return None
+    
+    def warm_model(self, model: str, keep_alive: Optional[str] = None, embedding: bool = False,
+                   generate: bool = True) -> Dict:
+        """Load a model and keep it loaded for keep_alive.
+        
+        Chat models run a one-token generation unless generate is False, in
+        which case they are only loaded (or their keep-alive extended).
+        Embedding models embed a short text. The response carries Ollama's
+        load_duration.
+        """
+        keep_alive = keep_alive if keep_alive is not None else self.keep_alive
+        if embedding:
+            endpoint = "embed"
+            payload = {"model": model, "input": "warm-up"}
+        else:
+            endpoint = "generate"
+            payload = {"model": model, "prompt": "Hello" if generate else "", "stream": False,
+                       "options": {"num_predict": 1}}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        
+        try:
+            response = self.session.post(f"{self.api_url}/{endpoint}", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"Failed to warm model {model}: {e}")
+            return {"error": str(e)}
+    
     def generate_response(
         self, 
         model: str, 
@@ -49,7 +118,8 @@ class OllamaClient:
         system_message: Optional[str] = None,
         context: Optional[List] = None,
         temperature: float = 0.7,
-        stream: bool = False
+        stream: bool = False,
+        format: Optional[object] = None
     ) -> Dict:
         """Generate a response using Ollama"""
         payload = {
@@ -61,6 +131,13 @@ class OllamaClient:
             }
         }
         
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        
+        if format is not None:
+            # "json" or a JSON schema to constrain the output
+            payload["format"] = format
+        
         if system_message:
             payload["system"] = system_message
             
@@ -68,10 +145,11 @@ class OllamaClient:
             payload["context"] = context
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/generate",
                 json=payload,
-                timeout=60
+                timeout=self.timeout,
+                stream=stream
             )
             response.raise_for_status()
             
@@ -92,7 +170,8 @@ class OllamaClient:
         model: str,
         messages: List[Dict[str, str]],
         temperature: float = 0.7,
-        stream: bool = False
+        stream: bool = False,
+        format: Optional[object] = None
     ) -> Dict:
         """Generate a chat completion using Ollama"""
         payload = {
@@ -104,11 +183,18 @@ class OllamaClient:
             }
         }
         
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        
+        if format is not None:
+            payload["format"] = format
+        
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/chat",
                 json=payload,
-                timeout=60
+                timeout=self.timeout,
+                stream=stream
             )
             response.raise_for_status()
             
@@ -127,80 +213,286 @@ class OllamaClient:
                 }
             }
     
+    def embed(self, model: str, texts: List[str]) -> Optional[List[List[float]]]:
+        """Compute embeddings for a list of texts"""
+        try:
+            response = self.session.post(
+                f"{self.api_url}/embed",
+                json={"model": model, "input": texts},
+                timeout=self.timeout
+            )
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json().get("embeddings")
+            
+            # Older Ollama versions only expose the single-prompt endpoint
+            embeddings = []
+            for text in texts:
+                response = self.session.post(
+                    f"{self.api_url}/embeddings",
+                    json={"model": model, "prompt": text},
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                embeddings.append(response.json()["embedding"])
+            return embeddings
+        except (requests.RequestException, KeyError, ValueError) as e:
+            logger.error(f"Failed to compute embeddings: {e}")
+            return None
+    
     def _handle_streaming_response(self, response) -> Generator[Dict, None, None]:
         """Handle streaming response from Ollama"""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    yield json.loads(line.decode('utf-8'))
-                except json.JSONDecodeError:
-                    continue
-
-class ChatbotService:
-    def __init__(self, model_name: str = "llama3:8b"):
-        self.ollama = OllamaClient()
-        self.model_name = model_name
-        self.system_prompts = {
-            "general": """You are a helpful AI assistant for Wiko cutlery employees. You help with:
-1. Analyzing PDF documents and extracting business insights
-2. Translating content between English, German, and French
-3. Generating professional email responses to customers
-4. Providing suggestions for improving customer complaint handling
-
-Always be professional, helpful, and concise in your responses. When handling customer service scenarios, emphasize empathy and solution-oriented approaches.""",
-            
-            "pdf_analysis": """You are an expert document analyst. Analyze the provided PDF content and:
-1. Summarize the key points
-2. Identify important business data (dates, amounts, contacts, etc.)
-3. Extract actionable insights
-4. Highlight any issues or concerns that need attention
-
-Provide your analysis in a clear, structured format.""",
-            
-            "translation": """You are a professional translator specializing in business communications. 
-Translate the provided text accurately while maintaining:
-1. Professional tone and context
-2. Business terminology consistency
-3. Cultural appropriateness
-4. Original meaning and intent
-
-Provide only the translation unless specifically asked for additional context.""",
-            
-            "email_assistance": """You are an expert in customer service communications. Help create professional email responses that:
-1. Address the customer's concerns directly
-2. Maintain a helpful and empathetic tone
-3. Provide clear solutions or next steps
-4. Follow business communication best practices
-5. Are appropriate for the cutlery/kitchenware industry
+        try:
+            for line in response.iter_lines():
+                if line:
+                    try:
+                        yield json.loads(line.decode('utf-8'))
+                    except json.JSONDecodeError:
+                        continue
+        finally:
+            # Hand the connection back to the pool even if the caller stops early
+            response.close()
 
-Consider the customer's situation and provide personalized, solution-oriented responses.""",
+class AsyncOllamaClient:
+    """Non-blocking Ollama client for the async serving stack (requires httpx).
+    
+    Mirrors OllamaClient's request and error shapes. The underlying
+    httpx.AsyncClient is created on first use so it binds to the event loop
+    that actually serves requests.
+    """
+    
+    def __init__(self, base_url: str = "http://localhost:11434", keep_alive: Optional[str] = None,
+                 timeout: float = 60, pool_size: int = 10):
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncOllamaClient")
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._client = None
+    
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            )
+        return self._client
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _payload(self, payload: Dict, temperature: float, format: Optional[object]) -> Dict:
+        payload["options"] = {"temperature": temperature}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if format is not None:
+            payload["format"] = format
+        return payload
+    
+    async def is_available(self) -> bool:
+        """Check if Ollama service is available"""
+        try:
+            response = await self.client.get(f"{self.base_url}/api/tags", timeout=5)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+    
+    async def generate_response(
+        self,
+        model: str,
+        prompt: str,
+        system_message: Optional[str] = None,
+        temperature: float = 0.7,
+        format: Optional[object] = None
+    ) -> Dict:
+        """Generate a response using Ollama"""
+        payload = self._payload({"model": model, "prompt": prompt, "stream": False}, temperature, format)
+        if system_message:
+            payload["system"] = system_message
+        
+        try:
+            response = await self.client.post(f"{self.api_url}/generate", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to generate response: {e}")
+            return {"error": str(e), "response": CONNECTION_ERROR_MESSAGE}
+    
+    async def chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        format: Optional[object] = None
+    ) -> Dict:
+        """Generate a chat completion using Ollama"""
+        payload = self._payload({"model": model, "messages": messages, "stream": False}, temperature, format)
+        
+        try:
+            response = await self.client.post(f"{self.api_url}/chat", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to generate chat completion: {e}")
+            return {
+                "error": str(e),
+                "message": {"role": "assistant", "content": CONNECTION_ERROR_MESSAGE}
+            }
+    
+    async def stream_chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7
+    ) -> AsyncIterator[Dict]:
+        """Yield the NDJSON chunks of a streamed chat completion.
+        
+        Connection errors propagate to the caller as httpx.HTTPError.
+        """
+        payload = self._payload({"model": model, "messages": messages, "stream": True}, temperature, None)
+        async with self.client.stream("POST", f"{self.api_url}/chat", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+    
+    async def embed(self, model: str, texts: List[str]) -> Optional[List[List[float]]]:
+        """Compute embeddings for a list of texts"""
+        try:
+            response = await self.client.post(f"{self.api_url}/embed", json={"model": model, "input": texts})
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json().get("embeddings")
             
-            "complaint_handling": """You are a customer service expert specializing in complaint resolution. Analyze the complaint and provide:
-1. Assessment of the issue severity and urgency
-2. Recommended response strategy
-3. Suggested resolution steps
-4. Tips for empathetic communication
-5. Escalation procedures if needed
+            embeddings = []
+            for text in texts:
+                response = await self.client.post(
+                    f"{self.api_url}/embeddings",
+                    json={"model": model, "prompt": text}
+                )
+                response.raise_for_status()
+                embeddings.append(response.json()["embedding"])
+            return embeddings
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            logger.error(f"Failed to compute embeddings: {e}")
+            return None
 
-Focus on turning negative experiences into positive outcomes while protecting the company's reputation."""
-        }
+class ChatbotService:
+    def __init__(
+        self,
+        model_name: str = "llama3:8b",
+        base_url: str = "http://localhost:11434",
+        keep_alive: Optional[str] = "30m",
+        scheduler: Optional[LLMScheduler] = None,
+        embedding_model: str = "nomic-embed-text",
+        timeout: float = 60,
+        pool_size: int = 10
+    ):
+        self.ollama = OllamaClient(base_url, keep_alive=keep_alive, timeout=timeout, pool_size=pool_size)
+        # Without httpx the async methods fall back to the blocking client on a worker thread
+        self.async_ollama = (
+            AsyncOllamaClient(base_url, keep_alive=keep_alive, timeout=timeout, pool_size=pool_size)
+            if httpx is not None else None
+        )
+        self.model_name = model_name
+        self.embedding_model = embedding_model
+        self.scheduler = scheduler or LLMScheduler()
+        # Shared, byte-stable system prompts so Ollama can reuse the cached prefix
+        self.system_prompts = prompt_registry.system_prompts
+        self._prompt_stats = {}
+        self._stats_lock = threading.Lock()
+    
+    def _record_prompt_usage(self, context_type: str, prompt_chars: int, response: Dict, latency_ms: float = 0.0):
+        """Track prompt/completion token counts reported by Ollama per context type"""
+        if 'error' in response:
+            return
+        
+        with self._stats_lock:
+            stats = self._prompt_stats.setdefault(context_type, {
+                "requests": 0,
+                "prompt_chars": 0,
+                "prompt_eval_count": 0,
+                "prompt_eval_duration": 0,
+                "eval_count": 0,
+                "latency_ms": 0.0
+            })
+            stats["requests"] += 1
+            stats["prompt_chars"] += prompt_chars
+            stats["prompt_eval_count"] += response.get("prompt_eval_count", 0)
+            stats["prompt_eval_duration"] += response.get("prompt_eval_duration", 0)
+            stats["eval_count"] += response.get("eval_count", 0)
+            stats["latency_ms"] += latency_ms
+    
+    def get_prompt_stats(self) -> Dict:
+        """Prompt-eval statistics per context type.
+        
+        When the system prompt prefix is served from Ollama's cache, the
+        reported prompt_eval_count drops well below the estimated token count
+        of the full prompt; the difference is reported as tokens saved.
+        """
+        with self._stats_lock:
+            result = {}
+            for context_type, stats in self._prompt_stats.items():
+                # Rough estimate of ~4 characters per token
+                estimated_tokens = stats["prompt_chars"] // 4
+                requests_count = stats["requests"] or 1
+                result[context_type] = {
+                    **stats,
+                    "estimated_prompt_tokens": estimated_tokens,
+                    "avg_prompt_eval_count": stats["prompt_eval_count"] / requests_count,
+                    "avg_latency_ms": stats["latency_ms"] / requests_count,
+                    "avg_tokens_saved": max(0, estimated_tokens - stats["prompt_eval_count"]) / requests_count
+                }
+            return result
+    
+    def embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embed texts with the configured embedding model"""
+        return self.ollama.embed(self.embedding_model, texts)
     
     def get_response(
         self, 
         message: str, 
         context_type: str = "general",
         conversation_history: Optional[List[Dict]] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
     ) -> Dict:
         """Get a response from the chatbot"""
         
         if not self.ollama.is_available():
             return {
                 "error": "Ollama service is not available",
-                "response": "I'm sorry, the AI service is currently unavailable. Please check that Ollama is running and try again."
+                "response": UNAVAILABLE_MESSAGE
             }
         
-        system_message = self.system_prompts.get(context_type, self.system_prompts["general"])
+        started = time.monotonic()
+        with self.scheduler.slot(priority):
+            response, prompt_chars = self._complete(message, context_type, conversation_history,
+                                                    temperature, response_format)
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self._record_prompt_usage(context_type, prompt_chars, response, latency_ms)
+        return response
+    
+    def _complete(
+        self,
+        message: str,
+        context_type: str,
+        conversation_history: Optional[List[Dict]],
+        temperature: float,
+        response_format: Optional[object]
+    ):
+        """Run one blocking completion; returns (response, prompt_chars). The caller holds the slot."""
+        system_message = prompt_registry.system_prompt(context_type)
         
         if conversation_history:
             # Use chat completion for conversation context
@@ -208,17 +500,232 @@ Focus on turning negative experiences into positive outcomes while protecting th
             messages.extend(conversation_history)
             messages.append({"role": "user", "content": message})
             
-            return self.ollama.chat_completion(
+            response = self.ollama.chat_completion(
                 model=self.model_name,
                 messages=messages,
-                temperature=temperature
+                temperature=temperature,
+                format=response_format
             )
-        else:
-            # Use simple generation for single queries
-            return self.ollama.generate_response(
+            return response, sum(len(msg["content"]) for msg in messages)
+        
+        # Use simple generation for single queries
+        response = self.ollama.generate_response(
+            model=self.model_name,
+            prompt=message,
+            system_message=system_message,
+            temperature=temperature,
+            format=response_format
+        )
+        return response, len(system_message) + len(message)
+    
+    def stream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Iterator[Dict]:
+        """Stream a response from the chatbot.
+        
+        Yields {"content": <delta>} for each generated piece of text and
+        finishes with {"done": True, "content": <full text>, ...} carrying
+        the token counts, or {"done": True, "error": ...} on failure.
+        """
+        if not self.ollama.is_available():
+            yield {
+                "done": True,
+                "error": "Ollama service is not available",
+                "content": UNAVAILABLE_MESSAGE
+            }
+            return
+        
+        system_message = prompt_registry.system_prompt(context_type)
+        messages = [{"role": "system", "content": system_message}]
+        messages.extend(conversation_history or [])
+        messages.append({"role": "user", "content": message})
+        prompt_chars = sum(len(msg["content"]) for msg in messages)
+        
+        started = time.monotonic()
+        parts = []
+        
+        with self.scheduler.slot(priority):
+            chunks = self.ollama.chat_completion(
                 model=self.model_name,
-                prompt=message,
-                system_message=system_message,
-                temperature=temperature
+                messages=messages,
+                temperature=temperature,
+                stream=True
             )
+            
+            if isinstance(chunks, dict):
+                # Request failed before streaming started
+                yield {"done": True, "error": chunks.get("error"), "content": chunks["message"]["content"]}
+                return
+            
+            final = {}
+            try:
+                for chunk in chunks:
+                    delta = chunk.get("message", {}).get("content", "")
+                    if delta:
+                        parts.append(delta)
+                        yield {"content": delta}
+                    if chunk.get("done"):
+                        # Keep reading to the end of the body so the connection can be reused
+                        final = chunk
+            except requests.RequestException as e:
+                logger.error(f"Streaming response interrupted: {e}")
+            finally:
+                chunks.close()
+            
+            if not final:
+                yield {"done": True, "error": "Stream ended before the response was complete", "content": "".join(parts)}
+                return
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self._record_prompt_usage(context_type, prompt_chars, final, latency_ms)
+        
+        yield {
+            "done": True,
+            "content": "".join(parts),
+            "prompt_eval_count": final.get("prompt_eval_count", 0),
+            "eval_count": final.get("eval_count", 0),
+            "total_duration": final.get("total_duration", 0)
+        }
 
+    
+    async def aembed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Async embed"""
+        if self.async_ollama is None:
+            return await asyncio.to_thread(self.embed, texts)
+        return await self.async_ollama.embed(self.embedding_model, texts)
+    
+    async def aget_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
+    ) -> Dict:
+        """Async get_response.
+        
+        Waiting for a scheduler slot and for Ollama both yield to the event
+        loop, so hundreds of queued chats cost no threads.
+        """
+        if self.async_ollama is None:
+            if not await asyncio.to_thread(self.ollama.is_available):
+                return {"error": "Ollama service is not available", "response": UNAVAILABLE_MESSAGE}
+            started = time.monotonic()
+            # Only admitted requests occupy a worker thread
+            async with self.scheduler.aslot(priority):
+                response, prompt_chars = await asyncio.to_thread(
+                    self._complete, message, context_type, conversation_history, temperature, response_format
+                )
+            self._record_prompt_usage(context_type, prompt_chars, response, (time.monotonic() - started) * 1000)
+            return response
+        
+        if not await self.async_ollama.is_available():
+            return {"error": "Ollama service is not available", "response": UNAVAILABLE_MESSAGE}
+        
+        system_message = prompt_registry.system_prompt(context_type)
+        started = time.monotonic()
+        
+        async with self.scheduler.aslot(priority):
+            if conversation_history:
+                messages = [{"role": "system", "content": system_message}]
+                messages.extend(conversation_history)
+                messages.append({"role": "user", "content": message})
+                response = await self.async_ollama.chat_completion(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature,
+                    format=response_format
+                )
+                prompt_chars = sum(len(msg["content"]) for msg in messages)
+            else:
+                response = await self.async_ollama.generate_response(
+                    model=self.model_name,
+                    prompt=message,
+                    system_message=system_message,
+                    temperature=temperature,
+                    format=response_format
+                )
+                prompt_chars = len(system_message) + len(message)
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self._record_prompt_usage(context_type, prompt_chars, response, latency_ms)
+        return response
+    
+    async def astream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[Dict]:
+        """Async stream_response; yields the same events"""
+        if self.async_ollama is None:
+            response = await self.aget_response(message, context_type, conversation_history, temperature, priority)
+            content = response.get("message", {}).get("content") or response.get("response", "")
+            if "error" in response:
+                yield {"done": True, "error": response["error"], "content": content}
+                return
+            yield {"content": content}
+            yield {
+                "done": True,
+                "content": content,
+                "prompt_eval_count": response.get("prompt_eval_count", 0),
+                "eval_count": response.get("eval_count", 0),
+                "total_duration": response.get("total_duration", 0)
+            }
+            return
+        
+        if not await self.async_ollama.is_available():
+            yield {"done": True, "error": "Ollama service is not available", "content": UNAVAILABLE_MESSAGE}
+            return
+        
+        system_message = prompt_registry.system_prompt(context_type)
+        messages = [{"role": "system", "content": system_message}]
+        messages.extend(conversation_history or [])
+        messages.append({"role": "user", "content": message})
+        prompt_chars = sum(len(msg["content"]) for msg in messages)
+        
+        started = time.monotonic()
+        parts = []
+        final = {}
+        
+        async with self.scheduler.aslot(priority):
+            try:
+                async for chunk in self.async_ollama.stream_chat(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=temperature
+                ):
+                    delta = chunk.get("message", {}).get("content", "")
+                    if delta:
+                        parts.append(delta)
+                        yield {"content": delta}
+                    if chunk.get("done"):
+                        final = chunk
+            except httpx.HTTPError as e:
+                logger.error(f"Streaming response interrupted: {e}")
+                if not parts:
+                    yield {"done": True, "error": str(e), "content": CONNECTION_ERROR_MESSAGE}
+                    return
+        
+        if not final:
+            yield {"done": True, "error": "Stream ended before the response was complete", "content": "".join(parts)}
+            return
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self._record_prompt_usage(context_type, prompt_chars, final, latency_ms)
+        
+        yield {
+            "done": True,
+            "content": "".join(parts),
+            "prompt_eval_count": final.get("prompt_eval_count", 0),
+            "eval_count": final.get("eval_count", 0),
+            "total_duration": final.get("total_duration", 0)
+        }
@@ -1,9 +1,17 @@
 import os
 import openai
-from typing import Dict, List, Optional
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 import json
 import logging
 
+from src.services.prompt_templates import prompt_registry
+from src.services.llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE
+from src.services.structured_output import SCHEMAS, extract_sections, structured_parser
+
 logger = logging.getLogger(__name__)
 
 class OpenAIClient:
@@ -14,9 +22,60 @@ class OpenAIClient:
             api_key=os.getenv('OPENAI_API_KEY'),
             base_url=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
         )
-        self.model = "gpt-4"
+        self.model = os.getenv('OPENAI_MODEL', 'gpt-4')
         self.max_tokens = 2000
         self.temperature = 0.7
+        # Ask for schema-constrained JSON instead of scraping headed sections
+        self.structured_output = os.getenv('OPENAI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+    
+    @staticmethod
+    def _rejects_response_format(error) -> bool:
+        """Whether a BadRequestError is about the response_format rather than e.g. the context length"""
+        details = f"{getattr(error, 'message', '')} {getattr(error, 'param', '') or ''} {getattr(error, 'body', '') or ''}"
+        return any(marker in details.lower() for marker in ('response_format', 'json_schema'))
+    
+    def _structured_completion(self, prompt: str, schema_name: str, max_tokens: int, temperature: float):
+        """Run a completion for a schema and parse it in one pass.
+        
+        Returns (fields, raw_text). A rejected structured request is retried
+        once in plain-text mode; only a rejection of the json_schema response
+        format turns structured output off for later calls. Free-text replies
+        fall back to heading-based section extraction.
+        """
+        schema = SCHEMAS[schema_name]
+        request = {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        
+        response = None
+        if self.structured_output:
+            try:
+                response = self.client.chat.completions.create(
+                    messages=[{"role": "user", "content": f"{prompt}\n\n{schema.instructions}"}],
+                    response_format={
+                        "type": "json_schema",
+                        "json_schema": {"name": schema_name, "schema": schema.json_schema, "strict": True}
+                    },
+                    **request
+                )
+            except openai.BadRequestError as e:
+                if self._rejects_response_format(e):
+                    logger.warning(f"Structured output not supported by backend, using text mode: {e}")
+                    self.structured_output = False
+                else:
+                    logger.warning(f"Structured request rejected, retrying in text mode: {e}")
+        
+        if response is None:
+            response = self.client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                **request
+            )
+        
+        raw_text = response.choices[0].message.content or ""
+        fields, _ = structured_parser.parse(raw_text, schema_name)
+        return fields, raw_text
     
     def chat_completion(self, messages: List[Dict], tool_context: str = "general") -> str:
         """Generate chat completion with context-aware system prompts"""
@@ -92,22 +151,10 @@ Please provide a comprehensive analysis including:
 Format your response as a structured analysis that would be useful for business decision-making."""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1500,
-                temperature=0.3
-            )
-            
-            analysis_text = response.choices[0].message.content
+            fields, analysis_text = self._structured_completion(prompt, "pdf_analysis", 1500, 0.3)
             
-            # Parse the structured response
             return {
-                "summary": self._extract_section(analysis_text, "SUMMARY"),
-                "key_points": self._extract_section(analysis_text, "KEY POINTS"),
-                "insights": self._extract_section(analysis_text, "BUSINESS INSIGHTS"),
-                "action_items": self._extract_section(analysis_text, "ACTION ITEMS"),
-                "risk_assessment": self._extract_section(analysis_text, "RISK ASSESSMENT"),
+                **fields,
                 "full_analysis": analysis_text
             }
             
@@ -191,19 +238,10 @@ BODY: [email content]
 SUGGESTIONS: [improvement recommendations]"""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1200,
-                temperature=0.7
-            )
-            
-            email_content = response.choices[0].message.content
+            fields, email_content = self._structured_completion(prompt, "email_response", 1200, 0.7)
             
             return {
-                "subject": self._extract_section(email_content, "SUBJECT"),
-                "body": self._extract_section(email_content, "BODY"),
-                "suggestions": self._extract_section(email_content, "SUGGESTIONS"),
+                **fields,
                 "tone": tone,
                 "full_response": email_content
             }
@@ -238,22 +276,10 @@ Please provide:
 Focus on customer satisfaction, brand protection, and operational improvements."""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=1500,
-                temperature=0.6
-            )
-            
-            analysis_content = response.choices[0].message.content
+            fields, analysis_content = self._structured_completion(prompt, "complaint_analysis", 1500, 0.6)
             
             return {
-                "complaint_analysis": self._extract_section(analysis_content, "COMPLAINT ANALYSIS"),
-                "response_strategy": self._extract_section(analysis_content, "RESPONSE STRATEGY"),
-                "empathy_improvements": self._extract_section(analysis_content, "EMPATHY IMPROVEMENTS"),
-                "escalation_guidance": self._extract_section(analysis_content, "ESCALATION GUIDANCE"),
-                "prevention_measures": self._extract_section(analysis_content, "PREVENTION MEASURES"),
-                "improved_response": self._extract_section(analysis_content, "IMPROVED RESPONSE"),
+                **fields,
                 "full_analysis": analysis_content
             }
             
@@ -271,25 +297,11 @@ Focus on customer satisfaction, brand protection, and operational improvements."
     
     def _extract_section(self, text: str, section_name: str) -> str:
         """Extract a specific section from structured AI response"""
-        lines = text.split('\n')
-        section_content = []
-        in_section = False
-        
-        for line in lines:
-            if section_name.upper() in line.upper() and ':' in line:
-                in_section = True
-                # Include content after the colon on the same line
-                content_after_colon = line.split(':', 1)[1].strip()
-                if content_after_colon:
-                    section_content.append(content_after_colon)
-                continue
-            elif in_section and any(keyword in line.upper() for keyword in ['SUMMARY', 'KEY POINTS', 'BUSINESS INSIGHTS', 'ACTION ITEMS', 'RISK ASSESSMENT', 'SUBJECT', 'BODY', 'SUGGESTIONS', 'COMPLAINT ANALYSIS', 'RESPONSE STRATEGY', 'EMPATHY IMPROVEMENTS', 'ESCALATION GUIDANCE', 'PREVENTION MEASURES', 'IMPROVED RESPONSE']):
-                # Hit another section, stop collecting
-                break
-            elif in_section:
-                section_content.append(line.strip())
+        headings = [heading for schema in SCHEMAS.values() for heading in schema.fields.values()]
+        if section_name.upper() not in headings:
+            headings.append(section_name.upper())
         
-        result = '\n'.join(section_content).strip()
+        result = extract_sections(text, headings).get(section_name.upper(), '')
         return result if result else f"No {section_name.lower()} available"
     
     def health_check(self) -> Dict:
@@ -304,3 +316,319 @@ Focus on customer satisfaction, brand protection, and operational improvements."
         except Exception as e:
             return {"status": "unhealthy", "error": str(e)}
 
+
+class OpenAIChatbotService:
+    """Async OpenAI-compatible backend exposing the ChatbotService interface.
+    
+    All requests run on one private event loop so the async client and its
+    connection pool are shared; the synchronous get_response/stream_response
+    wrappers let Flask routes use this backend interchangeably with Ollama,
+    and the async aget_response/astream_response wrappers do the same for
+    the ASGI routes.
+    Works against any OpenAI-compatible endpoint via base_url.
+    """
+    
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: float = 60.0,
+        max_tokens: int = 2000,
+        scheduler: Optional[LLMScheduler] = None,
+        embedding_model: Optional[str] = None
+    ):
+        self.model_name = model_name or os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        self.embedding_model = embedding_model or os.getenv('OPENAI_EMBED_MODEL', 'text-embedding-3-small')
+        self.base_url = base_url or os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+        self.max_tokens = max_tokens
+        self.client = openai.AsyncOpenAI(
+            # Local OpenAI-compatible servers usually accept any key
+            api_key=api_key or os.getenv('OPENAI_API_KEY') or 'not-needed',
+            base_url=self.base_url,
+            timeout=timeout
+        )
+        self.scheduler = scheduler or LLMScheduler()
+        self.system_prompts = prompt_registry.system_prompts
+        
+        self.usage_log = deque(maxlen=1000)
+        self._prompt_stats = {}
+        self._stats_lock = threading.Lock()
+        
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="openai-backend-loop",
+            daemon=True
+        )
+        self._loop_thread.start()
+    
+    def _build_messages(self, message: str, context_type: str, conversation_history: Optional[List[Dict]]) -> List[Dict]:
+        messages = [{"role": "system", "content": prompt_registry.system_prompt(context_type)}]
+        messages.extend(conversation_history or [])
+        messages.append({"role": "user", "content": message})
+        return messages
+    
+    def _record_usage(self, context_type: str, prompt_tokens: int, completion_tokens: int,
+                      latency_ms: float, first_token_ms: Optional[float] = None):
+        """Record token usage and latency for one call"""
+        self.usage_log.append({
+            "context_type": context_type,
+            "model": self.model_name,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(latency_ms, 1),
+            "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+            "timestamp": time.time()
+        })
+        
+        with self._stats_lock:
+            stats = self._prompt_stats.setdefault(context_type, {
+                "requests": 0,
+                "prompt_eval_count": 0,
+                "eval_count": 0,
+                "latency_ms": 0.0
+            })
+            stats["requests"] += 1
+            stats["prompt_eval_count"] += prompt_tokens
+            stats["eval_count"] += completion_tokens
+            stats["latency_ms"] += latency_ms
+    
+    def get_prompt_stats(self) -> Dict:
+        """Token usage and latency per context type, in the same shape as ChatbotService"""
+        with self._stats_lock:
+            result = {}
+            for context_type, stats in self._prompt_stats.items():
+                requests_count = stats["requests"] or 1
+                result[context_type] = {
+                    **stats,
+                    "avg_prompt_eval_count": stats["prompt_eval_count"] / requests_count,
+                    "avg_latency_ms": stats["latency_ms"] / requests_count
+                }
+            return result
+    
+    async def _aget_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        response_format: Optional[object] = None
+    ) -> Dict:
+        """Get a complete response on the private loop; returns an Ollama chat-shaped dict"""
+        messages = self._build_messages(message, context_type, conversation_history)
+        started = time.monotonic()
+        request = {}
+        if isinstance(response_format, dict):
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": f"{context_type}_response", "schema": response_format}
+            }
+        elif response_format == "json":
+            request["response_format"] = {"type": "json_object"}
+        
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=temperature,
+                **request
+            )
+        except Exception as e:
+            logger.error(f"OpenAI API error: {str(e)}")
+            return {
+                "error": str(e),
+                "message": {
+                    "role": "assistant",
+                    "content": "I'm sorry, I'm having trouble connecting to the AI service. Please try again later."
+                }
+            }
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        self._record_usage(context_type, prompt_tokens, completion_tokens, latency_ms)
+        
+        return {
+            "model": response.model,
+            "message": {
+                "role": "assistant",
+                "content": response.choices[0].message.content or ""
+            },
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": completion_tokens,
+            "total_duration": int(latency_ms * 1_000_000)
+        }
+    
+    async def _astream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[Dict]:
+        """Stream a response on the private loop; yields the same events as ChatbotService.stream_response"""
+        messages = self._build_messages(message, context_type, conversation_history)
+        started = time.monotonic()
+        first_token_ms = None
+        parts = []
+        prompt_tokens = 0
+        completion_tokens = 0
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            
+            async for chunk in stream:
+                if chunk.usage:
+                    prompt_tokens = chunk.usage.prompt_tokens
+                    completion_tokens = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = (time.monotonic() - started) * 1000
+                    parts.append(delta)
+                    yield {"content": delta}
+                    
+        except Exception as e:
+            logger.error(f"OpenAI streaming error: {str(e)}")
+            yield {
+                "done": True,
+                "error": str(e),
+                "content": "".join(parts) or "I'm sorry, I'm having trouble connecting to the AI service. Please try again later."
+            }
+            return
+        
+        latency_ms = (time.monotonic() - started) * 1000
+        self._record_usage(context_type, prompt_tokens, completion_tokens, latency_ms, first_token_ms)
+        
+        yield {
+            "done": True,
+            "content": "".join(parts),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": completion_tokens,
+            "total_duration": int(latency_ms * 1_000_000)
+        }
+    
+    def get_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
+    ) -> Dict:
+        """Synchronous wrapper matching ChatbotService.get_response"""
+        with self.scheduler.slot(priority):
+            future = asyncio.run_coroutine_threadsafe(
+                self._aget_response(message, context_type, conversation_history, temperature, response_format),
+                self._loop
+            )
+            return future.result()
+    
+    def stream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Iterator[Dict]:
+        """Synchronous wrapper matching ChatbotService.stream_response"""
+        with self.scheduler.slot(priority):
+            stream = self._astream_response(message, context_type, conversation_history, temperature)
+            try:
+                while True:
+                    try:
+                        event = asyncio.run_coroutine_threadsafe(stream.__anext__(), self._loop).result()
+                    except StopAsyncIteration:
+                        break
+                    yield event
+            finally:
+                asyncio.run_coroutine_threadsafe(stream.aclose(), self._loop).result()
+    
+    async def _aembed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embed texts with the configured embedding model on the private loop"""
+        try:
+            response = await self.client.embeddings.create(model=self.embedding_model, input=texts)
+            return [item.embedding for item in response.data]
+        except Exception as e:
+            logger.error(f"OpenAI embeddings error: {str(e)}")
+            return None
+    
+    def embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Synchronous wrapper for _aembed"""
+        return asyncio.run_coroutine_threadsafe(self._aembed(texts), self._loop).result()
+    
+    def _on_private_loop(self, coroutine):
+        """Run a coroutine on the private loop and await it from the caller's loop"""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._loop))
+    
+    async def aget_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None
+    ) -> Dict:
+        """Async wrapper matching ChatbotService.aget_response"""
+        async with self.scheduler.aslot(priority):
+            return await self._on_private_loop(
+                self._aget_response(message, context_type, conversation_history, temperature, response_format)
+            )
+    
+    async def astream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[Dict]:
+        """Async wrapper matching ChatbotService.astream_response"""
+        async with self.scheduler.aslot(priority):
+            stream = self._astream_response(message, context_type, conversation_history, temperature)
+            try:
+                while True:
+                    try:
+                        event = await self._on_private_loop(stream.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    yield event
+            finally:
+                await self._on_private_loop(stream.aclose())
+    
+    async def aembed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Async wrapper for _aembed"""
+        return await self._on_private_loop(self._aembed(texts))
+    
+    async def _alist_models(self) -> List[str]:
+        # models.list() returns a paginator, which is awaitable but not a coroutine
+        page = await self.client.models.list()
+        return [model.id for model in page.data]
+    
+    def list_models(self) -> List[str]:
+        """Ids of the models the endpoint serves"""
+        return asyncio.run_coroutine_threadsafe(self._alist_models(), self._loop).result(timeout=5)
+    
+    def is_available(self) -> bool:
+        """Check that the endpoint answers a model listing"""
+        try:
+            self.list_models()
+            return True
+        except Exception:
+            return False
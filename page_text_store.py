@@ -0,0 +1,111 @@
+"""
+Compact on-disk store of per-page text and layout blocks
+One file per document: the page records (UTF-8 text followed by the layout
+blocks as compact JSON), then an offset index and a fixed-size footer. The
+file is written once, page by page, and atomically moved into place; readers
+memory-map it and decode only the pages they ask for, so memory use does
+not grow with the size of the document.
+"""
+
+import json
+import mmap
+import os
+import struct
+import uuid
+from typing import List, Optional
+
+STORE_FILENAME = 'pages.bin'
+MAGIC = b'WKPT0001'
+# Per page: record offset, text length, blocks length
+INDEX_ENTRY = struct.Struct('<QII')
+# Index offset, page count, magic
+FOOTER = struct.Struct('<QI8s')
+
+
+class PageTextStoreError(Exception):
+    """Raised for a missing or corrupt page text file"""
+
+
+class PageTextWriter:
+    """Writes pages in order; nothing is visible to readers until commit()"""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, STORE_FILENAME)
+        # Unique, so concurrent writers of the same document do not interleave
+        self._tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._index = bytearray()
+        self._offset = 0
+        self.page_count = 0
+
+    def add(self, text: str, blocks: Optional[List] = None):
+        text_bytes = text.encode('utf-8')
+        blocks_bytes = json.dumps(blocks or [], separators=(',', ':')).encode('utf-8')
+        self._file.write(text_bytes)
+        self._file.write(blocks_bytes)
+        self._index += INDEX_ENTRY.pack(self._offset, len(text_bytes), len(blocks_bytes))
+        self._offset += len(text_bytes) + len(blocks_bytes)
+        self.page_count += 1
+
+    def commit(self):
+        self._file.write(self._index)
+        self._file.write(FOOTER.pack(self._offset, self.page_count, MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class PageTextReader:
+    """Memory-mapped, read-only access to individual pages (1-based)"""
+
+    def __init__(self, directory: str):
+        path = os.path.join(directory, STORE_FILENAME)
+        try:
+            self._file = open(path, 'rb')
+        except FileNotFoundError:
+            raise PageTextStoreError(f"No page text stored in {directory}")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < FOOTER.size:
+            self.close()
+            raise PageTextStoreError(f"Corrupt page text file: {path}")
+        self._index_offset, self.page_count, magic = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+        if magic != MAGIC:
+            self.close()
+            raise PageTextStoreError(f"Corrupt page text file: {path}")
+
+    def _entry(self, page_num: int):
+        if not 1 <= page_num <= self.page_count:
+            raise IndexError(f"Page {page_num} out of range 1-{self.page_count}")
+        return INDEX_ENTRY.unpack_from(self._map, self._index_offset + (page_num - 1) * INDEX_ENTRY.size)
+
+    def text(self, page_num: int) -> str:
+        offset, text_len, _ = self._entry(page_num)
+        return self._map[offset:offset + text_len].decode('utf-8')
+
+    def blocks(self, page_num: int) -> List:
+        """Layout blocks as [x0, y0, x1, y1, block_type, text]"""
+        offset, text_len, blocks_len = self._entry(page_num)
+        start = offset + text_len
+        return json.loads(self._map[start:start + blocks_len])
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def has_page_text(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, STORE_FILENAME))
@@ -1,14 +1,313 @@
-import fitz  # PyMuPDF
+import hashlib
+import mmap
 import os
 import logging
-from typing import Dict, List, Optional
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+from src.utils.metrics import time_stage
+
 logger = logging.getLogger(__name__)
 
+PDF_HEADER = b'%PDF-'
+PDF_TRAILER = b'%%EOF'
+# Readers accept the header and trailer anywhere within the first/last 1KB
+PDF_MARKER_WINDOW = 1024
+TEXT_PREVIEW_CHARS = 1000
+
+class PDFUploadError(Exception):
+    """Raised while an upload is being received, which stops reading the request body"""
+
+class PDFUploadSink:
+    """Writable target for a streamed upload that validates the PDF as it arrives.
+    
+    Nothing is written to disk until the PDF header has been seen, the size
+    limit is enforced on every chunk, and the SHA-256 is computed during the
+    write. The file is written under a .part name and only moved into place
+    by finish() once the trailer has been checked.
+    """
+    
+    def __init__(self, target_path: str, max_size: int):
+        self.target_path = target_path
+        self.part_path = f"{target_path}.part"
+        self.max_size = max_size
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._tail = b''
+        self._file = None
+    
+    def write(self, data: bytes) -> int:
+        if not data:
+            return 0
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.abort()
+            raise PDFUploadError(f"File too large. Maximum size: {self.max_size / (1024*1024):.1f}MB")
+        
+        self._digest.update(data)
+        self._tail = (self._tail + data)[-PDF_MARKER_WINDOW:]
+        
+        if self._file is None:
+            self._head += data
+            if PDF_HEADER not in self._head[:PDF_MARKER_WINDOW]:
+                if len(self._head) >= PDF_MARKER_WINDOW:
+                    self.abort()
+                    raise PDFUploadError("Invalid PDF file: missing PDF header")
+                return len(data)
+            self._file = open(self.part_path, 'wb')
+            data, self._head = self._head, b''
+        
+        self._file.write(data)
+        return len(data)
+    
+    def seek(self, *args):
+        # The multipart parser rewinds its containers once a part is complete
+        return 0
+    
+    def finish(self) -> Dict[str, any]:
+        """Check the trailer and move the file into place"""
+        if self._file is None:
+            self.abort()
+            return {"valid": False, "error": "Invalid PDF file: missing PDF header" if self.size else "Empty file"}
+        self._file.close()
+        if PDF_TRAILER not in self._tail:
+            self.abort()
+            return {"valid": False, "error": "Invalid PDF file: missing end-of-file marker (truncated upload?)"}
+        
+        os.replace(self.part_path, self.target_path)
+        return {
+            "valid": True,
+            "file_path": self.target_path,
+            "file_size": self.size,
+            "sha256": self._digest.hexdigest()
+        }
+    
+    def abort(self):
+        """Discard whatever has been written"""
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+class ExtractedText:
+    """Text of a document accumulated page by page as it is decoded.
+    
+    Counts, the preview and the business entities are updated per page, and
+    the page texts go to a temporary file that stays in memory up to
+    spill_threshold characters and moves to disk beyond that, so a large
+    document is never held as one string. Close it when done.
+    """
+    
+    def __init__(self, spill_threshold: int):
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=spill_threshold, mode='w+', encoding='utf-8', newline=''
+        )
+        self._page_lengths: List[int] = []
+        self._preview = ''
+        self._entities: Dict[str, set] = {}
+        self.word_count = 0
+        self.char_count = 0
+    
+    @property
+    def page_count(self) -> int:
+        """Number of pages with text"""
+        return len(self._page_lengths)
+    
+    @property
+    def preview(self) -> str:
+        if len(self._preview) > TEXT_PREVIEW_CHARS:
+            return self._preview[:TEXT_PREVIEW_CHARS] + "..."
+        return self._preview
+    
+    @property
+    def business_analysis(self) -> Dict[str, List[str]]:
+        return {key: list(values) for key, values in self._entities.items()}
+    
+    def add_page(self, text: str, entities: Optional[Dict[str, List[str]]] = None):
+        """Add a page's stripped text; empty pages are skipped"""
+        if not text:
+            return
+        separator = "\n\n" if self._page_lengths else ""
+        self.char_count += len(separator) + len(text)
+        self.word_count += len(text.split())
+        if len(self._preview) <= TEXT_PREVIEW_CHARS:
+            self._preview = (self._preview + separator + text)[:TEXT_PREVIEW_CHARS + 1]
+        for key, values in (entities or {}).items():
+            self._entities.setdefault(key, set()).update(values)
+        
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(text)
+        self._page_lengths.append(len(text))
+    
+    def iter_pages(self) -> Iterator[str]:
+        """Page texts in order, read back one at a time"""
+        self._file.seek(0)
+        for length in self._page_lengths:
+            yield self._file.read(length)
+    
+    def full_text(self) -> str:
+        return "\n\n".join(self.iter_pages())
+    
+    def close(self):
+        self._file.close()
+
 class PDFProcessor:
-    def __init__(self, max_file_size: int = 50 * 1024 * 1024):  # 50MB
+    def __init__(self, max_file_size: int = 50 * 1024 * 1024,  # 50MB
+                 text_spill_threshold: int = 4 * 1024 * 1024):
         self.max_file_size = max_file_size
+        self.text_spill_threshold = text_spill_threshold
+    
+    def upload_sink(self, target_path: str) -> PDFUploadSink:
+        """Streaming upload target enforcing this processor's size limit"""
+        return PDFUploadSink(target_path, self.max_file_size)
+    
+    @contextmanager
+    def mapped(self, file_path: str):
+        """Memory-mapped, read-only view of a file for fitz.open(stream=...)"""
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                view = memoryview(mapped_file)
+                try:
+                    yield view
+                finally:
+                    view.release()
+    
+    def _open(self, file_path: Optional[str] = None, stream=None):
+        # PyMuPDF takes a noticeable part of app startup to import, so it is loaded on first use
+        import fitz  # PyMuPDF
+        if stream is not None:
+            return fitz.open(stream=stream, filetype='pdf')
+        return fitz.open(file_path)
+    
+    def _pixmap(self, doc, xref: int):
+        import fitz  # PyMuPDF
+        return fitz.Pixmap(doc, xref)
+    
+    def page_text(self, doc, page_num: int) -> str:
+        """Stripped text of a 1-based page"""
+        with time_stage('pdf_page_extraction'):
+            return doc[page_num - 1].get_text().strip()
+    
+    def page_blocks(self, doc, page_num: int) -> List[List]:
+        """Layout blocks of a 1-based page as [x0, y0, x1, y1, block_type, text]"""
+        return [
+            [round(x0, 1), round(y0, 1), round(x1, 1), round(y1, 1), block_type, text.strip()]
+            for x0, y0, x1, y1, text, _, block_type in doc[page_num - 1].get_text('blocks')
+        ]
+    
+    def write_page_text(self, file_path: str, writer):
+        """Extract every page's text and layout blocks into a PageTextWriter, one page at a time"""
+        doc = self._open(file_path)
+        try:
+            for page_num in range(1, len(doc) + 1):
+                writer.add(self.page_text(doc, page_num), self.page_blocks(doc, page_num))
+        finally:
+            doc.close()
+    
+    def page_tables(self, doc, page_num: int) -> List[Dict[str, any]]:
+        """Tables detected on a 1-based page; empty if detection fails"""
+        tables = []
+        try:
+            with time_stage('pdf_table_extraction'):
+                page_tables = doc[page_num - 1].find_tables()
+                for table in page_tables:
+                    table_data = table.extract()
+                    if table_data:
+                        tables.append({
+                            "page": page_num,
+                            "data": table_data,
+                            "rows": len(table_data),
+                            "columns": len(table_data[0]) if table_data else 0
+                        })
+        except Exception as table_error:
+            logger.warning(f"Could not extract tables from page {page_num}: {table_error}")
+        return tables
+    
+    def page_images(self, doc, page_num: int, output_dir: str) -> List[Dict[str, any]]:
+        """Save the images of a 1-based page as PNGs in output_dir"""
+        images = []
+        os.makedirs(output_dir, exist_ok=True)
+        
+        for img_index, img in enumerate(doc[page_num - 1].get_images()):
+            xref = img[0]
+            pix = self._pixmap(doc, xref)
+            
+            if pix.n - pix.alpha < 4:  # GRAY or RGB
+                img_filename = f"page_{page_num}_img_{img_index + 1}.png"
+                img_path = os.path.join(output_dir, img_filename)
+                pix.save(img_path)
+                
+                images.append({
+                    "page": page_num,
+                    "filename": img_filename,
+                    "path": img_path,
+                    "width": pix.width,
+                    "height": pix.height
+                })
+            
+            pix = None
+        
+        return images
+    
+    def extract_pages(self, doc, page_writer=None) -> Iterator[Tuple[int, str]]:
+        """Yield (page_num, text) for each page as it is decoded.
+        
+        With page_writer, each page's text and layout blocks are also written to it.
+        """
+        for page_num in range(1, len(doc) + 1):
+            text = self.page_text(doc, page_num)
+            if page_writer is not None:
+                page_writer.add(text, self.page_blocks(doc, page_num))
+            yield page_num, text
+    
+    def _metadata(self, doc) -> Dict[str, any]:
+        return {
+            "page_count": len(doc),
+            "title": doc.metadata.get("title", ""),
+            "author": doc.metadata.get("author", ""),
+            "subject": doc.metadata.get("subject", ""),
+            "creator": doc.metadata.get("creator", ""),
+            "creation_date": doc.metadata.get("creationDate", ""),
+            "modification_date": doc.metadata.get("modDate", "")
+        }
+    
+    def _text_from_doc(self, doc) -> Dict[str, any]:
+        text_content = []
+        metadata = self._metadata(doc)
+        
+        for page_num, text in self.extract_pages(doc):
+            if text:  # Only add non-empty pages
+                text_content.append({
+                    "page": page_num,
+                    "text": text
+                })
+        
+        # Combine all text
+        full_text = "\n\n".join([page["text"] for page in text_content])
+        
+        return {
+            "valid": True,
+            "metadata": metadata,
+            "page_count": len(text_content),
+            "pages": text_content,
+            "full_text": full_text,
+            "word_count": len(full_text.split()),
+            "char_count": len(full_text)
+        }
+    
+    def _tables_from_doc(self, doc) -> Dict[str, any]:
+        tables = []
+        for page_num in range(1, len(doc) + 1):
+            tables.extend(self.page_tables(doc, page_num))
+        
+        return {
+            "valid": True,
+            "table_count": len(tables),
+            "tables": tables
+        }
         
     def validate_pdf(self, file_path: str) -> Dict[str, any]:
         """Validate PDF file"""
@@ -20,7 +319,7 @@ class PDFProcessor:
             return {"valid": False, "error": f"File too large. Maximum size: {self.max_file_size / (1024*1024):.1f}MB"}
         
         try:
-            doc = fitz.open(file_path)
+            doc = self._open(file_path)
             page_count = len(doc)
             doc.close()
             
@@ -39,42 +338,11 @@ class PDFProcessor:
             return validation
         
         try:
-            doc = fitz.open(file_path)
-            text_content = []
-            metadata = {
-                "page_count": len(doc),
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "creator": doc.metadata.get("creator", ""),
-                "creation_date": doc.metadata.get("creationDate", ""),
-                "modification_date": doc.metadata.get("modDate", "")
-            }
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                
-                if text.strip():  # Only add non-empty pages
-                    text_content.append({
-                        "page": page_num + 1,
-                        "text": text.strip()
-                    })
-            
-            doc.close()
-            
-            # Combine all text
-            full_text = "\n\n".join([page["text"] for page in text_content])
-            
-            return {
-                "valid": True,
-                "metadata": metadata,
-                "page_count": len(text_content),
-                "pages": text_content,
-                "full_text": full_text,
-                "word_count": len(full_text.split()),
-                "char_count": len(full_text)
-            }
+            doc = self._open(file_path)
+            try:
+                return self._text_from_doc(doc)
+            finally:
+                doc.close()
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
@@ -87,35 +355,11 @@ class PDFProcessor:
             return validation
         
         try:
-            doc = fitz.open(file_path)
-            tables = []
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                
-                # Find tables using PyMuPDF's table detection
-                try:
-                    page_tables = page.find_tables()
-                    for table in page_tables:
-                        table_data = table.extract()
-                        if table_data:
-                            tables.append({
-                                "page": page_num + 1,
-                                "data": table_data,
-                                "rows": len(table_data),
-                                "columns": len(table_data[0]) if table_data else 0
-                            })
-                except Exception as table_error:
-                    logger.warning(f"Could not extract tables from page {page_num + 1}: {table_error}")
-                    continue
-            
-            doc.close()
-            
-            return {
-                "valid": True,
-                "table_count": len(tables),
-                "tables": tables
-            }
+            doc = self._open(file_path)
+            try:
+                return self._tables_from_doc(doc)
+            finally:
+                doc.close()
             
         except Exception as e:
             logger.error(f"Error extracting tables from PDF: {e}")
@@ -128,35 +372,13 @@ class PDFProcessor:
             return validation
         
         try:
-            doc = fitz.open(file_path)
+            doc = self._open(file_path)
             images = []
-            
-            os.makedirs(output_dir, exist_ok=True)
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]
-                    pix = fitz.Pixmap(doc, xref)
-                    
-                    if pix.n - pix.alpha < 4:  # GRAY or RGB
-                        img_filename = f"page_{page_num + 1}_img_{img_index + 1}.png"
-                        img_path = os.path.join(output_dir, img_filename)
-                        pix.save(img_path)
-                        
-                        images.append({
-                            "page": page_num + 1,
-                            "filename": img_filename,
-                            "path": img_path,
-                            "width": pix.width,
-                            "height": pix.height
-                        })
-                    
-                    pix = None
-            
-            doc.close()
+            try:
+                for page_num in range(1, len(doc) + 1):
+                    images.extend(self.page_images(doc, page_num, output_dir))
+            finally:
+                doc.close()
             
             return {
                 "valid": True,
@@ -168,32 +390,79 @@ class PDFProcessor:
             logger.error(f"Error extracting images from PDF: {e}")
             return {"valid": False, "error": f"Failed to extract images: {str(e)}"}
     
-    def get_document_summary(self, file_path: str) -> Dict[str, any]:
-        """Get a comprehensive summary of the PDF document"""
-        text_result = self.extract_text(file_path)
-        if not text_result["valid"]:
-            return text_result
+    def summarize_document(self, file_path: str, stream=None, include_tables: bool = False,
+                           page_writer=None) -> Dict[str, any]:
+        """Summarize the PDF in a single pass over its pages, without building the full text.
         
-        tables_result = self.extract_tables(file_path)
+        Counts, preview and business analysis are computed page by page, and
+        the text itself is returned as an ExtractedText under "text", which
+        the caller must close. With stream (e.g. a view from mapped()), the
+        document is parsed from that buffer. Table detection runs on every
+        page, so it is skipped unless include_tables is set; table_count is
+        then None. With page_writer, each page's text and layout blocks are
+        also written to it during the same pass.
+        """
+        if stream is None:
+            validation = self.validate_pdf(file_path)
+            if not validation["valid"]:
+                return validation
+            file_size = validation["file_size"]
+        else:
+            file_size = len(stream)
         
-        summary = {
+        try:
+            doc = self._open(file_path, stream)
+        except Exception as e:
+            return {"valid": False, "error": f"Invalid PDF file: {str(e)}"}
+        
+        extracted = ExtractedText(self.text_spill_threshold)
+        try:
+            metadata = self._metadata(doc)
+            for page_num, text in self.extract_pages(doc, page_writer):
+                if text:
+                    with time_stage('business_analysis'):
+                        entities = self.analyze_business_content(text)
+                    extracted.add_page(text, entities)
+            tables_result = self._tables_from_doc(doc) if include_tables else None
+        except Exception as e:
+            extracted.close()
+            logger.error(f"Error extracting text from PDF: {e}")
+            return {"valid": False, "error": f"Failed to extract text: {str(e)}"}
+        finally:
+            doc.close()
+        
+        return {
             "valid": True,
             "file_info": {
-                "file_size": text_result.get("file_size", 0),
-                "page_count": text_result["page_count"],
-                "word_count": text_result["word_count"],
-                "char_count": text_result["char_count"]
+                "file_size": file_size,
+                "page_count": extracted.page_count,
+                "word_count": extracted.word_count,
+                "char_count": extracted.char_count
             },
-            "metadata": text_result["metadata"],
+            "metadata": metadata,
             "content": {
-                "has_text": text_result["word_count"] > 0,
-                "has_tables": tables_result.get("table_count", 0) > 0,
-                "table_count": tables_result.get("table_count", 0)
+                "has_text": extracted.word_count > 0,
+                "has_tables": tables_result["table_count"] > 0 if tables_result else None,
+                "table_count": tables_result["table_count"] if tables_result else None
             },
-            "text_preview": text_result["full_text"][:1000] + "..." if len(text_result["full_text"]) > 1000 else text_result["full_text"],
-            "full_text": text_result["full_text"]
+            "text_preview": extracted.preview,
+            "business_analysis": extracted.business_analysis,
+            "text": extracted
         }
+    
+    def get_document_summary(self, file_path: str, stream=None, include_tables: bool = False,
+                             page_writer=None) -> Dict[str, any]:
+        """Get a comprehensive summary of the PDF document, including its full text.
         
+        See summarize_document() for the arguments; prefer it for large documents.
+        """
+        summary = self.summarize_document(file_path, stream, include_tables, page_writer)
+        if summary["valid"]:
+            extracted = summary.pop("text")
+            try:
+                summary["full_text"] = extracted.full_text()
+            finally:
+                extracted.close()
         return summary
     
     def analyze_business_content(self, text_content: str) -> Dict[str, any]:
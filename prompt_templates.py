@@ -0,0 +1,243 @@
+"""
+Prompt template registry for Wiko Cutlery Chatbot
+Templates are dedented and compiled once at import time so every request
+renders from the same byte-stable text. Keeping system prompts identical
+across calls lets Ollama reuse the cached prompt prefix (KV cache) instead
+of re-evaluating it on every message.
+"""
+
+import string
+import textwrap
+import threading
+from typing import Dict, Optional
+
+
+class PromptTemplate:
+    """A dedented, precompiled prompt template"""
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.text = textwrap.dedent(source).strip()
+        self.raw_chars = len(source)
+        self.compiled_chars = len(self.text)
+        # Pre-parse the format fields once so render() only does substitution
+        self.fields = tuple(
+            field for _, field, _, _ in string.Formatter().parse(self.text) if field
+        )
+
+    def render(self, **values) -> str:
+        """Render the template with the given values"""
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Missing values for prompt '{self.name}': {', '.join(missing)}")
+        return self.text.format(**values)
+
+    @property
+    def whitespace_saved(self) -> int:
+        """Characters removed by dedenting compared to the inline f-string"""
+        return self.raw_chars - self.compiled_chars
+
+
+class PromptRegistry:
+    """Registry of system prompts and user prompt templates"""
+
+    def __init__(self):
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._system_prompts: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source: str) -> PromptTemplate:
+        """Compile and register a user prompt template"""
+        template = PromptTemplate(name, source)
+        with self._lock:
+            self._templates[name] = template
+        return template
+
+    def register_system_prompt(self, context_type: str, source: str) -> str:
+        """Compile and register a system prompt for a context type"""
+        text = textwrap.dedent(source).strip()
+        with self._lock:
+            self._system_prompts[context_type] = text
+        return text
+
+    def render(self, name: str, **values) -> str:
+        """Render a registered template"""
+        return self._templates[name].render(**values)
+
+    def get_template(self, name: str) -> Optional[PromptTemplate]:
+        return self._templates.get(name)
+
+    def system_prompt(self, context_type: str) -> str:
+        """Get the byte-stable system prompt for a context type"""
+        return self._system_prompts.get(context_type, self._system_prompts["general"])
+
+    @property
+    def system_prompts(self) -> Dict[str, str]:
+        return dict(self._system_prompts)
+
+    def get_stats(self) -> Dict:
+        """Template compilation statistics"""
+        return {
+            name: {
+                "compiled_chars": template.compiled_chars,
+                "whitespace_saved": template.whitespace_saved,
+                "fields": list(template.fields)
+            }
+            for name, template in self._templates.items()
+        }
+
+
+prompt_registry = PromptRegistry()
+
+# System prompts
+prompt_registry.register_system_prompt("general", """
+    You are a helpful AI assistant for Wiko cutlery employees. You help with:
+    1. Analyzing PDF documents and extracting business insights
+    2. Translating content between English, German, and French
+    3. Generating professional email responses to customers
+    4. Providing suggestions for improving customer complaint handling
+
+    Always be professional, helpful, and concise in your responses. When handling customer service scenarios, emphasize empathy and solution-oriented approaches.
+""")
+
+prompt_registry.register_system_prompt("pdf_analysis", """
+    You are an expert document analyst. Analyze the provided PDF content and:
+    1. Summarize the key points
+    2. Identify important business data (dates, amounts, contacts, etc.)
+    3. Extract actionable insights
+    4. Highlight any issues or concerns that need attention
+
+    Provide your analysis in a clear, structured format.
+""")
+
+prompt_registry.register_system_prompt("translation", """
+    You are a professional translator specializing in business communications.
+    Translate the provided text accurately while maintaining:
+    1. Professional tone and context
+    2. Business terminology consistency
+    3. Cultural appropriateness
+    4. Original meaning and intent
+
+    Provide only the translation unless specifically asked for additional context.
+""")
+
+prompt_registry.register_system_prompt("email_assistance", """
+    You are an expert in customer service communications. Help create professional email responses that:
+    1. Address the customer's concerns directly
+    2. Maintain a helpful and empathetic tone
+    3. Provide clear solutions or next steps
+    4. Follow business communication best practices
+    5. Are appropriate for the cutlery/kitchenware industry
+
+    Consider the customer's situation and provide personalized, solution-oriented responses.
+""")
+
+prompt_registry.register_system_prompt("complaint_handling", """
+    You are a customer service expert specializing in complaint resolution. Analyze the complaint and provide:
+    1. Assessment of the issue severity and urgency
+    2. Recommended response strategy
+    3. Suggested resolution steps
+    4. Tips for empathetic communication
+    5. Escalation procedures if needed
+
+    Focus on turning negative experiences into positive outcomes while protecting the company's reputation.
+""")
+
+# User prompt templates. Static instructions come first and variable content
+# last so the longest possible prefix stays identical between requests.
+prompt_registry.register("translation", """
+    Translate the following text from {source_name} to {target_name}.
+    Maintain professional tone and business context.
+    Preserve any technical terms related to cutlery, kitchenware, or business.
+
+    Text to translate:
+    {text}
+
+    Translation:
+""")
+
+prompt_registry.register("email_response", """
+    Generate a professional email response for Wiko Cutlery customer service.
+
+    Requirements:
+    1. Address the customer's specific concerns
+    2. Maintain the requested tone
+    3. Include appropriate Wiko Cutlery branding
+    4. Provide clear next steps or solutions
+    5. Include professional closing
+    6. Be specific to the cutlery/kitchenware industry
+
+    Generate a complete email with:
+    - Subject line
+    - Professional greeting
+    - Body addressing the customer's needs
+    - Appropriate closing
+    - Signature block for Wiko Cutlery
+
+    Format as:
+    Subject: [subject line]
+
+    [email body]
+
+    Email Type: {email_type}
+    Tone: {tone}
+    Suggested Subject: {subject}
+
+    Context Information:
+    {context}
+
+    Customer Message:
+    {customer_message}
+""")
+
+prompt_registry.register("complaint_analysis", """
+    Analyze this customer complaint and provide handling recommendations.
+
+    Please provide:
+    1. Issue severity assessment (Low/Medium/High/Critical)
+    2. Main concerns identified
+    3. Recommended response strategy
+    4. Suggested resolution steps
+    5. Empathy points to address
+    6. Escalation recommendations if needed
+    7. Follow-up actions
+
+    Focus on turning this negative experience into a positive outcome for Wiko cutlery.
+
+    Complaint:
+    {complaint_text}
+""")
+
+prompt_registry.register("pdf_analysis", """
+    Please analyze this PDF document and provide business insights.
+
+    Please provide:
+    1. Document summary
+    2. Key business insights
+    3. Important data points
+    4. Recommended actions or follow-ups
+
+    Document Info:
+    - Pages: {page_count}
+    - Words: {word_count}
+
+    Extracted Business Data:
+    - Dates found: {dates}
+    - Amounts found: {amounts}
+    - Companies mentioned: {companies}
+    - Key terms: {key_terms}
+
+    Content Preview:
+    {text_preview}
+""")
+
+prompt_registry.register("document_context", """
+    Use the following excerpts from the employee's uploaded documents if they are relevant to the question.
+    If they are not relevant, answer normally.
+
+    Document excerpts:
+    {excerpts}
+
+    Question:
+    {question}
+""")
@@ -0,0 +1,203 @@
+"""
+Background retention sweeper for Wiko Cutlery Chatbot
+Instead of one cron run doing all cleanup at once, a daemon thread does a
+short time slice of work every interval: expired documents in batches via
+the expires_at index, old chat sessions, then the next part of a name-ordered
+orphaned-file scan. Progress is checkpointed to a JSON file so a restart
+resumes the scan where it stopped, and file operations are throttled to an
+I/O budget so the sweep never competes with uploads for the disk.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: run a single worker, or a single sweeper
+    fcntl = None
+
+from src.models.employee import db
+from src.services.data_cleanup import DataCleanupService
+from src.utils.metrics import metrics
+from src.utils.service_config import service_config
+
+logger = logging.getLogger(__name__)
+
+retention_deleted = metrics.counter(
+    'wiko_retention_deleted_total',
+    'Items removed by the background retention sweeper',
+    ['kind']
+)
+
+
+class IOBudget:
+    """Token bucket limiting file operations per second"""
+
+    def __init__(self, ops_per_second: float, burst: Optional[float] = None):
+        self.ops_per_second = ops_per_second
+        self.burst = burst or max(1.0, ops_per_second)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def spend(self, ops: int = 1):
+        """Take ops tokens, sleeping until the budget allows it"""
+        if self.ops_per_second <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.ops_per_second)
+            self._updated = now
+            self._tokens -= ops
+            wait = -self._tokens / self.ops_per_second if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class RetentionSweeper:
+    """Incremental, resumable retention cleanup on a daemon thread"""
+
+    def __init__(self, app, upload_dir: str, checkpoint_path: str,
+                 interval_seconds: float = 60, slice_ms: float = 500,
+                 io_ops_per_second: float = 200, batch_size: Optional[int] = None):
+        self.app = app
+        self.upload_dir = upload_dir
+        self.checkpoint_path = checkpoint_path
+        self.interval_seconds = interval_seconds
+        self.slice_seconds = slice_ms / 1000.0
+        self.cleanup = DataCleanupService(
+            batch_size=batch_size or min(service_config.cleanup_batch_size, 200),
+            io_budget=IOBudget(io_ops_per_second)
+        )
+        self._stop = threading.Event()
+        self._thread = None
+        self.checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict:
+        checkpoint = {
+            'orphan_scan_after': None,
+            'orphan_pass_started_at': None,
+            'orphan_pass_completed_at': None,
+            'last_sweep_at': None,
+            'totals': {'documents': 0, 'sessions': 0, 'messages': 0, 'files': 0}
+        }
+        if os.path.exists(self.checkpoint_path):
+            try:
+                with open(self.checkpoint_path, 'r') as f:
+                    checkpoint.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Ignoring unreadable retention checkpoint {self.checkpoint_path}: {e}")
+        return checkpoint
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _count(self, kind: str, amount: int):
+        if amount:
+            self.checkpoint['totals'][kind] = self.checkpoint['totals'].get(kind, 0) + amount
+            retention_deleted.inc(amount, kind=kind)
+
+    def sweep_once(self) -> Dict[str, int]:
+        """Run one time slice of retention work and checkpoint it.
+
+        Every app worker runs a sweeper on the same checkpoint; an exclusive
+        lock on a file next to it lets one worker sweep at a time, and the
+        others skip the slice.
+        """
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        with open(f"{self.checkpoint_path}.lock", 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.debug("Retention sweep already running in another process, skipping")
+                    return {'documents': 0, 'sessions': 0, 'messages': 0, 'files': 0}
+            # Another worker may have moved the scan on since this one last swept
+            self.checkpoint = self._load_checkpoint()
+            return self._sweep()
+
+    def _sweep(self) -> Dict[str, int]:
+        deadline = time.monotonic() + self.slice_seconds
+        done = {'documents': 0, 'sessions': 0, 'messages': 0, 'files': 0}
+
+        with self.app.app_context():
+            try:
+                now = datetime.utcnow()
+                while time.monotonic() < deadline:
+                    removed = self.cleanup.expire_documents_batch(now)
+                    done['documents'] += removed
+                    if removed < self.cleanup.batch_size:
+                        break
+
+                if time.monotonic() < deadline:
+                    cutoff_date = now - timedelta(days=self.cleanup.retention_days)
+                    deleted = self.cleanup.purge_chat_sessions(cutoff_date, deadline=deadline)
+                    done['sessions'] += deleted['sessions']
+                    done['messages'] += deleted['messages']
+
+                while time.monotonic() < deadline:
+                    after = self.checkpoint['orphan_scan_after']
+                    if after is None:
+                        self.checkpoint['orphan_pass_started_at'] = now.isoformat()
+                    removed, after = self.cleanup.scan_orphaned_files(self.upload_dir, after)
+                    done['files'] += removed
+                    self.checkpoint['orphan_scan_after'] = after
+                    if after is None:
+                        self.checkpoint['orphan_pass_completed_at'] = datetime.utcnow().isoformat()
+                        break
+
+            except Exception as e:
+                logger.error(f"Retention sweep failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+        for kind, amount in done.items():
+            self._count(kind, amount)
+        self.checkpoint['last_sweep_at'] = datetime.utcnow().isoformat()
+        self._save_checkpoint()
+
+        if any(done.values()):
+            logger.info(
+                f"Retention sweep removed {done['documents']} documents, {done['sessions']} sessions, "
+                f"{done['messages']} messages, {done['files']} orphaned files"
+            )
+        return done
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self.sweep_once()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='retention-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def start_retention_sweeper(app, upload_dir: str) -> RetentionSweeper:
+    """Start the sweeper for app's upload directory"""
+    sweeper = RetentionSweeper(
+        app,
+        upload_dir,
+        service_config.retention_checkpoint_path,
+        interval_seconds=service_config.retention_sweep_interval,
+        slice_ms=service_config.retention_slice_ms,
+        io_ops_per_second=service_config.retention_io_ops_per_second
+    )
+    sweeper.start()
+    return sweeper
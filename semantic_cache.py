@@ -0,0 +1,377 @@
+"""
+Semantic response cache for Wiko Cutlery Chatbot
+Paraphrased questions ("my knife rusted" / "blade has rust spots") map to the
+same cached answer when their embeddings are close enough. Each context type
+keeps its own fixed-size NumPy matrix of recent prompt embeddings, searched
+with a single matrix-vector product.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - cache is disabled without NumPy
+    np = None
+
+from src.services.llm_scheduler import PRIORITY_INTERACTIVE
+from src.utils.metrics import metrics, observe_llm_response, observe_stage
+
+logger = logging.getLogger(__name__)
+
+cache_lookups = metrics.counter(
+    'wiko_semantic_cache_lookups_total',
+    'Semantic cache lookups by result',
+    ['context_type', 'result']
+)
+
+
+class _ContextBucket:
+    """Embeddings and cached responses for one context type"""
+
+    def __init__(self, capacity: int, dimensions: int):
+        self.matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.entries: Dict[int, Dict] = {}
+        self.lru: "OrderedDict[int, None]" = OrderedDict()
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+
+class SemanticCache:
+    """LRU + TTL cache keyed by prompt embedding similarity"""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Optional[List[List[float]]]],
+        threshold: float = 0.92,
+        max_entries: int = 512,
+        ttl_seconds: int = 3600,
+        disabled_contexts: Iterable[str] = (),
+        aembed_fn: Optional[Callable[[List[str]], Awaitable[Optional[List[List[float]]]]]] = None
+    ):
+        if np is None:
+            raise ImportError("NumPy is required for the semantic cache")
+        self.embed_fn = embed_fn
+        # Used by alookup so the async request path never blocks on embedding
+        self.aembed_fn = aembed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disabled_contexts = set(disabled_contexts)
+        self._buckets: Dict[str, _ContextBucket] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def is_enabled_for(self, context_type: str) -> bool:
+        return context_type not in self.disabled_contexts
+
+    def _embed(self, text: str) -> Optional["np.ndarray"]:
+        try:
+            result = self.embed_fn([text])
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+        return self._normalize(result)
+
+    async def _aembed(self, text: str) -> Optional["np.ndarray"]:
+        if self.aembed_fn is None:
+            return self._embed(text)
+        try:
+            result = await self.aembed_fn([text])
+        except Exception as e:
+            logger.warning(f"Semantic cache embedding failed: {e}")
+            return None
+        return self._normalize(result)
+
+    @staticmethod
+    def _normalize(result: Optional[List[List[float]]]) -> Optional["np.ndarray"]:
+        if not result:
+            return None
+        vector = np.asarray(result[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _evict(self, bucket: _ContextBucket, slot: int):
+        bucket.valid[slot] = False
+        bucket.entries.pop(slot, None)
+        bucket.lru.pop(slot, None)
+        bucket.free_slots.append(slot)
+
+    def lookup(self, cache_key: str, text: str) -> Tuple[Optional[Dict], Optional["np.ndarray"]]:
+        """Find a cached response for text.
+
+        Returns (response, embedding). The embedding is handed back so a
+        miss can be stored without embedding the prompt a second time.
+        """
+        return self.lookup_vector(cache_key, self._embed(text))
+
+    async def alookup(self, cache_key: str, text: str) -> Tuple[Optional[Dict], Optional["np.ndarray"]]:
+        """Async lookup; embeds through aembed_fn when one is configured"""
+        return self.lookup_vector(cache_key, await self._aembed(text))
+
+    def lookup_vector(self, cache_key: str, vector: Optional["np.ndarray"]) -> Tuple[Optional[Dict], Optional["np.ndarray"]]:
+        """Find a cached response for an already normalized prompt embedding"""
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            bucket = self._buckets.get(cache_key)
+            if bucket is None or bucket.matrix.shape[1] != vector.shape[0] or not bucket.entries:
+                self._stats["misses"] += 1
+                return None, vector
+
+            # Expired entries are dropped before scoring so a valid runner-up can still hit
+            expired = np.flatnonzero(bucket.valid & (time.monotonic() - bucket.created_at > self.ttl_seconds))
+            for slot in expired:
+                self._evict(bucket, int(slot))
+            self._stats["expired"] += len(expired)
+
+            scores = bucket.matrix @ vector
+            scores[~bucket.valid] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+
+            if score < self.threshold:
+                self._stats["misses"] += 1
+                return None, vector
+
+            entry = bucket.entries[slot]
+            bucket.lru.move_to_end(slot)
+            self._stats["hits"] += 1
+            return {**entry["response"], "cached": True, "cache_similarity": round(score, 4)}, vector
+
+    def store(self, cache_key: str, vector: "np.ndarray", response: Dict):
+        """Cache a response under a prompt embedding, evicting the least recently used entry if full"""
+        with self._lock:
+            bucket = self._buckets.get(cache_key)
+            if bucket is None or bucket.matrix.shape[1] != vector.shape[0]:
+                bucket = _ContextBucket(self.max_entries, vector.shape[0])
+                self._buckets[cache_key] = bucket
+
+            if not bucket.free_slots:
+                oldest, _ = bucket.lru.popitem(last=False)
+                self._evict(bucket, oldest)
+                self._stats["evictions"] += 1
+
+            slot = bucket.free_slots.pop()
+            bucket.matrix[slot] = vector
+            bucket.valid[slot] = True
+            bucket.created_at[slot] = time.monotonic()
+            bucket.entries[slot] = {"response": response}
+            bucket.lru[slot] = None
+            self._stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": {key: len(bucket.entries) for key, bucket in self._buckets.items()},
+                "threshold": self.threshold,
+                "disabled_contexts": sorted(self.disabled_contexts)
+            }
+
+
+class CachedChatbotService:
+    """Puts a SemanticCache in front of any chatbot backend.
+
+    Only stateless requests (no conversation history) are cached. Callers
+    can pass cache_text to key the cache on the variable part of a
+    templated prompt, or use_cache=False to bypass it. Every LLM call
+    passes through here, so backend token throughput and time-to-first-token
+    are recorded here too.
+    """
+
+    def __init__(self, backend, cache: Optional[SemanticCache]):
+        self.backend = backend
+        self.semantic_cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _cache_key(self, context_type: str, response_format) -> str:
+        return f"{context_type}:structured" if response_format is not None else context_type
+
+    def _cacheable(self, context_type: str, conversation_history, use_cache: bool) -> bool:
+        return (
+            use_cache
+            and self.semantic_cache is not None
+            and not conversation_history
+            and self.semantic_cache.is_enabled_for(context_type)
+        )
+
+    def _finish_response(self, cache_key: str, vector, response: Dict):
+        """Record metrics for a backend response and cache it if it succeeded"""
+        if 'error' in response:
+            return
+        observe_llm_response(self.backend.model_name, response)
+        # Without streaming, the first token arrives once loading and prompt evaluation finish
+        first_token_ns = (response.get('load_duration') or 0) + (response.get('prompt_eval_duration') or 0)
+        if first_token_ns:
+            observe_stage('time_to_first_token', first_token_ns / 1e9)
+        if vector is not None:
+            self.semantic_cache.store(cache_key, vector, response)
+
+    @staticmethod
+    def _replay(cached: Dict) -> List[Dict]:
+        """Stream events for a cache hit, replayed as a single chunk"""
+        content = cached.get("response", "")
+        if "message" in cached:
+            content = cached["message"]["content"]
+        return [{"content": content}, {"done": True, "content": content, "cached": True}]
+
+    def _observe_stream_event(self, event: Dict, started: float, first_token: bool,
+                              cache_key: str, vector) -> bool:
+        """Record metrics for one stream event and cache the finished reply.
+
+        Returns whether the first token is still outstanding.
+        """
+        if first_token and event.get("content") and not event.get("done"):
+            first_token = False
+            observe_stage('time_to_first_token', time.perf_counter() - started)
+        if event.get("done") and not event.get("error"):
+            observe_llm_response(self.backend.model_name, event)
+            if vector is not None:
+                self.semantic_cache.store(cache_key, vector, {
+                    "message": {"role": "assistant", "content": event["content"]},
+                    "done": True
+                })
+        return first_token
+
+    def get_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None,
+        cache_text: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """Get a response, serving semantically equivalent prompts from the cache"""
+        vector = None
+        cache_key = self._cache_key(context_type, response_format)
+        if self._cacheable(context_type, conversation_history, use_cache):
+            cached, vector = self.semantic_cache.lookup(cache_key, cache_text or message)
+            cache_lookups.inc(context_type=context_type, result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                return cached
+
+        kwargs = {"response_format": response_format} if response_format is not None else {}
+        response = self.backend.get_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority,
+            **kwargs
+        )
+
+        self._finish_response(cache_key, vector, response)
+        return response
+
+    def stream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        cache_text: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Iterator[Dict]:
+        """Stream a response; cache hits are replayed as a single chunk"""
+        vector = None
+        if self._cacheable(context_type, conversation_history, use_cache):
+            cached, vector = self.semantic_cache.lookup(context_type, cache_text or message)
+            cache_lookups.inc(context_type=context_type, result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                yield from self._replay(cached)
+                return
+
+        started = time.perf_counter()
+        first_token = True
+        for event in self.backend.stream_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority
+        ):
+            first_token = self._observe_stream_event(event, started, first_token, context_type, vector)
+            yield event
+
+    async def aget_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        response_format: Optional[object] = None,
+        cache_text: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict:
+        """Async get_response for the ASGI routes"""
+        vector = None
+        cache_key = self._cache_key(context_type, response_format)
+        if self._cacheable(context_type, conversation_history, use_cache):
+            cached, vector = await self.semantic_cache.alookup(cache_key, cache_text or message)
+            cache_lookups.inc(context_type=context_type, result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                return cached
+
+        kwargs = {"response_format": response_format} if response_format is not None else {}
+        response = await self.backend.aget_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority,
+            **kwargs
+        )
+
+        self._finish_response(cache_key, vector, response)
+        return response
+
+    async def astream_response(
+        self,
+        message: str,
+        context_type: str = "general",
+        conversation_history: Optional[List[Dict]] = None,
+        temperature: float = 0.7,
+        priority: int = PRIORITY_INTERACTIVE,
+        cache_text: Optional[str] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict]:
+        """Async stream_response for the ASGI routes"""
+        vector = None
+        if self._cacheable(context_type, conversation_history, use_cache):
+            cached, vector = await self.semantic_cache.alookup(context_type, cache_text or message)
+            cache_lookups.inc(context_type=context_type, result='hit' if cached is not None else 'miss')
+            if cached is not None:
+                for event in self._replay(cached):
+                    yield event
+                return
+
+        started = time.perf_counter()
+        first_token = True
+        async for event in self.backend.astream_response(
+            message=message,
+            context_type=context_type,
+            conversation_history=conversation_history,
+            temperature=temperature,
+            priority=priority
+        ):
+            first_token = self._observe_stream_event(event, started, first_token, context_type, vector)
+            yield event
@@ -5,25 +5,262 @@ Handles switching between real and mock services based on availability
 
 import os
 import logging
-from typing import Optional
+import threading
+import time
+from typing import Callable, Iterable, Optional
 
 logger = logging.getLogger(__name__)
 
+class LazyService:
+    """Thread-safe proxy for a service that is built on first use.
+    
+    Attribute access is forwarded to the service, so a module-level proxy can
+    be used like the service itself. get() returns the service, which is None
+    for optional services that are disabled. A factory that raises is retried
+    on the next use.
+    """
+    
+    def __init__(self, name: str, factory: Callable):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._service = None
+        self._initialized = False
+    
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+    
+    def get(self):
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    started = time.monotonic()
+                    self._service = self._factory()
+                    self._initialized = True
+                    logger.info(f"Initialized {self.name} in {(time.monotonic() - started) * 1000:.0f}ms")
+        return self._service
+    
+    def __getattr__(self, name):
+        service = self.get()
+        if service is None:
+            raise AttributeError(f"{self.name} is not available")
+        return getattr(service, name)
+    
+    def __repr__(self):
+        return f"<LazyService {self.name} ({'initialized' if self._initialized else 'pending'})>"
+
+def start_service_warmup(services: Iterable[LazyService]) -> threading.Thread:
+    """Initialize lazy services in a daemon thread so the first request does not wait for them"""
+    def warm_up():
+        for service in services:
+            try:
+                service.get()
+            except Exception as e:
+                logger.error(f"Service warm-up failed for {service!r}: {e}")
+    
+    thread = threading.Thread(target=warm_up, name='service-warmup', daemon=True)
+    thread.start()
+    return thread
+
 class ServiceConfig:
     """Configuration manager for chatbot services"""
     
     def __init__(self):
         self.use_mock_services = os.getenv('USE_MOCK_SERVICES', 'false').lower() == 'true'
+        self.llm_backend = os.getenv('LLM_BACKEND', 'ollama').lower()
+        self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+        self.openai_api_base = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
         self.ollama_url = os.getenv('OLLAMA_URL', 'http://localhost:11434')
         self.preferred_model = os.getenv('OLLAMA_MODEL', 'llama3:8b')
         self.fallback_model = os.getenv('OLLAMA_FALLBACK_MODEL', 'mistral:7b')
+        self.keep_alive = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+        self.ollama_timeout = float(os.getenv('OLLAMA_TIMEOUT', '60'))
+        # Services are built on first use; this builds them in the background right after startup
+        self.service_warmup_enabled = os.getenv('SERVICE_WARMUP_ENABLED', 'true').lower() == 'true'
+        # Pull and warm the models at startup, then keep them loaded while traffic is expected
+        self.model_warmup_enabled = os.getenv('MODEL_WARMUP_ENABLED', 'true').lower() == 'true'
+        self.model_pull_missing = os.getenv('OLLAMA_PULL_MISSING', 'true').lower() == 'true'
+        self.model_refresh_interval = float(os.getenv('MODEL_REFRESH_INTERVAL', '300'))
+        self.model_active_hours = os.getenv('MODEL_ACTIVE_HOURS', '')  # e.g. "7-19"; empty = always
+        self.ollama_pool_size = int(os.getenv('OLLAMA_POOL_SIZE', '10'))
+        self.structured_output = os.getenv('STRUCTURED_OUTPUT', 'true').lower() == 'true'
+        self.embedding_model = os.getenv('OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+        self.retrieval_enabled = os.getenv('RETRIEVAL_ENABLED', 'true').lower() == 'true'
+        self.document_index_dir = os.getenv(
+            'DOCUMENT_INDEX_DIR',
+            os.path.join(os.path.dirname(__file__), '..', 'vector_index')
+        )
+        # Lazily extracted per-document text, tables and images
+        self.document_artifacts_dir = os.getenv(
+            'DOCUMENT_ARTIFACTS_DIR',
+            os.path.join(os.path.dirname(__file__), '..', 'document_artifacts')
+        )
+        # Extracted upload text beyond this many characters is spilled to a temporary file
+        self.pdf_text_spill_chars = int(os.getenv('PDF_TEXT_SPILL_CHARS', str(4 * 1024 * 1024)))
+        # Read numeric dates like 03/04/2024 as day/month when normalizing document entities
+        self.entity_dates_day_first = os.getenv('ENTITY_DATES_DAY_FIRST', 'false').lower() == 'true'
+        self.retrieval_top_k = int(os.getenv('RETRIEVAL_TOP_K', '4'))
+        self.retrieval_min_score = float(os.getenv('RETRIEVAL_MIN_SCORE', '0.3'))
+        self.semantic_cache_enabled = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+        self.semantic_cache_threshold = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+        self.semantic_cache_max_entries = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', '512'))
+        self.semantic_cache_ttl = int(os.getenv('SEMANTIC_CACHE_TTL', '3600'))
+        # Contexts whose prompts carry per-customer or per-document details are not cached by default
+        self.semantic_cache_disabled_contexts = [
+            context.strip()
+            for context in os.getenv(
+                'SEMANTIC_CACHE_DISABLED_CONTEXTS',
+                'translation,email_assistance,pdf_analysis'
+            ).split(',')
+            if context.strip()
+        ]
+        self.max_llm_concurrency = int(os.getenv('OLLAMA_MAX_CONCURRENCY', '2'))
+        # How long an authenticated employee's record is reused before it is reloaded (0 disables)
+        self.identity_cache_ttl = float(os.getenv('IDENTITY_CACHE_TTL', '10'))
+        self.identity_cache_max_entries = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '1024'))
+        # Admin dashboard statistics are recomputed at most this often (seconds)
+        self.stats_snapshot_max_age = int(os.getenv('STATS_SNAPSHOT_MAX_AGE', '300'))
+        # Retention deletes this many rows per transaction, pausing between batches
+        self.cleanup_batch_size = int(os.getenv('CLEANUP_BATCH_SIZE', '1000'))
+        self.cleanup_batch_pause_ms = float(os.getenv('CLEANUP_BATCH_PAUSE_MS', '0'))
+        self.orphan_grace_seconds = int(os.getenv('ORPHAN_GRACE_SECONDS', '3600'))
+        # Background retention sweeper: runs a time slice of cleanup every interval, within an I/O budget
+        self.retention_sweeper_enabled = os.getenv('RETENTION_SWEEPER_ENABLED', 'false').lower() == 'true'
+        self.retention_sweep_interval = float(os.getenv('RETENTION_SWEEP_INTERVAL', '60'))
+        self.retention_slice_ms = float(os.getenv('RETENTION_SLICE_MS', '500'))
+        self.retention_io_ops_per_second = float(os.getenv('RETENTION_IO_OPS_PER_SECOND', '200'))
+        self.retention_checkpoint_path = os.getenv(
+            'RETENTION_CHECKPOINT_PATH',
+            os.path.join(os.path.dirname(__file__), '..', 'database', 'retention_checkpoint.json')
+        )
+        # Online backups copy this many pages per step, sleeping between steps
+        self.backup_dir = os.getenv('BACKUP_DIR', os.path.join(os.path.dirname(__file__), '..', 'backups'))
+        self.backup_pages_per_step = int(os.getenv('BACKUP_PAGES_PER_STEP', '1024'))
+        self.backup_step_sleep_ms = float(os.getenv('BACKUP_STEP_SLEEP_MS', '50'))
+        # Write-ahead logging lets readers and backups run alongside writers
+        self.sqlite_wal = os.getenv('SQLITE_WAL', 'true').lower() == 'true'
+        # App worker processes, as set for gunicorn/uvicorn
+        self.web_concurrency = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+        # Batch PDF ingestion: extraction processes per app worker (by default the CPU cores
+        # are shared out between the app workers), files and bytes per request
+        self.batch_ingest_workers = int(os.getenv('BATCH_INGEST_WORKERS', '0')) or \
+            max(1, (os.cpu_count() or 1) // self.web_concurrency)
+        self.batch_max_files = int(os.getenv('BATCH_MAX_FILES', '100'))
+        self.batch_max_bytes = int(os.getenv('BATCH_MAX_BYTES', str(500 * 1024 * 1024)))
+        self.email_batch_concurrency = int(os.getenv('EMAIL_BATCH_CONCURRENCY', '2'))
+        self.email_batch_max_items = int(os.getenv('EMAIL_BATCH_MAX_ITEMS', '500'))
+        # Simulated backend behaviour, used when running on the mock service
+        self.mock_latency_ms = float(os.getenv('MOCK_OLLAMA_LATENCY_MS', '500'))
+        self.mock_tokens_per_second = float(os.getenv('MOCK_OLLAMA_TOKENS_PER_SECOND', '0'))
+        self.mock_latency_jitter = float(os.getenv('MOCK_OLLAMA_LATENCY_JITTER', '0'))
+        self.mock_failure_rate = float(os.getenv('MOCK_OLLAMA_FAILURE_RATE', '0'))
+        self.mock_seed = int(os.environ['MOCK_OLLAMA_SEED']) if os.getenv('MOCK_OLLAMA_SEED') else None
+        self._scheduler = None
+        self._model_lifecycle = None
+    
+    @property
+    def scheduler(self):
+        """Shared LLM scheduler so all services compete for the same backend slots"""
+        if self._scheduler is None:
+            from src.services.llm_scheduler import LLMScheduler
+            self._scheduler = LLMScheduler(self.max_llm_concurrency)
+        return self._scheduler
+        
+    @property
+    def model_lifecycle(self):
+        """The running ModelLifecycleManager, if start_model_lifecycle() started one"""
+        return self._model_lifecycle
+    
+    def start_model_lifecycle(self):
+        """Pull and warm the Ollama models in the background and keep them loaded.
+        
+        Only applies to the Ollama backend; returns None otherwise.
+        """
+        if self._model_lifecycle is not None:
+            return self._model_lifecycle
+        if not self.model_warmup_enabled or self.use_mock_services or self.llm_backend != 'ollama':
+            return None
         
+        from src.services.model_lifecycle import ModelLifecycleManager
+        from src.services.ollama_client import OllamaClient
+        
+        embedding_models = []
+        if self.retrieval_enabled or self.semantic_cache_enabled:
+            embedding_models.append(self.embedding_model)
+        self._model_lifecycle = ModelLifecycleManager(
+            OllamaClient(self.ollama_url, timeout=self.ollama_timeout),
+            chat_models=[self.preferred_model],
+            embedding_models=embedding_models,
+            keep_alive=self.keep_alive,
+            refresh_interval=self.model_refresh_interval,
+            active_hours=self.model_active_hours,
+            pull_missing=self.model_pull_missing,
+            scheduler=self.scheduler
+        )
+        self._model_lifecycle.start()
+        return self._model_lifecycle
+    
+    def _get_mock_service(self):
+        from src.services.mock_ollama import MockChatbotService, MockLatencyProfile
+        return MockChatbotService(
+            self.preferred_model,
+            scheduler=self.scheduler,
+            embedding_model=self.embedding_model,
+            latency_profile=MockLatencyProfile(
+                latency_ms=self.mock_latency_ms,
+                tokens_per_second=self.mock_tokens_per_second,
+                jitter=self.mock_latency_jitter,
+                failure_rate=self.mock_failure_rate,
+                seed=self.mock_seed
+            )
+        )
+    
     def get_chatbot_service(self):
-        """Get appropriate chatbot service (real or mock)"""
+        """Get appropriate chatbot service (real or mock) behind the semantic cache"""
+        backend = self._get_backend_service()
+        
+        from src.services.semantic_cache import CachedChatbotService
+        return CachedChatbotService(backend, self._get_semantic_cache(backend))
+    
+    def _get_semantic_cache(self, backend):
+        """Build the semantic response cache, or None if disabled or NumPy is missing"""
+        if not self.semantic_cache_enabled:
+            return None
+        
+        from src.services.semantic_cache import SemanticCache
+        try:
+            return SemanticCache(
+                backend.embed,
+                threshold=self.semantic_cache_threshold,
+                max_entries=self.semantic_cache_max_entries,
+                ttl_seconds=self.semantic_cache_ttl,
+                disabled_contexts=self.semantic_cache_disabled_contexts,
+                aembed_fn=getattr(backend, 'aembed', None)
+            )
+        except ImportError as e:
+            logger.warning(f"Semantic cache unavailable: {e}")
+            return None
+    
+    def _get_backend_service(self):
+        """Get the raw LLM backend service"""
         if self.use_mock_services:
-            from src.services.mock_ollama import MockChatbotService
             logger.info("Using mock chatbot service")
-            return MockChatbotService(self.preferred_model)
+            return self._get_mock_service()
+        
+        if self.llm_backend == 'openai':
+            try:
+                from src.services.openai_client import OpenAIChatbotService
+                logger.info(f"Using OpenAI-compatible chatbot service at {self.openai_api_base}")
+                return OpenAIChatbotService(
+                    self.openai_model,
+                    base_url=self.openai_api_base,
+                    scheduler=self.scheduler
+                )
+            except Exception as e:
+                logger.error(f"Error initializing OpenAI service: {e}")
+                logger.info("Falling back to mock service")
+                return self._get_mock_service()
         
         # Try to use real Ollama service
         try:
@@ -32,17 +269,23 @@ class ServiceConfig:
             client = OllamaClient(self.ollama_url)
             if client.is_available():
                 logger.info("Using real Ollama chatbot service")
-                return ChatbotService(self.preferred_model)
+                return ChatbotService(
+                    self.preferred_model,
+                    base_url=self.ollama_url,
+                    keep_alive=self.keep_alive,
+                    scheduler=self.scheduler,
+                    embedding_model=self.embedding_model,
+                    timeout=self.ollama_timeout,
+                    pool_size=self.ollama_pool_size
+                )
             else:
                 logger.warning("Ollama not available, falling back to mock service")
-                from src.services.mock_ollama import MockChatbotService
-                return MockChatbotService(self.preferred_model)
+                return self._get_mock_service()
                 
         except Exception as e:
             logger.error(f"Error initializing Ollama service: {e}")
             logger.info("Falling back to mock service")
-            from src.services.mock_ollama import MockChatbotService
-            return MockChatbotService(self.preferred_model)
+            return self._get_mock_service()
     
     def get_translation_service(self, chatbot_service=None):
         """Get translation service with appropriate backend"""
@@ -60,16 +303,60 @@ class ServiceConfig:
         if chatbot_service is None:
             chatbot_service = self.get_chatbot_service()
         
-        return EmailTemplateService(chatbot_service)
+        return EmailTemplateService(
+            chatbot_service,
+            batch_concurrency=self.email_batch_concurrency,
+            batch_max_items=self.email_batch_max_items
+        )
     
-    def check_service_health(self) -> dict:
-        """Check health of all services"""
-        health_status = {
-            "overall": "healthy",
-            "services": {}
-        }
+    def get_retrieval_service(self, chatbot_service=None):
+        """Get document retrieval service, or None if disabled or NumPy is missing"""
+        if not self.retrieval_enabled:
+            return None
         
-        # Check Ollama
+        try:
+            from src.services.document_index import DocumentIndex, RetrievalService
+        except ImportError as e:
+            logger.warning(f"Document retrieval unavailable: {e}")
+            return None
+        
+        if chatbot_service is None:
+            chatbot_service = self.get_chatbot_service()
+        
+        return RetrievalService(
+            chatbot_service,
+            DocumentIndex(self.document_index_dir),
+            top_k=self.retrieval_top_k,
+            min_score=self.retrieval_min_score
+        )
+    
+    def _check_openai_health(self, health_status: dict):
+        """Probe the OpenAI-compatible endpoint with a model listing"""
+        try:
+            import openai
+            client = openai.OpenAI(
+                api_key=os.getenv('OPENAI_API_KEY') or 'not-needed',
+                base_url=self.openai_api_base,
+                timeout=5,
+                max_retries=0
+            )
+            models = [model.id for model in client.models.list().data]
+            health_status["services"]["openai"] = {
+                "status": "healthy",
+                "url": self.openai_api_base,
+                "model": self.openai_model,
+                "models": models
+            }
+        except Exception as e:
+            health_status["services"]["openai"] = {
+                "status": "unavailable",
+                "url": self.openai_api_base,
+                "error": str(e)
+            }
+            health_status["overall"] = "degraded"
+    
+    def _check_ollama_health(self, health_status: dict):
+        """Probe Ollama and list its models"""
         try:
             from src.services.ollama_client import OllamaClient
             client = OllamaClient(self.ollama_url)
@@ -90,6 +377,19 @@ class ServiceConfig:
                 "error": str(e)
             }
             health_status["overall"] = "degraded"
+    
+    def check_service_health(self) -> dict:
+        """Check health of all services"""
+        health_status = {
+            "overall": "healthy",
+            "services": {}
+        }
+        
+        # Check the configured LLM backend
+        if self.llm_backend == 'openai' and not self.use_mock_services:
+            self._check_openai_health(health_status)
+        else:
+            self._check_ollama_health(health_status)
         
         # Check PDF processor
         try:
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the Wiko Cutlery Chatbot backend
+Imports src.main in fresh interpreters under `python -X importtime`, the
+same work a worker does before it can serve its first request, and reports
+the median total import time and the modules that take longest to import.
+Service and model warm-up run in background threads and are not counted.
+Exits with a non-zero status when the median exceeds the budget, so it can
+guard worker startup in CI.
+
+Examples:
+    python startup_profile.py
+    python startup_profile.py --budget-ms 800 --runs 5 --top 25
+    python startup_profile.py --module src.asgi
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_import_times(stderr):
+    """(module, self_us, cumulative_us, depth) for every line of -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def profile_once(module, env):
+    """Import module in a fresh interpreter and return its import time entries"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_import_times(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time of the backend")
+    parser.add_argument('--module', default='src.main', help='Module a worker imports (default: src.main)')
+    parser.add_argument('--runs', type=int, default=3, help='Timed imports; the median is reported')
+    parser.add_argument('--budget-ms', type=float, default=1000.0, help='Maximum median import time')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--mock', action=argparse.BooleanOptionalAction, default=True,
+                        help='Import with USE_MOCK_SERVICES=true (default), so no backend is needed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='wiko-startup-') as workdir:
+        env = dict(os.environ)
+        env.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+        env.setdefault('DOCUMENT_INDEX_DIR', os.path.join(workdir, 'vector_index'))
+        if args.mock:
+            env['USE_MOCK_SERVICES'] = 'true'
+        # Warm-up threads import modules concurrently, which scrambles the -X importtime tree
+        env['SERVICE_WARMUP_ENABLED'] = 'false'
+        env['MODEL_WARMUP_ENABLED'] = 'false'
+
+        # Untimed import first, so bytecode compilation is not counted
+        profile_once(args.module, env)
+        runs = [profile_once(args.module, env) for _ in range(max(1, args.runs))]
+
+    totals = []
+    for entries in runs:
+        total = next((cumulative for module, _, cumulative, _ in entries if module == args.module), None)
+        if total is None:
+            total = sum(self_us for _, self_us, _, _ in entries)
+        totals.append(total / 1000)
+    median_ms = statistics.median(totals)
+
+    # Attribute time to top-level packages of the median run
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    packages = {}
+    for module, self_us, _, _ in median_run:
+        package = module.split('.')[0] if not module.startswith('src.') else '.'.join(module.split('.')[:3])
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"Import of {args.module}: median {median_ms:.0f}ms over {len(totals)} runs "
+          f"({', '.join(f'{total:.0f}' for total in totals)}ms)")
+    print("\nSlowest packages (self time, median run):")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {package}")
+
+    if median_ms > args.budget_ms:
+        print(f"\n❌ Import time {median_ms:.0f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        return 1
+    print(f"\n✅ Import time within the budget of {args.budget_ms:.0f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Structured (JSON) output support for Wiko Cutlery Chatbot
+Defines the section schemas requested from the model, parses JSON replies in
+one pass and falls back to heading-based section scraping for backends or
+models that answer in free text.
+"""
+
+import json
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class StructuredSchema:
+    """Named set of string fields, each with the heading used in free-text replies"""
+
+    def __init__(self, name: str, fields: Dict[str, str]):
+        self.name = name
+        self.fields = fields  # field name -> section heading
+
+    @property
+    def json_schema(self) -> Dict:
+        """JSON Schema accepted by Ollama's `format` and OpenAI's `json_schema` response format"""
+        return {
+            "type": "object",
+            "properties": {field: {"type": "string"} for field in self.fields},
+            "required": list(self.fields),
+            "additionalProperties": False
+        }
+
+    @property
+    def instructions(self) -> str:
+        """Prompt suffix asking for the JSON shape"""
+        return (
+            "Respond only with a JSON object with these string keys: "
+            + ", ".join(self.fields) + "."
+        )
+
+
+SCHEMAS = {
+    "pdf_analysis": StructuredSchema("pdf_analysis", {
+        "summary": "SUMMARY",
+        "key_points": "KEY POINTS",
+        "insights": "BUSINESS INSIGHTS",
+        "action_items": "ACTION ITEMS",
+        "risk_assessment": "RISK ASSESSMENT"
+    }),
+    "email_response": StructuredSchema("email_response", {
+        "subject": "SUBJECT",
+        "body": "BODY",
+        "suggestions": "SUGGESTIONS"
+    }),
+    "complaint_analysis": StructuredSchema("complaint_analysis", {
+        "complaint_analysis": "COMPLAINT ANALYSIS",
+        "response_strategy": "RESPONSE STRATEGY",
+        "empathy_improvements": "EMPATHY IMPROVEMENTS",
+        "escalation_guidance": "ESCALATION GUIDANCE",
+        "prevention_measures": "PREVENTION MEASURES",
+        "improved_response": "IMPROVED RESPONSE"
+    }),
+    "complaint_handling": StructuredSchema("complaint_handling", {
+        "severity": "SEVERITY",
+        "main_concerns": "MAIN CONCERNS",
+        "response_strategy": "RESPONSE STRATEGY",
+        "resolution_steps": "RESOLUTION STEPS",
+        "empathy_points": "EMPATHY POINTS",
+        "escalation": "ESCALATION",
+        "follow_up_actions": "FOLLOW-UP ACTIONS"
+    })
+}
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def extract_sections(text: str, headings: List[str]) -> Dict[str, str]:
+    """Split free text into sections in a single pass over its lines.
+
+    A line containing a known heading followed by a colon starts that
+    section; any text after the colon belongs to it. Longer headings are
+    matched first so e.g. "COMPLAINT ANALYSIS" wins over "ANALYSIS".
+    """
+    ordered = sorted(headings, key=len, reverse=True)
+    pattern = re.compile(
+        r"(" + "|".join(re.escape(heading) for heading in ordered) + r")[^:\n]*:(.*)$",
+        re.IGNORECASE
+    )
+    lookup = {heading.upper(): heading for heading in headings}
+
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in text.split('\n'):
+        match = pattern.search(line)
+        if match:
+            heading = lookup[match.group(1).upper()]
+            if heading not in sections:
+                current = heading
+                sections[current] = []
+                after = match.group(2).strip().strip('*').strip()
+                if after:
+                    sections[current].append(after)
+                continue
+            # A repeated heading ends the previous section
+            current = None
+            continue
+        if current is not None:
+            sections[current].append(line.strip())
+
+    return {heading: '\n'.join(lines).strip() for heading, lines in sections.items()}
+
+
+class StructuredOutputParser:
+    """Parses model replies against a schema and tracks how they were parsed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _record(self, schema_name: str, method: str, complete: bool):
+        with self._lock:
+            stats = self._stats.setdefault(schema_name, {
+                "json": 0,
+                "heuristic": 0,
+                "incomplete": 0
+            })
+            stats[method] += 1
+            if not complete:
+                stats["incomplete"] += 1
+
+    def _load_json(self, text: str) -> Optional[Dict]:
+        candidate = _FENCE_PATTERN.sub('', text.strip())
+        start = candidate.find('{')
+        end = candidate.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(candidate[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def parse(self, text: str, schema_name: str) -> Tuple[Dict[str, str], str]:
+        """Parse a reply into the schema's fields.
+
+        Returns (fields, method) where method is "json" or "heuristic".
+        Missing fields are filled with a "No ... available" placeholder.
+        """
+        schema = SCHEMAS[schema_name]
+        data = self._load_json(text)
+
+        if data is not None and any(field in data for field in schema.fields):
+            method = "json"
+            values = {
+                field: self._as_text(data.get(field))
+                for field in schema.fields
+            }
+        else:
+            method = "heuristic"
+            sections = extract_sections(text, list(schema.fields.values()))
+            values = {
+                field: sections.get(heading, '')
+                for field, heading in schema.fields.items()
+            }
+
+        complete = all(values.values())
+        self._record(schema_name, method, complete)
+
+        for field, heading in schema.fields.items():
+            if not values[field]:
+                values[field] = f"No {heading.lower()} available"
+        return values, method
+
+    def _as_text(self, value) -> str:
+        if value is None:
+            return ''
+        if isinstance(value, list):
+            return '\n'.join(f"- {item}" for item in value)
+        return str(value).strip()
+
+    def get_stats(self) -> Dict:
+        """Parse counts per schema; heuristic/incomplete replies are what used to trigger retries"""
+        with self._lock:
+            result = {}
+            for schema_name, stats in self._stats.items():
+                total = stats["json"] + stats["heuristic"]
+                result[schema_name] = {
+                    **stats,
+                    "total": total,
+                    "json_rate": stats["json"] / total if total else 0.0,
+                    "incomplete_rate": stats["incomplete"] / total if total else 0.0
+                }
+            return result
+
+
+def render_sections(values: Dict[str, str], schema_name: str) -> str:
+    """Render parsed fields back into readable text"""
+    schema = SCHEMAS[schema_name]
+    blocks = []
+    for field, heading in schema.fields.items():
+        blocks.append(f"**{heading.title()}:**\n{values.get(field, '')}")
+    return '\n\n'.join(blocks)
+
+
+structured_parser = StructuredOutputParser()
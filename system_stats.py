@@ -0,0 +1,141 @@
+"""
+System statistics for the Wiko Cutlery admin dashboard
+Counts are computed with one conditional-aggregate query per table and kept
+in a StatsSnapshot row, so the dashboard reads a single row and the full
+table scans run at most once per freshness window rather than on every
+page load.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
+
+from src.models.employee import db, Employee, ChatSession, ChatMessage, StatsSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def _count_if(condition):
+    """COUNT of rows matching condition, as part of a single aggregate SELECT"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+class SystemStatsService:
+    """Aggregate statistics with a shared, periodically refreshed snapshot"""
+
+    SNAPSHOT_NAME = 'system'
+
+    def __init__(self, max_age_seconds: int = 300, window_days: int = 7):
+        self.max_age_seconds = max_age_seconds
+        self.window_days = window_days
+        # Concurrent dashboard loads in this process wait for one recomputation
+        self._refresh_lock = threading.Lock()
+
+    def compute(self) -> Dict:
+        """Compute the statistics from the live tables"""
+        since = datetime.utcnow() - timedelta(days=self.window_days)
+
+        # Not every deployment's Employee model carries admin flags or roles
+        is_admin = getattr(Employee, 'is_admin', None)
+        role = getattr(Employee, 'role', None)
+
+        employee_columns = [
+            func.count(Employee.id),
+            _count_if(Employee.is_active == True),
+            _count_if(Employee.last_login >= since),
+        ]
+        if is_admin is not None:
+            employee_columns.append(_count_if(and_(is_admin == True, Employee.is_active == True)))
+        employee_row = db.session.query(*employee_columns).one()
+
+        total_sessions, recent_sessions = db.session.query(
+            func.count(ChatSession.id),
+            _count_if(ChatSession.created_at >= since)
+        ).one()
+        total_messages, recent_messages = db.session.query(
+            func.count(ChatMessage.id),
+            _count_if(ChatMessage.timestamp >= since)
+        ).one()
+
+        role_distribution = {}
+        if role is not None:
+            role_distribution = {
+                name: count
+                for name, count in db.session.query(role, func.count(Employee.id)).group_by(role)
+            }
+
+        return {
+            'employees': {
+                'total': int(employee_row[0]),
+                'active': int(employee_row[1]),
+                'admins': int(employee_row[3]) if is_admin is not None else 0,
+                'role_distribution': role_distribution
+            },
+            'chat_activity': {
+                'total_sessions': int(total_sessions),
+                'total_messages': int(total_messages),
+                'recent_sessions': int(recent_sessions),
+                'recent_messages': int(recent_messages),
+                'recent_logins': int(employee_row[2])
+            }
+        }
+
+    def _is_fresh(self, snapshot) -> bool:
+        if snapshot is None:
+            return False
+        return (datetime.utcnow() - snapshot.computed_at).total_seconds() < self.max_age_seconds
+
+    def _load_snapshot(self):
+        # populate_existing: the session may already hold the snapshot, with the values it had then
+        return StatsSnapshot.query.filter_by(name=self.SNAPSHOT_NAME).execution_options(
+            populate_existing=True
+        ).first()
+
+    def refresh(self) -> StatsSnapshot:
+        """Recompute the statistics and store them as the current snapshot"""
+        started = time.perf_counter()
+        data = self.compute()
+        compute_ms = (time.perf_counter() - started) * 1000
+
+        snapshot = self._load_snapshot()
+        if snapshot is None:
+            snapshot = StatsSnapshot(name=self.SNAPSHOT_NAME, data=data)
+            db.session.add(snapshot)
+        snapshot.data = data
+        snapshot.computed_at = datetime.utcnow()
+        snapshot.compute_ms = round(compute_ms, 1)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The lock is per process: another worker created the first snapshot
+            # in the meantime, and its numbers are as fresh as these
+            db.session.rollback()
+            return self._load_snapshot()
+
+        logger.info(f"System statistics refreshed in {compute_ms:.0f}ms")
+        return snapshot
+
+    def get(self, force_refresh: bool = False) -> Dict:
+        """Current statistics, recomputed only if the snapshot is older than max_age_seconds"""
+        snapshot = self._load_snapshot()
+        if force_refresh or not self._is_fresh(snapshot):
+            with self._refresh_lock:
+                # Another request may have refreshed it while this one waited
+                snapshot = self._load_snapshot()
+                if force_refresh or not self._is_fresh(snapshot):
+                    snapshot = self.refresh()
+
+        return {
+            **snapshot.data,
+            'snapshot': {
+                'computed_at': snapshot.computed_at.isoformat(),
+                'age_seconds': round((datetime.utcnow() - snapshot.computed_at).total_seconds(), 1),
+                'max_age_seconds': self.max_age_seconds,
+                'compute_ms': snapshot.compute_ms
+            }
+        }
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for online database backups
+Runs full and incremental backups against a scratch SQLite database in WAL
+mode and restores them, without the Flask app.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.backup_service import BackupError, BackupService
+
+
+def open_database(path):
+    """A connection that stays open for the whole test, as the app's pool does.
+
+    Automatic checkpoints are off so the WAL only resets when a test asks
+    for it; closing the last connection would checkpoint it too.
+    """
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA wal_autocheckpoint=0')
+    connection.execute('CREATE TABLE IF NOT EXISTS message (id INTEGER PRIMARY KEY, content TEXT)')
+    connection.commit()
+    return connection
+
+
+def add_messages(connection, content, count):
+    for _ in range(count):
+        connection.execute('INSERT INTO message (content) VALUES (?)', (content,))
+        connection.commit()
+
+
+def run_backup(service, kind):
+    job = service.start(kind)
+    deadline = time.monotonic() + 30
+    while job.status not in ('completed', 'failed'):
+        assert time.monotonic() < deadline, f"{kind} backup did not finish"
+        time.sleep(0.01)
+    assert job.status == 'completed', job.error
+    return job
+
+
+def count_rows(path, content=None):
+    connection = sqlite3.connect(path)
+    try:
+        if content is None:
+            return connection.execute('SELECT COUNT(*) FROM message').fetchone()[0]
+        return connection.execute('SELECT COUNT(*) FROM message WHERE content = ?', (content,)).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def make_service(workdir):
+    db_path = os.path.join(workdir, 'app.db')
+    service = BackupService(db_path, os.path.join(workdir, 'backups'), pages_per_step=2, step_sleep_ms=0)
+    return db_path, service
+
+
+def test_incremental_chain_restores_each_point():
+    """full -> incremental -> incremental; restoring a segment replays the chain up to it"""
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path, service = make_service(workdir)
+        connection = open_database(db_path)
+        try:
+            add_messages(connection, 'base', 50)
+            full = run_backup(service, 'full')
+            add_messages(connection, 'first', 20)
+            first = run_backup(service, 'incremental')
+            add_messages(connection, 'second', 10)
+            second = run_backup(service, 'incremental')
+        finally:
+            connection.close()
+
+        assert (full.kind, first.kind, second.kind) == ('full', 'incremental', 'incremental')
+        backups = service.list_backups()
+        assert backups[1]['wal_offset_end'] == backups[2]['wal_offset_start']
+
+        latest = os.path.join(workdir, 'latest.db')
+        service.restore(second.file, latest)
+        assert count_rows(latest) == 80
+        assert count_rows(latest, 'second') == 10
+
+        middle = os.path.join(workdir, 'middle.db')
+        service.restore(first.file, middle)
+        assert count_rows(middle) == 70
+        assert count_rows(middle, 'second') == 0
+
+        base = os.path.join(workdir, 'base.db')
+        service.restore(full.file, base)
+        assert count_rows(base) == 50
+
+
+def test_incremental_after_checkpoint_falls_back_to_full():
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path, service = make_service(workdir)
+        connection = open_database(db_path)
+        try:
+            add_messages(connection, 'base', 5)
+            run_backup(service, 'full')
+            add_messages(connection, 'first', 5)
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            add_messages(connection, 'second', 5)
+            job = run_backup(service, 'incremental')
+        finally:
+            connection.close()
+
+        assert job.kind == 'full'
+        assert 'checkpointed' in job.note
+
+        restored = os.path.join(workdir, 'restored.db')
+        service.restore(job.file, restored)
+        assert count_rows(restored) == 15
+
+
+def test_incremental_without_changes_writes_nothing():
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path, service = make_service(workdir)
+        connection = open_database(db_path)
+        try:
+            add_messages(connection, 'base', 5)
+            run_backup(service, 'full')
+            add_messages(connection, 'first', 5)
+            run_backup(service, 'incremental')
+            job = run_backup(service, 'incremental')
+        finally:
+            connection.close()
+
+        assert job.file is None
+        assert job.note == 'No changes since the last backup'
+        assert len(service.list_backups()) == 2
+
+
+def test_restore_rejects_corrupted_backup():
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path, service = make_service(workdir)
+        connection = open_database(db_path)
+        try:
+            add_messages(connection, 'base', 5)
+            job = run_backup(service, 'full')
+        finally:
+            connection.close()
+
+        with open(os.path.join(service.backup_dir, job.file), 'ab') as f:
+            f.write(b'corrupted')
+        try:
+            service.restore(job.file, os.path.join(workdir, 'restored.db'))
+        except BackupError as e:
+            assert 'Checksum mismatch' in str(e)
+        else:
+            raise AssertionError("restore accepted a corrupted backup")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for business entity normalization
+Covers the date and amount formats found by analyze_business_content, the
+search criteria, and the entity search on a scratch SQLite database.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+
+from src.models.employee import Employee, UploadedDocument, db
+from src.services.business_entities import (
+    EntityQueryError,
+    add_document_entities,
+    build_criteria,
+    normalize_amount,
+    normalize_date,
+    quarter_range,
+    search_documents,
+)
+
+
+def test_iso_and_named_month_dates():
+    assert normalize_date('2024-03-05') == date(2024, 3, 5)
+    assert normalize_date(' 2024/3/5 ') == date(2024, 3, 5)
+    assert normalize_date('March 5, 2024') == date(2024, 3, 5)
+    assert normalize_date('Dec 31 2023') == date(2023, 12, 31)
+
+
+def test_numeric_dates_with_the_year_last():
+    assert normalize_date('03/05/2024') == date(2024, 3, 5)
+    assert normalize_date('03/05/2024', day_first=True) == date(2024, 5, 3)
+    # A part over 12 settles the order either way
+    assert normalize_date('25/12/2024') == date(2024, 12, 25)
+    assert normalize_date('12/25/2024', day_first=True) == date(2024, 12, 25)
+    assert normalize_date('1-2-24') == date(2024, 1, 2)
+    assert normalize_date('1-2-85') == date(1985, 1, 2)
+
+
+def test_invalid_dates_are_dropped():
+    for raw in ('2024-02-30', '13/13/2024', '1/2/024', 'Foo 5, 2024', 'yesterday', ''):
+        assert normalize_date(raw) is None, raw
+
+
+def test_quarter_range():
+    assert quarter_range('2024-Q1') == (date(2024, 1, 1), date(2024, 3, 31))
+    assert quarter_range('2024q2') == (date(2024, 4, 1), date(2024, 6, 30))
+    assert quarter_range(' 2023-Q3 ') == (date(2023, 7, 1), date(2023, 9, 30))
+    assert quarter_range('2024-Q4') == (date(2024, 10, 1), date(2024, 12, 31))
+
+
+def test_malformed_quarter_is_rejected():
+    for quarter in ('2024-Q5', '2024-Q0', 'Q4', '24-Q1', '2024'):
+        try:
+            quarter_range(quarter)
+        except EntityQueryError:
+            continue
+        raise AssertionError(f"{quarter!r} was accepted")
+
+
+def test_amounts_and_currencies():
+    assert normalize_amount('€12,500.00') == (12500.0, 'EUR')
+    assert normalize_amount('$ 1,000') == (1000.0, 'USD')
+    assert normalize_amount('EUR 9999.99') == (9999.99, 'EUR')
+    assert normalize_amount('350 dollars') == (350.0, 'USD')
+    assert normalize_amount('£75') == (75.0, 'GBP')
+    assert normalize_amount('1500') == (1500.0, None)
+    assert normalize_amount('about a thousand') is None
+
+
+def test_build_criteria():
+    criteria = build_criteria({'min_amount': '10000', 'currency': 'eur', 'quarter': '2024-Q4'})
+    assert sorted(criteria) == ['amount', 'date']
+    assert len(criteria['amount']) == 3  # kind, lower bound, currency
+    assert len(criteria['date']) == 3  # kind, quarter start, quarter end
+
+    criteria = build_criteria({'company': '  Nordic   Steel GmbH '})
+    assert criteria['company'][1].right.value == 'nordic steel gmbh'
+
+
+def test_invalid_criteria_are_rejected():
+    for args in ({}, {'min_amount': 'lots'}, {'date_from': '31/12/2024'}, {'quarter': '2024-Q9'}, {'phone': '--'}):
+        try:
+            build_criteria(args)
+        except EntityQueryError:
+            continue
+        raise AssertionError(f"{args!r} was accepted")
+
+
+def make_app(workdir):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'test.db')}"
+    db.init_app(app)
+    return app
+
+
+def add_document(employee, name, analysis, uploaded_at, expires_in_days=30):
+    document = UploadedDocument(
+        employee_id=employee.id,
+        filename=name,
+        original_filename=name,
+        file_path=name,
+        file_size=1,
+        mime_type='application/pdf',
+        uploaded_at=uploaded_at,
+        expires_at=datetime.utcnow() + timedelta(days=expires_in_days)
+    )
+    db.session.add(document)
+    add_document_entities(document, analysis)
+    return document
+
+
+def test_search_amounts_over_10k_eur_in_q4():
+    """The headline query: documents with an amount over €10k dated in Q4"""
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app(workdir)
+        with app.app_context():
+            db.create_all()
+            employee = Employee(username='entity-test', email='entity-test@test.local', department='Test')
+            employee.set_password('secret')
+            other = Employee(username='entity-other', email='entity-other@test.local', department='Test')
+            other.set_password('secret')
+            db.session.add_all([employee, other])
+            db.session.flush()
+
+            now = datetime.utcnow()
+            add_document(employee, 'match-old.pdf', {'amounts': ['€12,500.00'], 'dates': ['2024-11-15']},
+                         now - timedelta(days=2))
+            add_document(employee, 'match-new.pdf', {'amounts': ['EUR 40,000', '$50'], 'dates': ['Dec 1, 2024']},
+                         now - timedelta(days=1))
+            add_document(employee, 'too-small.pdf', {'amounts': ['€9,999'], 'dates': ['2024-10-02']}, now)
+            add_document(employee, 'dollars.pdf', {'amounts': ['$25,000'], 'dates': ['2024-10-02']}, now)
+            add_document(employee, 'wrong-quarter.pdf', {'amounts': ['€30,000'], 'dates': ['2024-09-30']}, now)
+            add_document(employee, 'expired.pdf', {'amounts': ['€30,000'], 'dates': ['2024-10-15']}, now,
+                         expires_in_days=-1)
+            add_document(other, 'other-employee.pdf', {'amounts': ['€30,000'], 'dates': ['2024-10-15']}, now)
+            db.session.commit()
+
+            criteria = build_criteria({'min_amount': '10000', 'currency': 'EUR', 'quarter': '2024-Q4'})
+            results = search_documents(employee.id, criteria)
+
+            assert [result['document']['filename'] for result in results] == ['match-new.pdf', 'match-old.pdf']
+            assert [match['amount'] for match in results[0]['matches']['amount']] == [40000.0]
+            assert [match['value'] for match in results[1]['matches']['date']] == ['2024-11-15']
+
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT * FROM document_entity "
+                "WHERE employee_id = 1 AND kind = 'amount' AND amount >= 10000 AND currency = 'EUR'"
+            )).fetchall()
+            assert 'ix_document_entity_amount_range (employee_id=? AND kind=? AND amount>?)' in str(plan)
+            db.session.remove()
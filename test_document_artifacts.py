@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Tests for page selection of document artifact extraction
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.document_artifacts import PageRangeError, parse_page_range
+
+
+def test_empty_selection_is_every_page():
+    assert parse_page_range(None, 3) == [1, 2, 3]
+    assert parse_page_range('', 3) == [1, 2, 3]
+
+
+def test_ranges_are_merged_and_sorted():
+    assert parse_page_range('7, 1-3', 10) == [1, 2, 3, 7]
+    assert parse_page_range('2-4,3-5,,', 10) == [2, 3, 4, 5]
+    assert parse_page_range('4', 4) == [4]
+
+
+def test_malformed_or_out_of_range_selection_is_rejected():
+    for spec in ('a', '1-b', '0', '6', '3-1', '2-6', '-1'):
+        try:
+            parse_page_range(spec, 5)
+        except PageRangeError:
+            continue
+        raise AssertionError(f"{spec!r} was accepted")
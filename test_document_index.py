@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for document chunking
+iter_text_chunks must produce exactly the chunks chunk_text produces for the
+joined pages, which the vector index relies on.
+"""
+
+import os
+import random
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.document_index import chunk_text, iter_text_chunks
+
+
+def make_pages(seed, count):
+    """Pages of sentences and paragraphs, with blank and whitespace-only pages mixed in"""
+    rng = random.Random(seed)
+    words = ['knife', 'blade', 'steel', 'invoice', 'order', 'Solingen', 'quarter', 'delivery']
+    pages = []
+    for _ in range(count):
+        if rng.random() < 0.1:
+            pages.append(rng.choice(['', '   ', '\n\n', ' \t ']))
+            continue
+        paragraphs = []
+        for _ in range(rng.randint(1, 6)):
+            sentences = [
+                ' '.join(rng.choice(words) for _ in range(rng.randint(3, 30))).capitalize() + '.'
+                for _ in range(rng.randint(1, 8))
+            ]
+            paragraphs.append(rng.choice([' ', '  ', '\t']).join(sentences))
+        pages.append(rng.choice(['', ' ', '\n']) + '\n\n'.join(paragraphs) + rng.choice(['', '  ', '\n']))
+    return pages
+
+
+def assert_same_chunks(pages, chunk_size=1200, overlap=200):
+    expected = chunk_text('\n\n'.join(pages), chunk_size, overlap)
+    assert list(iter_text_chunks(iter(pages), chunk_size, overlap)) == expected
+
+
+def test_matches_chunk_text_for_generated_documents():
+    for seed in range(20):
+        assert_same_chunks(make_pages(seed, 40))
+
+
+def test_matches_chunk_text_for_small_chunks():
+    for seed in range(10):
+        assert_same_chunks(make_pages(seed, 15), chunk_size=80, overlap=20)
+
+
+def test_single_page_longer_than_the_buffer():
+    assert_same_chunks(['word ' * 5000])
+    assert_same_chunks(['x' * 30000, 'short page'])
+
+
+def test_blank_documents_have_no_chunks():
+    assert list(iter_text_chunks([])) == []
+    assert list(iter_text_chunks(['', '  ', '\n\n'])) == []
+    assert_same_chunks(['', '  ', 'only text', '  ', ''])
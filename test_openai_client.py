@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the OpenAI-compatible backend
+Runs OpenAIChatbotService against MockOpenAIServer, a local stub of the
+/v1/models, /v1/chat/completions and /v1/embeddings endpoints.
+"""
+
+import asyncio
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from src.services.mock_openai_server import MockOpenAIServer
+from src.services.openai_client import OpenAIChatbotService
+from src.utils.service_config import ServiceConfig
+
+
+@pytest.fixture
+def server():
+    server = MockOpenAIServer(port=0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(server):
+    return OpenAIChatbotService('gpt-4o-mini', base_url=server.url, api_key='test')
+
+
+def test_is_available(server, service):
+    assert service.is_available()
+    assert service.list_models() == server.models
+
+    closed = MockOpenAIServer(port=0)
+    url = closed.url
+    closed.httpd.server_close()
+    assert not OpenAIChatbotService('gpt-4o-mini', base_url=url, api_key='test').is_available()
+
+
+def test_get_response_records_usage(server, service):
+    response = service.get_response("How do I sharpen a knife?", context_type="general")
+
+    assert 'error' not in response
+    assert response['message']['content']
+    assert response['eval_count'] > 0
+    assert response['prompt_eval_count'] > 0
+    request = server.requests[-1]
+    assert request['messages'][0]['role'] == 'system'
+    assert request['messages'][-1] == {'role': 'user', 'content': "How do I sharpen a knife?"}
+
+    stats = service.get_prompt_stats()['general']
+    assert stats['requests'] == 1
+    assert stats['prompt_eval_count'] == response['prompt_eval_count']
+    assert stats['eval_count'] == response['eval_count']
+    assert service.usage_log[-1]['completion_tokens'] == response['eval_count']
+
+
+def test_stream_response_matches_usage(server, service):
+    events = list(service.stream_response("Tell me about the warranty", context_type="email_assistance"))
+
+    tokens = [event['content'] for event in events if not event.get('done')]
+    final = events[-1]
+    assert final['done'] and 'error' not in final
+    assert ''.join(tokens) == final['content']
+    assert final['eval_count'] == len(tokens)
+    assert server.requests[-1]['stream_options'] == {'include_usage': True}
+
+    usage = service.usage_log[-1]
+    assert usage['context_type'] == 'email_assistance'
+    assert usage['completion_tokens'] == len(tokens)
+    assert usage['first_token_ms'] is not None
+
+
+def test_async_variants(service):
+    async def run():
+        response = await service.aget_response("Hello")
+        events = [event async for event in service.astream_response("Hello")]
+        return response, events
+
+    response, events = asyncio.run(run())
+    assert response['message']['content']
+    assert events[-1]['done'] and events[-1]['content']
+    assert service.get_prompt_stats()['general']['requests'] == 2
+
+
+def test_embed(service):
+    vectors = service.embed(["chef knife", "bread knife"])
+    assert len(vectors) == 2 and len(vectors[0]) > 0
+
+
+def test_backend_error_is_reported(server, service):
+    server.latency_profile.failure_rate = 1.0
+    response = service.get_response("Hello")
+    assert 'error' in response
+    assert 'general' not in service.get_prompt_stats()
+
+
+def test_health_check_probes_configured_backend(server):
+    config = ServiceConfig()
+    config.use_mock_services = False
+    config.llm_backend = 'openai'
+    config.openai_api_base = server.url
+
+    health = config.check_service_health()
+    assert health['services']['openai']['status'] == 'healthy'
+    assert 'ollama' not in health['services']
+
+    server.stop()
+    health = config.check_service_health()
+    assert health['services']['openai']['status'] == 'unavailable'
+    assert health['overall'] != 'healthy'
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed PDF uploads
+Posts PDFs to /api/upload/pdf through the Flask test client, on the mock
+backend and a scratch database.
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+WORKDIR = tempfile.mkdtemp(prefix='wiko-upload-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ['DOCUMENT_INDEX_DIR'] = os.path.join(WORKDIR, 'vector_index')
+os.environ['USE_MOCK_SERVICES'] = 'true'
+os.environ['SERVICE_WARMUP_ENABLED'] = 'false'
+os.environ['MODEL_WARMUP_ENABLED'] = 'false'
+
+from src.main import app
+from src.models.employee import Employee, UploadedDocument, db
+
+DOCUMENT_TEXT = (
+    "Supplier agreement between Wiko Cutlery and Nordic Steel GmbH. "
+    "Total contract value EUR 12,000 payable by 2025-03-31."
+)
+
+
+def make_pdf(padding_bytes=0):
+    """A one-page PDF, grown past padding_bytes with an incompressible image"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 520, 300), DOCUMENT_TEXT)
+    if padding_bytes:
+        side = int((padding_bytes / 3) ** 0.5) + 1
+        noise = random.Random(42).randbytes(side * side * 3)
+        pixmap = fitz.Pixmap(fitz.csRGB, side, side, noise, False)
+        page.insert_image(fitz.Rect(72, 320, 520, 770), pixmap=pixmap)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def logged_in_client(username='upload-test'):
+    app.root_path = WORKDIR
+    with app.app_context():
+        if not Employee.query.filter_by(username=username).first():
+            employee = Employee(username=username, email=f"{username}@test.local", department='Test')
+            employee.set_password('secret')
+            db.session.add(employee)
+            db.session.commit()
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': username, 'password': 'secret'})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+
+def upload(client, data, filename='agreement.pdf'):
+    return client.post(
+        '/api/upload/pdf',
+        data={'file': (io.BytesIO(data), filename, 'application/pdf')},
+        content_type='multipart/form-data'
+    )
+
+
+def test_small_pdf_upload():
+    response = upload(logged_in_client(), make_pdf())
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['success']
+
+
+def test_pdf_larger_than_form_memory_limit():
+    """Parts go to the upload sink however large; only form fields count against max_form_memory_size"""
+    data = make_pdf(padding_bytes=1024 * 1024)
+    assert len(data) > max(64 * 1024, app.config.get('MAX_FORM_MEMORY_SIZE') or 0)
+
+    response = upload(logged_in_client(), data)
+    assert response.status_code == 200, response.get_json()
+    document = response.get_json()['document']
+    assert document['file_size'] == len(data)
+    with app.app_context():
+        stored = db.session.get(UploadedDocument, document['id'])
+        assert os.path.getsize(stored.file_path) == len(data)
+
+
+def test_non_pdf_upload_is_rejected():
+    response = upload(logged_in_client(), b'not a pdf' * 10000, filename='notes.txt')
+    assert response.status_code == 400
@@ -1,6 +1,11 @@
 import requests
 import logging
-from typing import Dict, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+from src.services.prompt_templates import prompt_registry
+from src.services.llm_scheduler import PRIORITY_INTERACTIVE, PRIORITY_BATCH
 
 logger = logging.getLogger(__name__)
 
@@ -47,11 +52,7 @@ class TranslationService:
         
         return detected
     
-    def translate_with_ai(self, text: str, source_lang: str, target_lang: str) -> Dict:
-        """Translate using AI (Ollama)"""
-        if not self.ollama_client:
-            return {"error": "AI translation service not available"}
-        
+    def _translation_prompt(self, text: str, source_lang: str, target_lang: str) -> str:
         # Map language codes to full names
         source_name = self.supported_languages.get(source_lang, source_lang)
         target_name = self.supported_languages.get(target_lang, target_lang)
@@ -60,16 +61,44 @@ class TranslationService:
             detected_lang = self.detect_language(text)
             source_name = self.supported_languages.get(detected_lang, 'English')
         
-        prompt = f"""
-        Translate the following text from {source_name} to {target_name}.
-        Maintain professional tone and business context.
-        Preserve any technical terms related to cutlery, kitchenware, or business.
+        return prompt_registry.render(
+            "translation",
+            source_name=source_name,
+            target_name=target_name,
+            text=text
+        )
+    
+    def _parse_translation(self, response: Dict, text: str, source_lang: str, target_lang: str) -> Dict:
+        if 'error' in response:
+            return {"error": response['error']}
+        
+        translated_text = response.get('response', text)
+        if 'message' in response:
+            translated_text = response['message']['content']
         
-        Text to translate:
-        {text}
+        # Clean up the translation (remove any extra explanations)
+        lines = translated_text.strip().split('\n')
+        # Take the first non-empty line as the translation
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('Translation:') and not line.startswith('Here'):
+                translated_text = line
+                break
         
-        Translation:
-        """
+        return {
+            "success": True,
+            "translated_text": translated_text,
+            "source_language": source_lang,
+            "target_language": target_lang,
+            "method": "ai"
+        }
+    
+    def translate_with_ai(self, text: str, source_lang: str, target_lang: str) -> Dict:
+        """Translate using AI (Ollama)"""
+        if not self.ollama_client:
+            return {"error": "AI translation service not available"}
+        
+        prompt = self._translation_prompt(text, source_lang, target_lang)
         
         try:
             response = self.ollama_client.get_response(
@@ -77,37 +106,33 @@ class TranslationService:
                 context_type="translation",
                 temperature=0.3  # Lower temperature for more consistent translations
             )
+            return self._parse_translation(response, text, source_lang, target_lang)
             
-            if 'error' in response:
-                return {"error": response['error']}
-            
-            translated_text = response.get('response', text)
-            if 'message' in response:
-                translated_text = response['message']['content']
-            
-            # Clean up the translation (remove any extra explanations)
-            lines = translated_text.strip().split('\n')
-            # Take the first non-empty line as the translation
-            for line in lines:
-                line = line.strip()
-                if line and not line.startswith('Translation:') and not line.startswith('Here'):
-                    translated_text = line
-                    break
-            
-            return {
-                "success": True,
-                "translated_text": translated_text,
-                "source_language": source_lang,
-                "target_language": target_lang,
-                "method": "ai"
-            }
+        except Exception as e:
+            logger.error(f"AI translation error: {e}")
+            return {"error": f"Translation failed: {str(e)}"}
+    
+    async def atranslate_with_ai(self, text: str, source_lang: str, target_lang: str) -> Dict:
+        """Async translate_with_ai for the ASGI routes"""
+        if not self.ollama_client:
+            return {"error": "AI translation service not available"}
+        
+        prompt = self._translation_prompt(text, source_lang, target_lang)
+        
+        try:
+            response = await self.ollama_client.aget_response(
+                message=prompt,
+                context_type="translation",
+                temperature=0.3
+            )
+            return self._parse_translation(response, text, source_lang, target_lang)
             
         except Exception as e:
             logger.error(f"AI translation error: {e}")
             return {"error": f"Translation failed: {str(e)}"}
     
-    def translate(self, text: str, source_lang: str = 'auto', target_lang: str = 'en') -> Dict:
-        """Main translation method"""
+    def _check_request(self, text: str, source_lang: str, target_lang: str) -> Optional[Dict]:
+        """Result for requests that need no model call, or None"""
         if not text.strip():
             return {"error": "Empty text provided"}
         
@@ -127,9 +152,25 @@ class TranslationService:
         if source_lang != 'auto' and source_lang not in self.supported_languages:
             return {"error": f"Unsupported source language: {source_lang}"}
         
+        return None
+    
+    def translate(self, text: str, source_lang: str = 'auto', target_lang: str = 'en') -> Dict:
+        """Main translation method"""
+        result = self._check_request(text, source_lang, target_lang)
+        if result is not None:
+            return result
+        
         # Use AI translation as primary method
         return self.translate_with_ai(text, source_lang, target_lang)
     
+    async def atranslate(self, text: str, source_lang: str = 'auto', target_lang: str = 'en') -> Dict:
+        """Async translate"""
+        result = self._check_request(text, source_lang, target_lang)
+        if result is not None:
+            return result
+        
+        return await self.atranslate_with_ai(text, source_lang, target_lang)
+    
     def get_supported_languages(self) -> Dict[str, str]:
         """Get list of supported languages"""
         return self.supported_languages.copy()
@@ -137,8 +178,10 @@ class TranslationService:
 class EmailTemplateService:
     """Service for generating email templates and responses"""
     
-    def __init__(self, ollama_client=None):
+    def __init__(self, ollama_client=None, batch_concurrency: int = 2, batch_max_items: int = 500):
         self.ollama_client = ollama_client
+        self.batch_concurrency = batch_concurrency
+        self.batch_max_items = batch_max_items
         self.templates = {
             'complaint_response': {
                 'subject': 'Re: Your Recent Experience with Wiko Cutlery',
@@ -162,20 +205,16 @@ class EmailTemplateService:
             }
         }
     
-    def generate_email_response(
-        self, 
-        customer_message: str, 
-        email_type: str = 'general_response',
-        customer_name: str = '',
-        order_number: str = '',
-        product_name: str = '',
-        additional_context: str = ''
-    ) -> Dict:
-        """Generate a complete email response"""
-        
-        if not self.ollama_client:
-            return {"error": "Email generation service not available"}
-        
+    def _email_prompt(
+        self,
+        customer_message: str,
+        email_type: str,
+        customer_name: str,
+        order_number: str,
+        product_name: str,
+        additional_context: str
+    ):
+        """Render the email prompt; returns (prompt, template_info)"""
         template_info = self.templates.get(email_type, {
             'subject': 'Re: Your Inquiry',
             'tone': 'professional and helpful'
@@ -194,80 +233,176 @@ class EmailTemplateService:
         
         context_str = "\n".join(context_parts) if context_parts else "No additional context provided"
         
-        prompt = f"""
-        Generate a professional email response for Wiko Cutlery customer service.
+        prompt = prompt_registry.render(
+            "email_response",
+            email_type=email_type,
+            tone=template_info['tone'],
+            subject=template_info['subject'],
+            context=context_str,
+            customer_message=customer_message
+        )
+        return prompt, template_info
+    
+    def _parse_email(self, response: Dict, email_type: str, template_info: Dict) -> Dict:
+        if 'error' in response:
+            return {"error": response['error']}
         
-        Customer Message:
-        {customer_message}
+        email_content = response.get('response', '')
+        if 'message' in response:
+            email_content = response['message']['content']
         
-        Context Information:
-        {context_str}
+        # Parse subject and body
+        lines = email_content.split('\n')
+        subject = template_info['subject']  # Default subject
+        body_lines = []
         
-        Email Type: {email_type}
-        Tone: {template_info['tone']}
-        Suggested Subject: {template_info['subject']}
+        for i, line in enumerate(lines):
+            if line.strip().startswith('Subject:'):
+                subject = line.replace('Subject:', '').strip()
+            elif i > 0 or not line.strip().startswith('Subject:'):
+                body_lines.append(line)
         
-        Requirements:
-        1. Address the customer's specific concerns
-        2. Maintain {template_info['tone']} tone
-        3. Include appropriate Wiko Cutlery branding
-        4. Provide clear next steps or solutions
-        5. Include professional closing
-        6. Be specific to the cutlery/kitchenware industry
+        body = '\n'.join(body_lines).strip()
         
-        Generate a complete email with:
-        - Subject line
-        - Professional greeting
-        - Body addressing the customer's needs
-        - Appropriate closing
-        - Signature block for Wiko Cutlery
+        return {
+            "success": True,
+            "subject": subject,
+            "body": body,
+            "full_email": email_content,
+            "email_type": email_type,
+            "tone": template_info['tone']
+        }
+    
+    def generate_email_response(
+        self, 
+        customer_message: str, 
+        email_type: str = 'general_response',
+        customer_name: str = '',
+        order_number: str = '',
+        product_name: str = '',
+        additional_context: str = '',
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Dict:
+        """Generate a complete email response"""
         
-        Format as:
-        Subject: [subject line]
+        if not self.ollama_client:
+            return {"error": "Email generation service not available"}
         
-        [email body]
-        """
+        prompt, template_info = self._email_prompt(
+            customer_message, email_type, customer_name, order_number, product_name, additional_context
+        )
         
         try:
             response = self.ollama_client.get_response(
                 message=prompt,
                 context_type="email_assistance",
-                temperature=0.7
+                temperature=0.7,
+                priority=priority
             )
+            return self._parse_email(response, email_type, template_info)
             
-            if 'error' in response:
-                return {"error": response['error']}
-            
-            email_content = response.get('response', '')
-            if 'message' in response:
-                email_content = response['message']['content']
-            
-            # Parse subject and body
-            lines = email_content.split('\n')
-            subject = template_info['subject']  # Default subject
-            body_lines = []
-            
-            for i, line in enumerate(lines):
-                if line.strip().startswith('Subject:'):
-                    subject = line.replace('Subject:', '').strip()
-                elif i > 0 or not line.strip().startswith('Subject:'):
-                    body_lines.append(line)
-            
-            body = '\n'.join(body_lines).strip()
-            
-            return {
-                "success": True,
-                "subject": subject,
-                "body": body,
-                "full_email": email_content,
-                "email_type": email_type,
-                "tone": template_info['tone']
-            }
+        except Exception as e:
+            logger.error(f"Email generation error: {e}")
+            return {"error": f"Email generation failed: {str(e)}"}
+    
+    async def agenerate_email_response(
+        self,
+        customer_message: str,
+        email_type: str = 'general_response',
+        customer_name: str = '',
+        order_number: str = '',
+        product_name: str = '',
+        additional_context: str = '',
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> Dict:
+        """Async generate_email_response for the ASGI routes"""
+        if not self.ollama_client:
+            return {"error": "Email generation service not available"}
+        
+        prompt, template_info = self._email_prompt(
+            customer_message, email_type, customer_name, order_number, product_name, additional_context
+        )
+        
+        try:
+            response = await self.ollama_client.aget_response(
+                message=prompt,
+                context_type="email_assistance",
+                temperature=0.7,
+                priority=priority
+            )
+            return self._parse_email(response, email_type, template_info)
             
         except Exception as e:
             logger.error(f"Email generation error: {e}")
             return {"error": f"Email generation failed: {str(e)}"}
     
+    def generate_email_batch(self, items: List[Dict], concurrency: Optional[int] = None) -> Iterator[Dict]:
+        """Generate email drafts for a queue of customer messages.
+        
+        Items are scheduled at batch priority so interactive chat is always
+        served first. Results are yielded as each draft finishes, not in
+        input order; every result carries the item's index (and id, if given).
+        """
+        if not self.ollama_client:
+            yield {"status": "error", "error": "Email generation service not available"}
+            return
+        
+        if len(items) > self.batch_max_items:
+            yield {"status": "error", "error": f"Too many items. Maximum batch size: {self.batch_max_items}"}
+            return
+        
+        try:
+            workers = max(1, min(int(concurrency or self.batch_concurrency), self.batch_concurrency))
+        except (TypeError, ValueError):
+            workers = self.batch_concurrency
+        
+        def process(index: int, item: Dict) -> Dict:
+            started = time.monotonic()
+            result = {"index": index}
+            try:
+                if not isinstance(item, dict):
+                    result.update({"status": "error", "error": "Item must be an object"})
+                    return result
+                if item.get('id') is not None:
+                    result["id"] = item['id']
+                
+                email_type = item.get('email_type', 'general_response')
+                customer_message = item.get('customer_message', '')
+                if email_type in ['complaint_response', 'general_response'] and not customer_message:
+                    result.update({"status": "error", "error": "Customer message is required for responses"})
+                    return result
+                
+                draft = self.generate_email_response(
+                    customer_message=customer_message,
+                    email_type=email_type,
+                    customer_name=item.get('customer_name', ''),
+                    order_number=item.get('order_number', ''),
+                    product_name=item.get('product_name', ''),
+                    additional_context=item.get('context', ''),
+                    priority=PRIORITY_BATCH
+                )
+            except Exception as e:
+                logger.error(f"Batch email generation error for item {index}: {e}")
+                draft = {"error": f"Email generation failed: {str(e)}"}
+            
+            if draft.get('success'):
+                result["status"] = "ok"
+                result.update({key: draft[key] for key in ('subject', 'body', 'email_type', 'tone')})
+            else:
+                result.update({"status": "error", "error": draft.get('error', 'Email generation failed')})
+            
+            result["duration_ms"] = round((time.monotonic() - started) * 1000)
+            return result
+        
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-batch")
+        try:
+            futures = [executor.submit(process, index, item) for index, item in enumerate(items)]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Drop queued items if the client stops reading the stream
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def get_email_templates(self) -> Dict:
         """Get available email templates"""
         return {